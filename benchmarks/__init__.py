@@ -0,0 +1,5 @@
+"""
+Benchmark harness for POLARIS-IR.
+
+Run with ``python -m benchmarks.run`` from the repository root; see the README.
+"""
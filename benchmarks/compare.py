@@ -0,0 +1,82 @@
+"""
+Compare two benchmark results files.
+
+    python -m benchmarks.compare before.json after.json [--threshold 10]
+
+Prints the p50 and p95 latency of every stage and endpoint scenario found in
+both files, and the change in percent.  With ``--threshold``, exits with status
+1 if any p95 latency got worse by more than that many percent, so it can gate
+a change in CI.
+"""
+
+import argparse
+import json
+import sys
+from typing import Dict, List, Optional, Tuple
+
+
+def _load(path: str) -> dict:
+    with open(path) as f:
+        return json.load(f)
+
+
+def _settings(results: dict) -> dict:
+    """Return the settings of a run that change its measurements."""
+    settings = dict(results["meta"].get("settings", {}))
+    for key in ("scenarios", "skip_stages", "skip_endpoints"):
+        settings.pop(key, None)
+    return settings
+
+
+def _change(before: Optional[float], after: Optional[float]) -> Optional[float]:
+    """Return the change from ``before`` to ``after`` in percent."""
+    if before is None or after is None or before <= 0:
+        return None
+    return (after - before) / before * 100
+
+
+def _latencies(results: dict) -> Dict[str, dict]:
+    """Return the latency summary of every stage and endpoint scenario, by name."""
+    rows = {f"stage {name}": latency for name, latency in results.get("stages", {}).items()}
+    rows.update({f"endpoint {name}": result["latency"] for name, result in results.get("endpoints", {}).items()})
+    return rows
+
+
+def compare(before: dict, after: dict) -> List[Tuple[str, dict, dict, Optional[float]]]:
+    """Return ``(name, before, after, p95 change)`` for every result in both runs."""
+    old, new = _latencies(before), _latencies(after)
+    return [(name, old[name], new[name], _change(old[name].get("p95_ms"), new[name].get("p95_ms")))
+            for name in old if name in new]
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Compare two benchmark results files.")
+    parser.add_argument("before")
+    parser.add_argument("after")
+    parser.add_argument("--threshold", type=float, help="Fail if a p95 latency got worse by more than this many percent")
+    args = parser.parse_args(argv)
+
+    before, after = _load(args.before), _load(args.after)
+    print(f"before: {before['meta'].get('commit')} at {before['meta'].get('started_at')}")
+    print(f"after:  {after['meta'].get('commit')} at {after['meta'].get('started_at')}")
+    if _settings(before) != _settings(after):
+        print("warning: the runs used different settings")
+
+    regressions = []
+    print(f"\n{'':50} {'p50 before':>11} {'p50 after':>11} {'p95 before':>11} {'p95 after':>11} {'p95 change':>11}")
+    for name, old, new, change in compare(before, after):
+        if not old.get("count") or not new.get("count"):
+            continue
+        shown = f"{change:+10.1f}%" if change is not None else f"{'-':>11}"
+        print(f"{name:50} {old['p50_ms']:11.2f} {new['p50_ms']:11.2f} {old['p95_ms']:11.2f} {new['p95_ms']:11.2f} {shown}")
+        if args.threshold is not None and change is not None and change > args.threshold:
+            regressions.append(name)
+
+    if regressions:
+        print(f"\np95 latency regressed by more than {args.threshold:g}%: {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,80 @@
+"""
+A stand-in for the GDELT DOC API.
+
+``FakeGdelt`` is a ``gdeltdoc.GdeltDoc`` whose HTTP request is replaced by a
+deterministic responder, so the real query building and response parsing are
+still measured.  Each request takes ``latency_ms`` and returns up to
+``articles_per_day`` articles per day of the requested window, spread over the
+day, with titles made from the query and a rotating set of domains and
+source countries.  Timeline requests get one bin per day, with about four
+times as many articles as an article search can return.
+"""
+
+import datetime
+import hashlib
+import re
+import time
+from typing import Dict, List
+
+import gdeltdoc
+
+SOURCE_COUNTRIES = ["United States", "United Kingdom", "France", "Syria", "Iraq", "Nigeria", "India", "Ukraine"]
+DOMAINS = ["reuters.com", "apnews.com", "bbc.co.uk", "aljazeera.com", "france24.com", "dw.com", "thehindu.com"]
+_VERBS = ["strikes", "clashes in", "talks on", "protests over", "aid reaches", "ceasefire in", "shelling near"]
+
+
+class FakeGdelt(gdeltdoc.GdeltDoc):
+    """GDELT DOC client answering from synthetic articles."""
+
+    def __init__(self, latency_ms: float = 300.0, articles_per_day: int = 250):
+        super().__init__()
+        self.latency_ms = latency_ms
+        self.articles_per_day = articles_per_day
+        self.requests = 0
+
+    def _query(self, mode: str, query_string: str) -> Dict:
+        """Answer a DOC API request without the network."""
+        self.requests += 1
+        time.sleep(self.latency_ms / 1e3)
+        start = datetime.datetime.strptime(re.search(r"startdatetime=(\d{14})", query_string).group(1), "%Y%m%d%H%M%S")
+        end = datetime.datetime.strptime(re.search(r"enddatetime=(\d{14})", query_string).group(1), "%Y%m%d%H%M%S")
+        keyword = " ".join(re.sub(r"\([^)]*\)", " ", query_string.split("&")[0]).replace('"', " ").split()) or "world"
+        days = max(1, (end - start).days)
+        if mode.startswith("timeline"):
+            return {"timeline": self.timeline(mode, keyword, start, days)}
+        limit = int(re.search(r"maxrecords=(\d+)", query_string).group(1))
+        return {"articles": self.articles(keyword, start, min(limit, self.articles_per_day * days), end)}
+
+    def timeline(self, mode: str, keyword: str, start: datetime.datetime, days: int) -> List[dict]:
+        """Return the daily article counts (``timelinevolraw``) or mean tones (``timelinetone``) of ``keyword``."""
+        data = []
+        for i in range(days):
+            day = start + datetime.timedelta(days=i)
+            n = int.from_bytes(hashlib.blake2b(f"{keyword}{day:%Y%m%d}".encode(), digest_size=4).digest(), "little")
+            if mode == "timelinetone":
+                data.append({"date": f"{day:%Y%m%dT%H%M%S}Z", "value": round((n % 100) / 10 - 7.0, 2)})
+            else:
+                data.append({"date": f"{day:%Y%m%dT%H%M%S}Z", "value": 4 * self.articles_per_day + n % 200, "norm": 200000})
+        return [{"series": "Average Tone" if mode == "timelinetone" else "Article Count", "data": data}]
+
+    def articles(self, keyword: str, start: datetime.datetime, count: int, end: datetime.datetime) -> List[dict]:
+        """Return ``count`` articles about ``keyword`` between ``start`` and ``end``, newest first."""
+        span = max((end - start).total_seconds(), 1.0)
+        seed = int.from_bytes(hashlib.blake2b(f"{keyword}{start:%Y%m%d}".encode(), digest_size=4).digest(), "little")
+        articles = []
+        for i in range(count):
+            seen = end - datetime.timedelta(seconds=span * (i + 0.5) / max(count, 1))
+            n = seed + i
+            # Every fifth article is a syndicated copy of the one before it.
+            title_n = n - 1 if i % 5 == 4 else n
+            articles.append({
+                "url": f"https://{DOMAINS[n % len(DOMAINS)]}/{seen:%Y/%m/%d}/{keyword.lower().replace(' ', '-')}-{n}",
+                "url_mobile": "",
+                "title": f"{keyword.title()} {_VERBS[title_n % len(_VERBS)]} district {title_n % 40} as officials report casualties",
+                "seendate": f"{seen:%Y%m%dT%H%M%S}Z",
+                "socialimage": "",
+                "domain": DOMAINS[n % len(DOMAINS)],
+                "language": "English",
+                "sourcecountry": SOURCE_COUNTRIES[n % len(SOURCE_COUNTRIES)],
+            })
+        return articles
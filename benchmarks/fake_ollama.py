@@ -0,0 +1,213 @@
+"""
+A stand-in for the Ollama HTTP API.
+
+The server answers ``/api/chat``, ``/api/embed``, ``/api/tags`` and
+``/api/version`` like Ollama does, with deterministic replies and a simulated
+cost: ``prompt_ms_per_1k_tokens`` for prompt processing and
+``token_latency_ms`` per generated token.  Streamed replies are sent as NDJSON,
+one token per line, so time to first token and total time behave like a real
+model on slow hardware.
+
+- Replies constrained by a JSON schema, and replies with tools, are the
+  function call ``plan_reply``.
+- ``format="json"`` replies are a brief section.
+- Other replies are ``reply_tokens`` words of prose.
+
+Embeddings are hashed bag-of-words vectors, so similar texts get similar vectors.
+"""
+
+import hashlib
+import json
+import re
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Iterator, List, Optional
+
+import numpy as np
+
+# Characters per token used to count prompt tokens, as in ``polaris.services.tokens``.
+CHARS_PER_TOKEN = 4
+
+DEFAULT_PLAN_REPLY = {"function": "get_top_countries", "parameters": {"k": 5, "estimate": "best"}}
+
+BRIEF_REPLY = {
+    "title": "Escalation in the north",
+    "tl_dr": "Clashes intensified over the reporting period.",
+    "what_happened": "Armed groups attacked several villages and security forces responded with airstrikes.",
+    "why_it_matters": "The fighting threatens supply routes and may displace thousands of civilians.",
+    "risk_level": "high",
+    "indicators": ["Reports of troop movements", "Closure of border crossings"],
+    "sources": ["https://example.org/report"],
+}
+
+_WORD = re.compile(r"\w+")
+_PROSE = "the situation remains tense as reports indicate continued fighting in several districts".split()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: "FakeOllama"
+
+    def log_message(self, format: str, *args) -> None:
+        """Do not log requests."""
+
+    def _read_json(self) -> dict:
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def _send_json(self, body: dict, status: int = 200) -> None:
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self) -> None:
+        if self.path == "/api/tags":
+            self._send_json({"models": [{"name": name, "model": name} for name in self.server.models]})
+        elif self.path == "/api/version":
+            self._send_json({"version": "0.0.0-fake"})
+        else:
+            self._send_json({"error": "not found"}, 404)
+
+    def do_HEAD(self) -> None:
+        self.send_response(200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_POST(self) -> None:
+        try:
+            request = self._read_json()
+        except ValueError:
+            self._send_json({"error": "invalid JSON"}, 400)
+            return
+        self.server.count(self.path)
+        if self.path == "/api/chat":
+            self._chat(request)
+        elif self.path == "/api/embed":
+            self._embed(request)
+        else:
+            self._send_json({"error": "not found"}, 404)
+
+    def _chat(self, request: dict) -> None:
+        server = self.server
+        prompt = "".join(str(m.get("content") or "") for m in request.get("messages", []))
+        prompt_tokens = max(1, len(prompt) // CHARS_PER_TOKEN)
+        time.sleep(server.prompt_ms_per_1k_tokens * prompt_tokens / 1e6)
+
+        tool_calls = None
+        if request.get("tools"):
+            call = server.plan_reply
+            tool_calls = [{"function": {"name": call["function"], "arguments": call.get("parameters", {})}}]
+            tokens = [""]
+        else:
+            tokens = server.reply_tokens_for(request.get("format"))
+        base = {"model": request.get("model", ""), "created_at": datetime.now(timezone.utc).isoformat()}
+        stats = {
+            "done": True, "done_reason": "stop",
+            "prompt_eval_count": prompt_tokens, "eval_count": len(tokens),
+            "prompt_eval_duration": int(server.prompt_ms_per_1k_tokens * prompt_tokens * 1e3),
+            "eval_duration": int(server.token_latency_ms * len(tokens) * 1e6),
+        }
+
+        if not request.get("stream", True):
+            time.sleep(server.token_latency_ms * len(tokens) / 1e3)
+            message = {"role": "assistant", "content": "".join(tokens)}
+            if tool_calls:
+                message["tool_calls"] = tool_calls
+            self._send_json({**base, "message": message, **stats})
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for token in tokens:
+            time.sleep(server.token_latency_ms / 1e3)
+            self._chunk({**base, "message": {"role": "assistant", "content": token}, "done": False})
+        final = {"role": "assistant", "content": ""}
+        if tool_calls:
+            final["tool_calls"] = tool_calls
+        self._chunk({**base, "message": final, **stats})
+        self.wfile.write(b"0\r\n\r\n")
+
+    def _chunk(self, body: dict) -> None:
+        data = json.dumps(body).encode("utf-8") + b"\n"
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+        self.wfile.flush()
+
+    def _embed(self, request: dict) -> None:
+        texts = request.get("input", [])
+        if isinstance(texts, str):
+            texts = [texts]
+        server = self.server
+        tokens = sum(len(t) for t in texts) // CHARS_PER_TOKEN
+        time.sleep(server.prompt_ms_per_1k_tokens * tokens / 1e6)
+        self._send_json({"model": request.get("model", ""), "embeddings": [server.embedding(t) for t in texts]})
+
+
+class FakeOllama(ThreadingHTTPServer):
+    """A threaded HTTP server answering like Ollama, with simulated latency."""
+
+    daemon_threads = True
+
+    def __init__(self, port: int = 0, token_latency_ms: float = 20.0, prompt_ms_per_1k_tokens: float = 200.0,
+                 reply_tokens: int = 60, plan_reply: Optional[dict] = None, dimensions: int = 256,
+                 models: List[str] = ("llama3", "nomic-embed-text")):
+        super().__init__(("127.0.0.1", port), _Handler)
+        self.token_latency_ms = token_latency_ms
+        self.prompt_ms_per_1k_tokens = prompt_ms_per_1k_tokens
+        self.reply_tokens = reply_tokens
+        self.plan_reply = plan_reply or DEFAULT_PLAN_REPLY
+        self.dimensions = dimensions
+        self.models = list(models)
+        self.requests = {}
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def count(self, path: str) -> None:
+        with self._lock:
+            self.requests[path] = self.requests.get(path, 0) + 1
+
+    def reply_tokens_for(self, format) -> List[str]:
+        """Return the reply to a chat request, split into tokens."""
+        if isinstance(format, dict):
+            text = json.dumps(self.plan_reply)
+        elif format == "json":
+            text = json.dumps(BRIEF_REPLY)
+        else:
+            words = (_PROSE * (self.reply_tokens // len(_PROSE) + 1))[:self.reply_tokens]
+            return [f"{word} " for word in words]
+        return list(_split(text))
+
+    def embedding(self, text: str) -> List[float]:
+        """Return a hashed bag-of-words vector of ``text``."""
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+        for word in _WORD.findall(text.casefold()):
+            digest = hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest()
+            vector[int.from_bytes(digest, "little") % self.dimensions] += 1.0
+        if not vector.any():
+            vector[0] = 1.0
+        return vector.tolist()
+
+    def start(self) -> "FakeOllama":
+        self._thread = threading.Thread(target=self.serve_forever, name="fake-ollama", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+
+
+def _split(text: str, size: int = CHARS_PER_TOKEN) -> Iterator[str]:
+    """Split ``text`` into pieces of about one token."""
+    for start in range(0, len(text), size):
+        yield text[start:start + size]
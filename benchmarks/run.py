@@ -0,0 +1,432 @@
+"""
+Benchmarks for the POLARIS-IR API.
+
+The app is built with ``main.create_app`` and served by uvicorn in this
+process, against the fake Ollama server in ``fake_ollama`` and the fake GDELT
+client in ``fake_gdelt``, with a synthetic UCDP-scale dataset and codebook
+from ``synthetic``.  Everything runs in a scratch working directory, so the
+caches and databases of a real deployment are never touched.
+
+Two kinds of results are collected:
+
+- stages: single steps (CSV parsing, columnar conversion, codebook retrieval,
+  planning, queries, GDELT fetches, ...) called directly, one at a time;
+- endpoints: requests sent over HTTP by concurrent clients, per scenario and
+  concurrency level, with p50/p95/p99 latency, time to first byte for
+  streamed responses, throughput and errors.
+
+Results are printed and written as JSON; compare two runs with
+``python -m benchmarks.compare``.
+"""
+
+import argparse
+import asyncio
+import datetime
+import glob
+import json
+import os
+import platform
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from benchmarks.fake_gdelt import FakeGdelt
+from benchmarks.fake_ollama import FakeOllama
+from benchmarks.synthetic import COUNTRIES, FIRST_YEAR, LAST_YEAR, write_codebook_pdf, write_events_csv
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(REPO_DIR, "benchmarks", "results")
+
+SOURCE = "UCDP GED (synthetic)"
+
+# Past days, so fetched GDELT days stay cached and runs are comparable.
+WINDOW_SINCE = "2024-03-01"
+WINDOW_UNTIL = "2024-03-08"
+
+# Every scenario, in the order they run; see ``_scenarios``.
+SCENARIOS = [
+    "health", "fetch-events-cold", "fetch-events-warm", "fetch-events-store", "search-events",
+    "llm-rules", "llm-planned", "llm-cached", "llm-stream", "brief", "risk-score", "scenario",
+]
+
+
+def percentiles(samples: List[float]) -> dict:
+    """Summarise durations in seconds as milliseconds."""
+    if not samples:
+        return {"count": 0}
+    ms = np.asarray(samples) * 1e3
+    return {
+        "count": len(ms),
+        "mean_ms": round(float(ms.mean()), 3),
+        "p50_ms": round(float(np.percentile(ms, 50)), 3),
+        "p95_ms": round(float(np.percentile(ms, 95)), 3),
+        "p99_ms": round(float(np.percentile(ms, 99)), 3),
+        "max_ms": round(float(ms.max()), 3),
+    }
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def prepare_workdir(workdir: str, rows: int, seed: int, pages: int) -> Dict[str, str]:
+    """Write the synthetic dataset, codebook and data source registry; existing files are reused."""
+    os.makedirs(workdir, exist_ok=True)
+    data_path = os.path.join(workdir, f"ged-{rows}-{seed}.zip")
+    codebook_path = os.path.join(workdir, f"codebook-{pages}.pdf")
+    if not os.path.exists(data_path):
+        started = time.perf_counter()
+        write_events_csv(data_path + ".tmp.zip", rows, seed)
+        os.replace(data_path + ".tmp.zip", data_path)
+        print(f"Generated {rows} events in {time.perf_counter() - started:.1f}s: {data_path}")
+    if not os.path.exists(codebook_path):
+        write_codebook_pdf(codebook_path, pages)
+    with open(os.path.join(workdir, "data_sources.json"), "w") as f:
+        json.dump([{"name": SOURCE, "type": "csv", "url": f"file://{data_path}", "codebook_url": f"file://{codebook_path}"}], f)
+    return {"data": data_path, "codebook": codebook_path}
+
+
+class AppServer:
+    """The app from ``main.create_app``, served by uvicorn in a background thread."""
+
+    def __init__(self, port: int):
+        import uvicorn
+        from polaris.main import create_app
+
+        self.url = f"http://127.0.0.1:{port}"
+        config = uvicorn.Config(create_app(), host="127.0.0.1", port=port, log_level="warning", lifespan="on")
+        self.server = uvicorn.Server(config)
+        self._thread = threading.Thread(target=self.server.run, name="uvicorn", daemon=True)
+
+    def start(self, timeout: float = 120.0) -> "AppServer":
+        """Start the server and wait until ``/health`` reports that the warmup has finished."""
+        import httpx
+
+        self._thread.start()
+        while not self.server.started:
+            if not self._thread.is_alive():
+                raise RuntimeError("The app did not start")
+            time.sleep(0.05)
+        deadline = time.monotonic() + timeout
+        while httpx.get(f"{self.url}/health").status_code != 200:
+            if time.monotonic() > deadline:
+                raise RuntimeError("The app did not finish its warmup")
+            time.sleep(0.05)
+        return self
+
+    def stop(self) -> None:
+        self.server.should_exit = True
+        self._thread.join()
+
+
+def _scenarios(events: List[dict]) -> Dict[str, Callable[[int], dict]]:
+    """Return a function building the ``i``-th request of each scenario.
+
+    Scenarios named "cold" or "planned" vary every request so caches miss;
+    "warm" and "cached" repeat one request so they hit.
+    """
+    countries = [c[0] for c in COUNTRIES]
+    years = list(range(FIRST_YEAR, LAST_YEAR + 1))
+    window = {"since": WINDOW_SINCE, "until": WINDOW_UNTIL}
+
+    def pick(i: int) -> tuple:
+        return countries[i % len(countries)], countries[(i + 1) % len(countries)], years[(i // len(countries)) % len(years)]
+
+    def llm(path: str, prompt: str, stream: bool = False) -> dict:
+        return {"method": "POST", "path": path, "json": {"prompt": prompt, "sources": [SOURCE]}, "stream": stream}
+
+    return {
+        "health": lambda i: {"method": "GET", "path": "/health"},
+        "fetch-events-cold": lambda i: {"method": "GET", "path": "/fetch-events", "params": {"q": f"topic{i}", "max": 250, **window}},
+        "fetch-events-warm": lambda i: {"method": "GET", "path": "/fetch-events", "params": {"q": "syria", "max": 250, **window}},
+        "fetch-events-store": lambda i: {"method": "GET", "path": "/fetch-events", "params": {"q": "syria", "mode": "store", **window}},
+        "search-events": lambda i: {"method": "GET", "path": "/search-events", "params": {"q": f"strikes district {i % 40}", "max": 50}},
+        "llm-rules": lambda i: llm("/v1/llm/generate", "How many fatalities were there in {} in {}?".format(*pick(i)[::2])),
+        "llm-planned": lambda i: llm("/v1/llm/generate", "Compare the deaths in {} and {} in {}".format(*pick(i))),
+        "llm-cached": lambda i: llm("/v1/llm/generate", "Compare the deaths in Syria and Iraq in 2015"),
+        "llm-stream": lambda i: llm("/v1/llm/generate/stream", "Compare the deadliest years of {} and {} since {}".format(*pick(i)), stream=True),
+        "brief": lambda i: {"method": "POST", "path": "/generate-brief", "json": {"items": events, "focus": f"security outlook {i}"}},
+        "risk-score": lambda i: {"method": "POST", "path": "/risk-score", "json": {"area": countries[i % len(countries)], "window_days": 14}},
+        "scenario": lambda i: {"method": "POST", "path": "/generate-scenario", "json": {
+            "prompt": "Escalation along the border", "actors": ["Government", "Rebels", "Militia"],
+            "time_horizon_days": 30, "seed": i}},
+    }
+
+
+async def _load(base_url: str, build: Callable[[int], dict], requests: int, concurrency: int, warmup: int,
+                timeout: float) -> dict:
+    """Send ``requests`` requests from ``concurrency`` clients and summarise them."""
+    import httpx
+
+    latencies: List[float] = []
+    first_bytes: List[float] = []
+    errors: Dict[str, int] = {}
+    counter = iter(range(warmup, warmup + requests))
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=timeout, limits=limits) as client:
+        async def send(request: dict, record: bool) -> None:
+            started = time.perf_counter()
+            try:
+                async with client.stream(request["method"], request["path"], params=request.get("params"),
+                                         json=request.get("json")) as response:
+                    first = None
+                    async for _ in response.aiter_raw():
+                        if first is None:
+                            first = time.perf_counter() - started
+                    status = response.status_code
+            except httpx.HTTPError as e:
+                status = type(e).__name__
+            elapsed = time.perf_counter() - started
+            if not record:
+                return
+            if status != 200:
+                errors[str(status)] = errors.get(str(status), 0) + 1
+                return
+            latencies.append(elapsed)
+            if request.get("stream") and first is not None:
+                first_bytes.append(first)
+
+        for i in range(warmup):
+            await send(build(i), record=False)
+
+        async def worker() -> None:
+            for i in counter:
+                await send(build(i), record=True)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        wall = time.perf_counter() - started
+
+    result = {"concurrency": concurrency, "requests": requests, "errors": errors,
+              "wall_s": round(wall, 3), "throughput_rps": round(len(latencies) / wall, 3) if wall else None,
+              "latency": percentiles(latencies)}
+    if first_bytes:
+        result["first_byte"] = percentiles(first_bytes)
+    return result
+
+
+def _time(fn: Callable[[], object], repeat: int, warmup: int = 1, setup: Callable[[], object] = None) -> dict:
+    """Call ``fn`` ``repeat`` times after ``warmup`` calls and summarise the durations."""
+    samples = []
+    for i in range(warmup + repeat):
+        if setup is not None:
+            setup()
+        started = time.perf_counter()
+        fn()
+        if i >= warmup:
+            samples.append(time.perf_counter() - started)
+    return percentiles(samples)
+
+
+def run_stages(workdir: str, paths: Dict[str, str], repeat: int) -> Dict[str, dict]:
+    """Time single steps of the request paths, in this process."""
+    from polaris.agents import router
+    from polaris.agents.orchestrator import load_indexed_dataset
+    from polaris.services import data_loader, news_fetcher, query_engine, risk_scorer, scenario_generator
+    from polaris.services.codebook_retrieval import codebook_retriever, split_sections
+    from polaris.services.dedupe import DedupeIndex, collapse
+    from polaris.services.event_store import event_store
+    from polaris.services.ingest import COLUMNAR_SUFFIX, ensure_columnar
+    from polaris.services.llm_service import get_orchestrator_agent
+    from polaris.services.search_index import search_index
+
+    stage_dir = os.path.join(workdir, "stages")
+    shutil.rmtree(stage_dir, ignore_errors=True)
+    os.makedirs(stage_dir)
+    heavy = max(1, min(repeat, 3))
+    question = "Compare the deaths in Syria and Iraq in 2015"
+    results = {}
+
+    def stage(name: str, fn: Callable[[], object], repeat: int = repeat, **kwargs) -> None:
+        print(f"Stage {name}")
+        results[name] = _time(fn, repeat, **kwargs)
+
+    csv_path = os.path.join(stage_dir, "events.csv")
+    with data_loader.open_csv_stream(paths["data"]) as src, open(csv_path, "wb") as dst:
+        shutil.copyfileobj(src, dst)
+    with open(paths["codebook"], "rb") as f:
+        pdf = f.read()
+    codebook = data_loader.extract_pdf_text(pdf)
+
+    stage("data_loader.load_csv", lambda: data_loader.load_csv(csv_path), heavy, warmup=0)
+    stage("ingest.ensure_columnar", lambda: ensure_columnar(csv_path, codebook), heavy, warmup=0,
+          setup=lambda: [os.remove(path) for path in glob.glob(os.path.join(stage_dir, f"*{COLUMNAR_SUFFIX}"))])
+    columnar = ensure_columnar(csv_path, codebook)
+    stage("orchestrator.load_indexed_dataset", lambda: load_indexed_dataset(columnar), heavy, warmup=0)
+    stage("data_loader.extract_pdf_text", lambda: data_loader.extract_pdf_text(pdf), heavy)
+    stage("codebook.split_sections", lambda: split_sections(codebook))
+    stage("codebook.context", lambda: codebook_retriever.context(codebook, question))
+
+    orchestrator_agent = get_orchestrator_agent()
+    analysis = orchestrator_agent.prepare(question, [SOURCE])
+    dataset = analysis.datasets[SOURCE]
+    plan = {"filters": [{"column": "country", "op": "==", "value": "Syria"}], "group_by": ["year"],
+            "aggregates": [{"func": "sum", "column": "best"}]}
+    stage("orchestrator.prepare", lambda: orchestrator_agent.prepare(question, [SOURCE]))
+    stage("orchestrator.with_prompt", lambda: orchestrator_agent.with_prompt(question, analysis))
+    stage("router.route", lambda: router.route("How many fatalities were there in Syria in 2015?", analysis.datasets))
+    stage("query_engine.execute_plan", lambda: query_engine.execute_plan(dataset.df, query_engine.QueryPlan.model_validate(plan)))
+    stage("query_engine.run_query", lambda: query_engine.run_query(dataset.df, plan, index=dataset.index))
+
+    fetches = iter(range(10**6))
+    window = {"since": WINDOW_SINCE, "until": WINDOW_UNTIL, "maxrecs": 250}
+    stage("news_fetcher.fetch_events.cold", lambda: news_fetcher.fetch_events(q=f"stage{next(fetches)}", **window), heavy, warmup=0)
+    stage("news_fetcher.fetch_events.warm", lambda: news_fetcher.fetch_events(q="stage0", **window))
+    events = news_fetcher.fetch_events(q="stage0", **window)
+    # A new in-memory index each time, so no event has been seen before.
+    dedupe = {}
+    stage("dedupe.collapse", lambda: collapse(events, dedupe["index"]),
+          setup=lambda: dedupe.update(index=DedupeIndex(":memory:", len(events) * 2)))
+    stage("event_store.query", lambda: event_store.query("stage0", limit=50))
+    search_index.refresh()
+    stage("search_index.search", lambda: search_index.search("stage0 strikes district", limit=50))
+    stage("risk_scorer.update_area", lambda: risk_scorer.update_area(f"stage{next(fetches)}"), heavy, warmup=0)
+    risk_scorer.update_area("Syria")
+    stage("risk_scorer.risk_score", lambda: risk_scorer.risk_score("Syria", 14))
+    stage("scenario_generator.simulate_scenarios", lambda: scenario_generator.simulate_scenarios(
+        "Escalation along the border", ["Government", "Rebels", "Militia"], 30, [], 3, seed=0))
+    return results
+
+
+def run_endpoints(base_url: str, scenarios: List[str], requests: int, concurrency: List[int], warmup: int,
+                  timeout: float) -> Dict[str, dict]:
+    """Load the API with each scenario at each concurrency level."""
+    import httpx
+
+    events = httpx.get(f"{base_url}/fetch-events", params={"q": "syria", "since": WINDOW_SINCE, "until": WINDOW_UNTIL, "max": 20},
+                       timeout=timeout).json()
+    builders = _scenarios(events)
+    results = {}
+    for name in scenarios:
+        for level in concurrency:
+            print(f"Endpoint scenario {name} with {level} clients")
+            # Every run of a "cold" scenario needs requests no earlier run has sent.
+            offset = sum(results[key]["requests"] + warmup for key in results if key.startswith(f"{name}@"))
+            build = builders[name]
+            result = asyncio.run(_load(base_url, lambda i, b=build, o=offset: b(o + i), requests, level, warmup, timeout))
+            results[f"{name}@{level}"] = result
+    return results
+
+
+def report(results: dict) -> None:
+    """Print the stage and endpoint results as tables."""
+    if results["stages"]:
+        print(f"\n{'stage':40} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10}")
+        for name, latency in results["stages"].items():
+            print(f"{name:40} {latency['p50_ms']:10.2f} {latency['p95_ms']:10.2f} {latency['p99_ms']:10.2f}")
+    if results["endpoints"]:
+        print(f"\n{'endpoint@clients':28} {'req/s':>9} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10} {'ttfb p50':>10}  errors")
+        for name, result in results["endpoints"].items():
+            latency = result["latency"]
+            row = f"{name:28} {result['throughput_rps'] or 0:9.2f}"
+            if latency["count"]:
+                row += f" {latency['p50_ms']:10.2f} {latency['p95_ms']:10.2f} {latency['p99_ms']:10.2f}"
+            else:
+                row += f" {'-':>10} {'-':>10} {'-':>10}"
+            row += f" {result['first_byte']['p50_ms']:10.2f}" if "first_byte" in result else f" {'-':>10}"
+            print(f"{row}  {sum(result['errors'].values())}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=300_000, help="Events in the synthetic dataset")
+    parser.add_argument("--codebook-pages", type=int, default=40, help="Pages of the synthetic codebook")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the synthetic dataset")
+    parser.add_argument("--requests", type=int, default=50, help="Requests per scenario and concurrency level")
+    parser.add_argument("--concurrency", default="1,8", help="Comma-separated numbers of concurrent clients")
+    parser.add_argument("--warmup", type=int, default=2, help="Unrecorded requests before each run")
+    parser.add_argument("--repeat", type=int, default=10, help="Timed calls per stage")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="Comma-separated endpoint scenarios to run")
+    parser.add_argument("--skip-stages", action="store_true", help="Only benchmark endpoints")
+    parser.add_argument("--skip-endpoints", action="store_true", help="Only benchmark stages")
+    parser.add_argument("--token-latency-ms", type=float, default=20.0, help="Fake Ollama time per generated token")
+    parser.add_argument("--prompt-ms-per-1k-tokens", type=float, default=200.0, help="Fake Ollama prompt processing time")
+    parser.add_argument("--reply-tokens", type=int, default=60, help="Fake Ollama tokens per free-text reply")
+    parser.add_argument("--gdelt-latency-ms", type=float, default=300.0, help="Fake GDELT time per request")
+    parser.add_argument("--gdelt-articles-per-day", type=int, default=250, help="Fake GDELT articles per day")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Request timeout in seconds")
+    parser.add_argument("--workdir", help="Scratch directory; reuse it to skip generating the data again")
+    parser.add_argument("--output", help="Results file (default: benchmarks/results/<time>-<commit>.json)")
+    args = parser.parse_args(argv)
+
+    scenarios = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+    unknown = sorted(set(scenarios) - set(SCENARIOS))
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(unknown)}")
+    concurrency = [int(c) for c in args.concurrency.split(",") if c.strip()]
+
+    workdir = os.path.abspath(args.workdir or tempfile.mkdtemp(prefix="polaris-bench-"))
+    output = os.path.abspath(args.output) if args.output else None
+    paths = prepare_workdir(workdir, args.rows, args.seed, args.codebook_pages)
+    # The app keeps its data, caches and databases under the working directory.
+    run_dir = os.path.join(workdir, "run")
+    shutil.rmtree(run_dir, ignore_errors=True)
+    os.makedirs(run_dir)
+    shutil.copy(os.path.join(workdir, "data_sources.json"), run_dir)
+    os.chdir(run_dir)
+
+    ollama = FakeOllama(token_latency_ms=args.token_latency_ms, prompt_ms_per_1k_tokens=args.prompt_ms_per_1k_tokens,
+                        reply_tokens=args.reply_tokens).start()
+    os.environ["OLLAMA_HOST"] = ollama.url
+    # The risk-score scenario asks for these areas, which are then fetched at startup.
+    os.environ["POLARIS_RISK_AREAS"] = ",".join(c[0] for c in COUNTRIES)
+    sys.path.insert(0, os.path.join(REPO_DIR, "src"))
+    from polaris.services import news_fetcher
+
+    gdelt = FakeGdelt(latency_ms=args.gdelt_latency_ms, articles_per_day=args.gdelt_articles_per_day)
+    news_fetcher._gdelt_client = gdelt
+
+    started = datetime.datetime.now(datetime.timezone.utc)
+    app = AppServer(_free_port()).start()
+    try:
+        stages = {} if args.skip_stages else run_stages(workdir, paths, args.repeat)
+        endpoints = {} if args.skip_endpoints else run_endpoints(app.url, scenarios, args.requests, concurrency,
+                                                                 args.warmup, args.timeout)
+    finally:
+        app.stop()
+        ollama.stop()
+
+    commit = _git_commit()
+    results = {
+        "meta": {
+            "started_at": started.isoformat(),
+            "commit": commit,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "settings": {key: value for key, value in vars(args).items() if key not in ("output", "workdir")},
+            "fake_ollama_requests": ollama.requests,
+            "fake_gdelt_requests": gdelt.requests,
+        },
+        "stages": stages,
+        "endpoints": endpoints,
+    }
+    output = output or os.path.join(RESULTS_DIR, f"{started:%Y%m%dT%H%M%S}-{commit or 'unknown'}.json")
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    report(results)
+    print(f"\nResults written to {output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
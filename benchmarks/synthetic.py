@@ -0,0 +1,232 @@
+"""
+Synthetic data for benchmarks.
+
+``write_events_csv`` writes a zipped CSV with the shape and size of the UCDP
+Georeferenced Event Dataset (GED): about 300,000 events with the GED columns,
+including a long free-text ``source_article`` column.  ``write_codebook_pdf``
+writes a multi-page codebook describing those columns, so codebook extraction,
+column selection and codebook retrieval all have realistic input.  Both are
+deterministic for a given seed.
+"""
+
+import io
+import zipfile
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+# Country, region and relative share of events, loosely following GED.
+COUNTRIES: List[Tuple[str, str, float]] = [
+    ("Afghanistan", "Asia", 12.0), ("Syria", "Middle East", 10.0), ("Iraq", "Middle East", 6.0),
+    ("Somalia", "Africa", 5.0), ("Nigeria", "Africa", 5.0), ("Democratic Republic of the Congo", "Africa", 5.0),
+    ("Pakistan", "Asia", 4.0), ("India", "Asia", 4.0), ("Colombia", "Americas", 3.0), ("Mexico", "Americas", 3.0),
+    ("Ukraine", "Europe", 3.0), ("Yemen (North Yemen)", "Middle East", 3.0), ("Sudan", "Africa", 3.0),
+    ("South Sudan", "Africa", 2.0), ("Mali", "Africa", 2.0), ("Burkina Faso", "Africa", 2.0),
+    ("Ethiopia", "Africa", 2.0), ("Myanmar (Burma)", "Asia", 2.0), ("Philippines", "Asia", 2.0),
+    ("Turkey", "Europe", 1.5), ("Russia (Soviet Union)", "Europe", 1.5), ("Sri Lanka", "Asia", 1.5),
+    ("Algeria", "Africa", 1.0), ("Uganda", "Africa", 1.0), ("Cameroon", "Africa", 1.0),
+    ("Central African Republic", "Africa", 1.0), ("Libya", "Africa", 1.0), ("Egypt", "Middle East", 1.0),
+    ("Israel", "Middle East", 1.0), ("Lebanon", "Middle East", 0.5), ("Guatemala", "Americas", 0.5),
+    ("Peru", "Americas", 0.5), ("Brazil", "Americas", 0.5), ("Bosnia-Herzegovina", "Europe", 0.5),
+    ("Azerbaijan", "Europe", 0.3), ("Thailand", "Asia", 0.5), ("Indonesia", "Asia", 0.5),
+    ("Kenya", "Africa", 0.5), ("Mozambique", "Africa", 0.5), ("Niger", "Africa", 0.5),
+]
+
+FIRST_YEAR = 1989
+LAST_YEAR = 2023
+
+_WORDS = (
+    "reports said armed forces clashed with rebels near the village killing civilians according to local "
+    "officials the attack took place on the main road while government troops responded with airstrikes "
+    "several houses were destroyed and residents fled to the nearby town police sources confirmed casualties"
+).split()
+
+
+def _articles(rng: np.random.Generator, n: int, distinct: int = 5000) -> np.ndarray:
+    """Return ``n`` source article strings drawn from ``distinct`` generated ones."""
+    pool = np.array([
+        f"Agency {i % 97} {' '.join(rng.choice(_WORDS, size=int(rng.integers(15, 40))))},{2000 + i % 24}-{1 + i % 12:02d}-{1 + i % 28:02d}"
+        for i in range(distinct)
+    ], dtype=object)
+    return pool[rng.integers(0, distinct, size=n)]
+
+
+def events_frame(rows: int = 300_000, seed: int = 0) -> pd.DataFrame:
+    """Return a DataFrame of ``rows`` synthetic GED events."""
+    rng = np.random.default_rng(seed)
+    names = np.array([c[0] for c in COUNTRIES], dtype=object)
+    regions = np.array([c[1] for c in COUNTRIES], dtype=object)
+    shares = np.array([c[2] for c in COUNTRIES])
+    country = rng.choice(len(COUNTRIES), size=rows, p=shares / shares.sum())
+
+    # Later years have more events, as in GED.
+    years = np.arange(FIRST_YEAR, LAST_YEAR + 1)
+    weights = np.linspace(1.0, 3.0, len(years))
+    year = rng.choice(years, size=rows, p=weights / weights.sum())
+    start = pd.to_datetime(year.astype(str), format="%Y") + pd.to_timedelta(rng.integers(0, 365, size=rows), unit="D")
+    end = start + pd.to_timedelta(rng.geometric(0.8, size=rows) - 1, unit="D")
+
+    deaths = rng.geometric(0.15, size=(rows, 4)) - 1
+    deaths[rng.random((rows, 4)) < 0.5] = 0
+    best = deaths.sum(axis=1)
+    low = np.maximum(best - rng.integers(0, 3, size=rows), 0)
+    high = best + rng.geometric(0.3, size=rows) - 1
+
+    conflict = rng.integers(200, 14000, size=rows)
+    frame = pd.DataFrame({
+        "id": np.arange(1, rows + 1),
+        "relid": [f"{n[:3].upper()}-{y}-1-{i}" for n, y, i in zip(names[country], year, range(rows))],
+        "year": year,
+        "active_year": rng.integers(0, 2, size=rows),
+        "code_status": "Clear",
+        "type_of_violence": rng.choice([1, 2, 3], size=rows, p=[0.6, 0.15, 0.25]),
+        "conflict_new_id": conflict,
+        "conflict_name": [f"{n}: Government" for n in names[country]],
+        "dyad_new_id": conflict + 400,
+        "dyad_name": [f"Government of {n} - Opposition {c % 9}" for n, c in zip(names[country], conflict)],
+        "side_a": [f"Government of {n}" for n in names[country]],
+        "side_b": [f"Opposition {c % 9}" for c in conflict],
+        "number_of_sources": rng.integers(1, 6, size=rows),
+        "source_article": _articles(rng, rows),
+        "where_prec": rng.integers(1, 8, size=rows),
+        "adm_1": [f"{n} province {i % 12}" for n, i in zip(names[country], rng.integers(0, 1000, size=rows))],
+        "latitude": np.round(rng.uniform(-30, 50, size=rows), 6),
+        "longitude": np.round(rng.uniform(-80, 120, size=rows), 6),
+        "country": names[country],
+        "country_id": 600 + country,
+        "region": regions[country],
+        "event_clarity": rng.integers(1, 3, size=rows),
+        "date_prec": rng.integers(1, 6, size=rows),
+        "date_start": start.strftime("%Y-%m-%d 00:00:00.000"),
+        "date_end": end.strftime("%Y-%m-%d 00:00:00.000"),
+        "deaths_a": deaths[:, 0],
+        "deaths_b": deaths[:, 1],
+        "deaths_civilians": deaths[:, 2],
+        "deaths_unknown": deaths[:, 3],
+        "best": best,
+        "high": high,
+        "low": low,
+    })
+    return frame
+
+
+def write_events_csv(path: str, rows: int = 300_000, seed: int = 0) -> None:
+    """Write ``rows`` synthetic GED events to ``path``, zipped if it ends in ``.zip``."""
+    frame = events_frame(rows, seed)
+    if not path.endswith(".zip"):
+        frame.to_csv(path, index=False)
+        return
+    buffer = io.StringIO()
+    frame.to_csv(buffer, index=False)
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as z:
+        z.writestr("GEDEvent_synthetic.csv", buffer.getvalue())
+
+
+# Codebook entries for the columns of ``events_frame``.
+_VARIABLES: Dict[str, str] = {
+    "id": "A unique identifier for each event.",
+    "relid": "A unique identifier across UCDP releases, made of country, year and a running number.",
+    "year": "The year of the event.",
+    "active_year": "1 if the event belongs to a dyad-year that reached 25 battle-related deaths, otherwise 0.",
+    "code_status": "Status of the coding of the event, such as Clear or Check.",
+    "type_of_violence": "1 for state-based conflict, 2 for non-state conflict and 3 for one-sided violence.",
+    "conflict_new_id": "The identifier of the conflict the event belongs to.",
+    "conflict_name": "The name of the conflict the event belongs to.",
+    "dyad_new_id": "The identifier of the dyad the event belongs to.",
+    "dyad_name": "The name of the dyad, side A and side B separated by a dash.",
+    "side_a": "The name of side A in the dyad; in state-based conflicts always a government.",
+    "side_b": "The name of side B in the dyad.",
+    "number_of_sources": "The number of sources the event is based on.",
+    "source_article": "The source articles the event is based on, with outlet and date.",
+    "where_prec": "The precision of the location, from 1 (exact location) to 7 (international waters).",
+    "adm_1": "The first-order administrative division where the event took place.",
+    "latitude": "The latitude of the location in decimal degrees.",
+    "longitude": "The longitude of the location in decimal degrees.",
+    "country": "The country in which the event took place.",
+    "country_id": "The Gleditsch and Ward number of the country.",
+    "region": "The region of the country: Africa, Americas, Asia, Europe or Middle East.",
+    "event_clarity": "1 if the event is clearly described, 2 if it is a summary of several incidents.",
+    "date_prec": "The precision of the dates, from 1 (exact date) to 5 (known only to a year).",
+    "date_start": "The earliest possible day of the event.",
+    "date_end": "The last possible day of the event.",
+    "deaths_a": "The best estimate of deaths sustained by side A.",
+    "deaths_b": "The best estimate of deaths sustained by side B.",
+    "deaths_civilians": "The best estimate of civilian deaths.",
+    "deaths_unknown": "The best estimate of deaths of persons of unknown status.",
+    "best": "The best (most likely) estimate of total fatalities resulting from the event.",
+    "high": "The highest reasonable estimate of total fatalities resulting from the event.",
+    "low": "The lowest reasonable estimate of total fatalities resulting from the event.",
+}
+
+_FILLER = (
+    "Coders follow the definitions in this section strictly. Where sources disagree, the information "
+    "from the most reliable source is used and the disagreement is reflected in the low and high "
+    "estimates. Events that cannot be located more precisely than the country are coded with the "
+    "coordinates of the country centroid and the corresponding precision code."
+)
+
+
+def codebook_pages(pages: int = 40) -> List[str]:
+    """Return the text of a synthetic codebook of ``pages`` pages."""
+    lines = ["UCDP Georeferenced Event Dataset Codebook (synthetic)", ""]
+    for section in range(1, pages // 4 + 1):
+        lines += [f"{section}. Coding rules, part {section}", _FILLER, _FILLER, ""]
+    lines += ["Variables", ""]
+    for name, description in _VARIABLES.items():
+        lines += [f"{name}", description, _FILLER, ""]
+    per_page = max(1, -(-len(lines) // pages))
+    return ["\n".join(lines[i:i + per_page]) for i in range(0, len(lines), per_page)][:pages]
+
+
+def _escape(text: str) -> bytes:
+    """Escape text for a PDF string literal."""
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)").encode("latin-1", "replace")
+
+
+def _wrap(text: str, width: int = 95) -> List[str]:
+    """Wrap one line of text at ``width`` characters."""
+    words, lines, line = text.split(), [], ""
+    for word in words:
+        if line and len(line) + 1 + len(word) > width:
+            lines.append(line)
+            line = word
+        else:
+            line = f"{line} {word}" if line else word
+    return lines + [line]
+
+
+def write_codebook_pdf(path: str, pages: int = 40) -> None:
+    """Write a synthetic codebook of ``pages`` pages as a PDF with a text layer."""
+    objects: List[bytes] = []
+
+    def add(body: bytes) -> int:
+        objects.append(body)
+        return len(objects)
+
+    font = add(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+    texts = codebook_pages(pages)
+    pages_id = font + 2 * len(texts) + 1
+    page_ids = []
+    for text in texts:
+        lines = [wrapped for line in text.split("\n") for wrapped in _wrap(line)]
+        stream = b"BT /F1 9 Tf 50 780 Td 11 TL " + b" ".join(b"(" + _escape(line) + b") '" for line in lines) + b" ET"
+        content = add(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        page_ids.append(add(
+            b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 612 792] /Contents %d 0 R "
+            b"/Resources << /Font << /F1 %d 0 R >> >> >>" % (pages_id, content, font)
+        ))
+    add(b"<< /Type /Pages /Kids [" + b" ".join(b"%d 0 R" % i for i in page_ids) + b"] /Count %d >>" % len(page_ids))
+    catalog = add(b"<< /Type /Catalog /Pages %d 0 R >>" % pages_id)
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, catalog, xref)
+    with open(path, "wb") as f:
+        f.write(out)
@@ -2,7 +2,30 @@
 Base class for all agents.
 """
 
+import asyncio
+import contextvars
 from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, TypeVar
+
+from polaris.core.config import SOURCE_LOAD_WORKERS
+
+T = TypeVar("T")
+
+# Bounded pool shared by the agents for per-source work (downloads, extraction, parsing).
+source_executor = ThreadPoolExecutor(max_workers=SOURCE_LOAD_WORKERS, thread_name_prefix="polaris-source")
+
+
+def map_sources(fn: Callable[..., T], items: Dict[str, object]) -> Dict[str, T]:
+    """Apply ``fn`` to each value of ``items`` concurrently, keyed by the same names.
+
+    Work submitted here must not itself wait on ``source_executor``, or the
+    bounded pool could deadlock.  Each call runs in a copy of the caller's
+    context, so per-request state such as request timings follows the work.
+    """
+    futures = {name: source_executor.submit(contextvars.copy_context().run, fn, item) for name, item in items.items()}
+    return {name: future.result() for name, future in futures.items()}
+
 
 class BaseAgent(ABC):
     """Abstract base class for all agents."""
@@ -11,3 +34,11 @@ class BaseAgent(ABC):
     def run(self, prompt: str, **kwargs) -> str:
         """Run the agent."""
         pass
+
+    async def arun(self, *args, **kwargs):
+        """Run the agent without blocking the event loop.
+
+        Agents with blocking I/O run in a worker thread by default; agents that
+        can use async clients override this method.
+        """
+        return await asyncio.to_thread(self.run, *args, **kwargs)
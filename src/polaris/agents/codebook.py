@@ -2,48 +2,45 @@
 Agent for parsing and understanding codebooks.
 """
 
-import os
-import urllib.request
+from typing import Dict
 
-from polaris.agents.base import BaseAgent
-from polaris.core.config import load_data_sources
+from polaris.agents.base import BaseAgent, map_sources
+from polaris.core.config import DataSource, data_source_registry
 from polaris.services.data_loader import get_pdf_text_from_location
+from polaris.services.source_refresh import ensure_local, local_path_for
 
 class CodebookAgent(BaseAgent):
     """Agent for parsing and understanding codebooks."""
 
-    def run(self, sources: list[str], **kwargs) -> str:
-        """Run the agent."""
+    def run(self, sources: list[str], **kwargs) -> Dict[str, str]:
+        """Run the agent and return the codebook context of each selected source.
 
-        all_sources = load_data_sources()
-        selected_sources = [s for s in all_sources if s.name in sources]
+        The codebooks of the selected sources are loaded concurrently.
+        """
+        selected_sources = data_source_registry.get_many(sources)
+        return map_sources(self.load, {source.name: source for source in selected_sources})
 
+    def load(self, source: DataSource) -> str:
+        """Return the codebook context for one data source."""
         codebook_context = ""
 
-        # For now, we only support one data source at a time.
-        if selected_sources:
-            source = selected_sources[0]
-            if source.codebook_url:
-                # Create a path to the local codebook file.
-                file_name = source.codebook_url.split('/')[-1]
-                local_path = os.path.join("src", "polaris", "data", file_name)
-
-                # Check if the file exists.
-                if not os.path.exists(local_path):
-                    print(f"Downloading codebook from: {source.codebook_url}")
-                    urllib.request.urlretrieve(source.codebook_url, local_path)
-                
-                print(f"Loading codebook from: {local_path}")
-                codebook_context = get_pdf_text_from_location(local_path)
-
-            elif "ucdp" in source.name.lower():
-                codebook_context = """
-                The UCDP Georeferenced Event Dataset has the following relevant columns:
-                - country: The country where the event took place.
-                - year: The year of the event.
-                - best: The best estimate of the total number of fatalities.
-                - high: The high estimate of the total number of fatalities.
-                - low: The low estimate of the total number of fatalities.
-                """
+        if source.codebook_url:
+            # Download the codebook unless it is already there; it is refreshed in the background.
+            local_path = ensure_local(source.codebook_url, local_path_for(source.codebook_url))
+
+            print(f"Loading codebook from: {local_path}")
+            codebook_context = get_pdf_text_from_location(local_path)
+
+        elif "ucdp" in source.name.lower():
+            codebook_context = """
+            The UCDP Georeferenced Event Dataset has the following relevant columns:
+            - country: The country where the event took place.
+            - region: The region where the event took place.
+            - year: The year of the event.
+            - date_start: The earliest possible date of the event (YYYY-MM-DD).
+            - best: The best estimate of the total number of fatalities.
+            - high: The high estimate of the total number of fatalities.
+            - low: The low estimate of the total number of fatalities.
+            """
         
         return codebook_context
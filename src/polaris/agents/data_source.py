@@ -2,49 +2,55 @@
 Agent for loading data from data sources.
 """
 
-import pandas as pd
 import os
-import urllib.request
+import shutil
+import threading
 import zipfile
+from typing import Dict
 
-from polaris.agents.base import BaseAgent
-from polaris.core.config import load_data_sources
+from polaris.agents.base import BaseAgent, map_sources
+from polaris.core.config import DATA_DIR, DataSource, data_source_registry
+from polaris.services import metrics
+from polaris.services.data_loader import STREAM_CHUNK_SIZE
+from polaris.services.source_refresh import ensure_local, local_path_for
 
 class DataSourceAgent(BaseAgent):
     """Agent for loading data from data sources."""
 
-    def run(self, sources: list[str], **kwargs) -> str:
-        """Run the agent and return the path to the csv file."""
-
-        all_sources = load_data_sources()
-        selected_sources = [s for s in all_sources if s.name in sources]
-
-        # For now, we only support one data source at a time.
-        if selected_sources:
-            source = selected_sources[0]
-            
-            # Create a path to the local data file.
-            file_name = source.url.split('/')[-1]
-            local_path = os.path.join("src", "polaris", "data", file_name)
-
-            # Check if the file exists.
-            if not os.path.exists(local_path):
-                print(f"Downloading data from: {source.url}")
-                urllib.request.urlretrieve(source.url, local_path)
-            
-            if local_path.endswith('.zip'):
-                with zipfile.ZipFile(local_path, 'r') as zip_ref:
-                    # Find the first CSV file in the zip archive
-                    csv_file_name = next((f for f in zip_ref.namelist() if f.endswith('.csv')), None)
-                    if csv_file_name:
-                        # Extract the file with a new name based on the data source name.
-                        extracted_file_path = os.path.join("src", "polaris", "data", f"{source.name}.csv")
-                        with zip_ref.open(csv_file_name) as zf, open(extracted_file_path, 'wb') as f:
-                            f.write(zf.read())
-                        return extracted_file_path
-                    else:
-                        raise ValueError("No CSV file found in the zip archive.")
+    def run(self, sources: list[str], **kwargs) -> Dict[str, str]:
+        """Run the agent and return the path to the csv file of each selected source.
+
+        The selected sources are downloaded and extracted concurrently.
+        """
+        selected_sources = data_source_registry.get_many(sources)
+        return map_sources(self.fetch, {source.name: source for source in selected_sources})
+
+    def fetch(self, source: DataSource) -> str:
+        """Download and extract one data source and return the path to its csv file."""
+        # Download the data file unless it is already there; it is refreshed in the background.
+        local_path = ensure_local(source.url, local_path_for(source.url))
+
+        if not local_path.endswith('.zip'):
+            return local_path
+
+        # Extract the file with a new name based on the data source name.
+        extracted_file_path = os.path.join(DATA_DIR, f"{source.name}.csv")
+
+        # Only extract again if the archive is newer than the extracted file,
+        # so that the extracted file keeps a stable mtime for caching.
+        if (os.path.exists(extracted_file_path)
+                and os.path.getmtime(extracted_file_path) >= os.path.getmtime(local_path)):
+            return extracted_file_path
+
+        with zipfile.ZipFile(local_path, 'r') as zip_ref:
+            # Find the first CSV file in the zip archive
+            csv_file_name = next((f for f in zip_ref.namelist() if f.endswith('.csv')), None)
+            if csv_file_name:
+                # Extract to a temporary file first so readers never see a partial file.
+                tmp_path = f"{extracted_file_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+                with metrics.stage("source.extract"), zip_ref.open(csv_file_name) as zf, open(tmp_path, 'wb') as f:
+                    shutil.copyfileobj(zf, f, STREAM_CHUNK_SIZE)
+                os.replace(tmp_path, extracted_file_path)
+                return extracted_file_path
             else:
-                return local_path
-        
-        return None
+                raise ValueError("No CSV file found in the zip archive.")
@@ -1,15 +1,189 @@
 """
 Orchestrator agent that decides which agent to call.
+
+A question is answered by one of the data analysis functions.  The function
+call is planned in two tiers: common question shapes are resolved by the
+rule-based router without calling the LLM, and the rest are sent to the model
+as native tool calls or with its output constrained to a JSON schema, so the
+reply is always a well-formed function call.
 """
 
+import asyncio
+import hashlib
+import inspect
 import json
-import ollama
+import os
+import time
+from typing import AsyncIterator, Dict, List, NamedTuple, Optional, Tuple
 
-from polaris.agents.base import BaseAgent
+from polaris.agents.base import BaseAgent, map_sources
 from polaris.agents.data_source import DataSourceAgent
 from polaris.agents.codebook import CodebookAgent
-from polaris.services.data_loader import load_csv
-from polaris.services import data_analysis
+from polaris.agents.router import route
+from polaris.core.config import CODEBOOK_CONTEXT_TOKENS, INGEST_IN_MEMORY_MAX_MB, PLANNER_FAST_PATH, PLANNER_TOOL_CALLING
+from polaris.core.lazy import lazy_import
+from polaris.services.data_loader import iter_columnar_batches, load_dataset
+from polaris.services import data_analysis, metrics, query_engine
+from polaris.services.codebook_retrieval import codebook_retriever
+from polaris.services.dataframe_cache import dataframe_cache
+from polaris.services.ingest import ensure_columnar
+from polaris.services.response_cache import response_cache
+
+ollama = lazy_import("ollama")
+
+# Functions the LLM can choose from to answer a question.
+available_functions = {
+    "get_total_fatalities": data_analysis.get_total_fatalities,
+    "get_monthly_fatalities": data_analysis.get_monthly_fatalities,
+    "get_fatalities_by_year": data_analysis.get_fatalities_by_year,
+    "get_top_countries": data_analysis.get_top_countries,
+    "get_region_totals": data_analysis.get_region_totals,
+    "run_query": query_engine.run_query,
+}
+
+
+def describe_functions() -> str:
+    """Describe the available functions for the function-calling prompt."""
+    lines = []
+    for name, function in available_functions.items():
+        parameters = [p for p in inspect.signature(function).parameters if p != "index"]
+        summary = inspect.getdoc(function).splitlines()[0]
+        lines.append(f"- {name}({', '.join(parameters)}): {summary}")
+    return "\n        ".join(lines)
+
+
+_JSON_TYPES = {str: "string", int: "integer", float: "number", bool: "boolean"}
+
+
+def _parameter_schema(function, sources: List[str]) -> dict:
+    """Return the JSON schema of a function's parameters, with a ``source`` choice for several sources."""
+    properties, required = {}, []
+    for name, parameter in inspect.signature(function).parameters.items():
+        if name in ("df", "index"):
+            continue
+        properties[name] = {"type": _JSON_TYPES.get(parameter.annotation, "string")}
+        if name == "plan":
+            properties[name] = query_engine.PLAN_SCHEMA
+        if name == "estimate":
+            properties[name]["enum"] = list(data_analysis.ESTIMATES)
+        if parameter.default is inspect.Parameter.empty:
+            required.append(name)
+    if len(sources) > 1:
+        properties["source"] = {"type": "string", "enum": list(sources)}
+    return {"type": "object", "properties": properties, "required": required}
+
+
+def function_tools(sources: List[str]) -> List[dict]:
+    """Describe the available functions as Ollama tools."""
+    return [
+        {
+            "type": "function",
+            "function": {
+                "name": name,
+                "description": inspect.getdoc(function).splitlines()[0],
+                "parameters": _parameter_schema(function, sources),
+            },
+        }
+        for name, function in available_functions.items()
+    ]
+
+
+def reply_schema(sources: List[str]) -> dict:
+    """Return the JSON schema that constrains the model's reply to a valid function call."""
+    variants = []
+    for name, function in available_functions.items():
+        parameters = _parameter_schema(function, [])
+        variant = {
+            "type": "object",
+            "properties": {"function": {"type": "string", "const": name}, "parameters": parameters},
+            "required": ["function", "parameters"],
+        }
+        if len(sources) > 1:
+            variant["properties"]["source"] = {"type": "string", "enum": list(sources)}
+            variant["required"].append("source")
+        variants.append(variant)
+    return {"anyOf": variants}
+
+
+def load_indexed_dataset(path: str) -> data_analysis.Dataset:
+    """Load a dataset and build its aggregate index, so both are cached together.
+
+    Columnar files larger than ``INGEST_IN_MEMORY_MAX_MB`` are not loaded; their
+    index is folded together one record batch at a time instead.
+    """
+    with metrics.stage("dataset.load"):
+        if path.endswith(".arrow") and os.path.getsize(path) > INGEST_IN_MEMORY_MAX_MB * 1024 * 1024:
+            print(f"Building the aggregate index of {path} in chunks")
+            return data_analysis.Dataset(None, index=data_analysis.AggregateIndex.from_chunks(iter_columnar_batches(path)))
+        df = load_dataset(path)
+        return data_analysis.Dataset(df) if df is not None else None
+
+
+class AnalysisError(Exception):
+    """Raised when an analysis cannot be run.  The message is returned to the user."""
+
+
+class Analysis(NamedTuple):
+    """The loaded datasets, codebooks and data files (by source name) for one question.
+
+    ``agent_prompt`` and ``version`` are only set by ``with_prompt``, once the
+    question is known to need the LLM.
+    """
+
+    datasets: Dict[str, data_analysis.Dataset]
+    codebooks: Dict[str, str]
+    data_paths: Dict[str, str]
+    agent_prompt: str = ""
+    version: str = ""
+
+
+def dataset_version(data_paths: Dict[str, str], codebook_context: str) -> str:
+    """Identify the datasets, codebooks and function list an LLM reply was based on."""
+    stats = [(name, os.stat(path)) for name, path in sorted(data_paths.items())]
+    files = ";".join(f"{name}:{stat.st_mtime_ns}:{stat.st_size}" for name, stat in stats)
+    context = hashlib.sha256((describe_functions() + codebook_context).encode("utf-8")).hexdigest()
+    return f"{files}:{context[:16]}"
+
+
+# Errors raised when an LLM reply does not contain a usable function call.
+PARSE_ERRORS = (ValueError, KeyError, TypeError, IndexError)
+
+
+def parse_function_call(function_call_json: str) -> Tuple[str, dict, Optional[str]]:
+    """Extract the function name, parameters and optional data source name from an LLM reply."""
+    # Extract the JSON object from the response.
+    if "```" in function_call_json:
+        function_call_json = function_call_json.split("```")[1]
+        if function_call_json.lower().startswith("json"): 
+            function_call_json = function_call_json[4:]
+
+    function_call = json.loads(function_call_json)
+    source = function_call.get("source")
+    return str(function_call["function"]), dict(function_call["parameters"]), source and str(source)
+
+
+def reply_content(response) -> str:
+    """Return an LLM reply as function-call JSON, converting a native tool call if there is one."""
+    message = response["message"]
+    tool_calls = message.get("tool_calls") if hasattr(message, "get") else None
+    if not tool_calls:
+        return message["content"]
+    arguments = dict(tool_calls[0]["function"]["arguments"])
+    call = {"function": tool_calls[0]["function"]["name"], "parameters": arguments}
+    if "source" in arguments:
+        call["source"] = arguments.pop("source")
+    return json.dumps(call)
+
+
+def _messages(agent_prompt: str) -> list[dict]:
+    """Build the chat messages for a function-calling prompt."""
+    return [
+        {
+            "role": "user",
+            "content": agent_prompt,
+        },
+    ]
+
 
 class OrchestratorAgent(BaseAgent):
     """Orchestrator agent that decides which agent to call."""
@@ -17,40 +191,94 @@ class OrchestratorAgent(BaseAgent):
     def __init__(self):
         self.data_source_agent = DataSourceAgent()
         self.codebook_agent = CodebookAgent()
+        # Models that rejected native tool calls; they get schema-constrained output instead.
+        self._models_without_tools = set()
 
-    def run(self, prompt: str, **kwargs) -> str:
-        """Run the agent."""
-        
-        sources = kwargs.get("sources", [])
-        model = kwargs.get("model", "llama3")
+    def load_sources(self, sources: list[str]) -> Tuple[Dict[str, str], Dict[str, Tuple[str, data_analysis.Dataset]]]:
+        """Download and load the selected sources.
 
-        if not sources:
-            return "Please select a data source to start the analysis."
+        Returns the codebook context of each source, and the path of its data
+        file with the loaded dataset.  Raises ``AnalysisError`` if a source
+        cannot be loaded.
+        """
+        # 1. Get data paths (all selected sources are downloaded concurrently)
+        with metrics.stage("orchestrator.download"):
+            csv_paths = self.data_source_agent.run(sources)
+        if not csv_paths:
+            raise AnalysisError("Error: Could not get the data path from the selected source.")
 
-        # 1. Get data path
-        csv_path = self.data_source_agent.run(sources)
-        if csv_path is None:
-            return "Error: Could not get the data path from the selected source."
+        # 2. Get codebook context for each source
+        with metrics.stage("orchestrator.codebooks"):
+            codebooks = self.codebook_agent.run(sources)
 
-        # 2. Load data
-        df = load_csv(csv_path)
-        if df is None:
-            return "Error: Could not load data from the selected source."
+        # 3. Load data (converted once to a compact columnar file, then shared across requests)
+        def load(name: str) -> Tuple[str, data_analysis.Dataset]:
+            with metrics.stage("dataset.ingest"):
+                data_path = ensure_columnar(csv_paths[name], codebooks.get(name, ""))
+            return data_path, dataframe_cache.get_or_load(name, data_path, load_indexed_dataset)
 
-        # 3. Get codebook context
-        codebook_context = self.codebook_agent.run(sources)
+        with metrics.stage("orchestrator.load"):
+            loaded = map_sources(load, {name: name for name in csv_paths})
+        if any(dataset is None for _, dataset in loaded.values()):
+            raise AnalysisError("Error: Could not load data from the selected source.")
+        return codebooks, loaded
 
-        # 4. Define available functions
-        available_functions = {
-            "get_total_fatalities": data_analysis.get_total_fatalities,
-        }
+    def warm(self, sources: list[str]) -> None:
+        """Load the selected sources and index their codebooks ahead of the first question."""
+        codebooks, _ = self.load_sources(sources)
+        for codebook in codebooks.values():
+            codebook_retriever.warm(codebook)
+
+    def prepare(self, prompt: str, sources: list[str]) -> Analysis:
+        """Load the selected datasets and their codebooks.
+
+        This step is blocking (downloads, file I/O and parsing) and raises
+        ``AnalysisError`` if the data cannot be loaded.  The function-calling
+        prompt is built separately by ``with_prompt``, so questions resolved
+        by rules do not pay for codebook retrieval.
+        """
+        if not sources:
+            raise AnalysisError("Please select a data source to start the analysis.")
+
+        codebooks, loaded = self.load_sources(sources)
+        datasets = {name: dataset for name, (_, dataset) in loaded.items()}
+        data_paths = {name: data_path for name, (data_path, _) in loaded.items()}
+        return Analysis(datasets, codebooks, data_paths)
 
-        # 5. Create the prompt for function calling
+    def with_prompt(self, prompt: str, analysis: Analysis) -> Analysis:
+        """Return ``analysis`` with the function-calling prompt for ``prompt`` and its version.
+
+        This step is blocking: the question is embedded to retrieve codebook sections.
+        """
+        datasets, codebooks = analysis.datasets, analysis.codebooks
+        # Only the codebook sections relevant to the question go into the prompt,
+        # with the token budget shared between the selected sources.
+        with_codebook = [name for name in datasets if codebooks.get(name)]
+        budget = CODEBOOK_CONTEXT_TOKENS // max(len(with_codebook), 1)
+        with metrics.stage("orchestrator.codebook_retrieval"):
+            contexts = {name: codebook_retriever.context(codebooks[name], prompt, budget) for name in with_codebook}
+        codebook_context = "\n".join(
+            f"Data source '{name}':\n{contexts[name]}" if len(codebooks) > 1 else contexts[name]
+            for name in with_codebook
+        )
+        query_language = query_engine.describe_query_language({
+            name: [f"{column} ({dtype})" for column, dtype in dataset.df.dtypes.astype(str).items()]
+            for name, dataset in datasets.items() if dataset.df is not None
+        })
+        source_instruction = (
+            f"The available data sources are: {', '.join(datasets)}. "
+            f'Add a "source" key with the name of the data source to use.'
+            if len(datasets) > 1 else ""
+        )
+
+        # 4. Create the prompt for function calling
         agent_prompt = f"""
         You are a data analyst. You are given a user's question and a list of available functions.
         Your task is to choose the best function to answer the user's question and provide the necessary parameters.
         The available functions are:
-        - get_total_fatalities(df, country, year): Get the total number of fatalities for a given country and year.
+        {describe_functions()}
+
+        {query_language}
 
         {codebook_context}
 
@@ -59,38 +287,201 @@ class OrchestratorAgent(BaseAgent):
 
         Respond with a JSON object containing the function name and the parameters. For example:
         {{"function": "get_total_fatalities", "parameters": {{"country": "Syria", "year": 2020}}}}
+        {source_instruction}
         """
+        return analysis._replace(agent_prompt=agent_prompt, version=dataset_version(analysis.data_paths, codebook_context))
 
-        # 6. Call the LLM to get the function call
-        response = ollama.chat(
-            model=model,
-            messages=[
-                {
-                    "role": "user",
-                    "content": agent_prompt,
-                },
-            ],
-        )
-        function_call_json = response["message"]["content"]
-        print(f"---LLM response---\n{function_call_json}\n---")
+    def fast_path(self, prompt: str, analysis: Analysis, meta: Optional[dict]) -> Optional[str]:
+        """Return the function call for a common question shape without the LLM, or ``None``."""
+        with metrics.stage("orchestrator.route"):
+            call = route(prompt, analysis.datasets) if PLANNER_FAST_PATH else None
+        if meta is not None:
+            meta["planner"] = "rules" if call is not None else "llm"
+        if call is None:
+            return None
+        reply = {"function": call.function, "parameters": call.parameters}
+        if call.source:
+            reply["source"] = call.source
+        return json.dumps(reply)
+
+    def chat_options(self, model: str, analysis: Analysis, stream: bool = False) -> dict:
+        """Return the options that make the model reply with a function call."""
+        sources = list(analysis.datasets)
+        if PLANNER_TOOL_CALLING and not stream and model not in self._models_without_tools:
+            return {"tools": function_tools(sources)}
+        return {"format": reply_schema(sources)}
+
+    def tools_rejected(self, model: str, options: dict, error: "ollama.ResponseError") -> bool:
+        """Record that ``model`` does not support tools if the failed call used them; return whether it did."""
+        if "tools" not in options:
+            return False
+        print(f"Model '{model}' rejected tool calling, using schema-constrained output instead: {error}")
+        self._models_without_tools.add(model)
+        return True
+
+    def cached_reply(self, prompt: str, model: str, sources: list[str], analysis: Analysis, meta: Optional[dict]) -> Tuple[str, Optional[str]]:
+        """Look up a cached LLM reply for this question and record the outcome in ``meta``."""
+        key = response_cache.make_key(model, prompt, sources, analysis.version)
+        content = response_cache.get(key)
+        if meta is not None:
+            meta["cache"] = "hit" if content is not None else "miss"
+        return key, content
+
+    def remember_reply(self, key: str, model: str, content: str) -> None:
+        """Cache an LLM reply, unless it does not contain a usable function call."""
+        try:
+            parse_function_call(content)
+        except PARSE_ERRORS:
+            return
+        response_cache.put(key, model, content)
+
+    def execute(self, datasets: Dict[str, data_analysis.Dataset], function_call_json: str) -> str:
+        """Parse the function call chosen by the LLM and execute the function.
 
-        # 7. Parse the function call and execute the function
+        The function runs on the data source named in the call, or on the first
+        selected source if the call does not name one.
+        """
+        print(f"---LLM response---\n{function_call_json}\n---")
         try:
-            # Extract the JSON object from the response.
-            if "```" in function_call_json:
-                function_call_json = function_call_json.split("```")[1]
-                if function_call_json.lower().startswith("json"): 
-                    function_call_json = function_call_json[4:]
-            
-            function_call = json.loads(function_call_json)
-            function_name = function_call["function"]
-            parameters = function_call["parameters"]
-
-            if function_name in available_functions:
-                result = available_functions[function_name](df, **parameters)
-                return str(result)
-            else:
-                return "Error: The chosen function is not available."
-
-        except (json.JSONDecodeError, KeyError):
+            with metrics.stage("orchestrator.parse"):
+                function_name, parameters, source = parse_function_call(function_call_json)
+        except PARSE_ERRORS:
             return "Error: Could not parse the function call from the LLM."
+
+        if function_name not in available_functions:
+            return "Error: The chosen function is not available."
+
+        dataset = datasets.get(source) if source else next(iter(datasets.values()))
+        if dataset is None:
+            return f"Error: The data source '{source}' is not selected."
+
+        try:
+            with metrics.stage("orchestrator.execute"):
+                result = available_functions[function_name](dataset.df, index=dataset.index, **parameters)
+        except (TypeError, ValueError) as e:
+            return f"Error: Could not run {function_name}: {e}"
+        return str(result)
+
+    def run(self, prompt: str, **kwargs) -> str:
+        """Run the agent.
+
+        If a ``meta`` dict is passed, it is filled with response metadata such
+        as whether the question was planned by rules or by the LLM, and whether
+        the LLM reply came from the cache.
+        """
+        
+        sources = kwargs.get("sources", [])
+        model = kwargs.get("model", "llama3")
+        meta = kwargs.get("meta")
+
+        try:
+            with metrics.stage("orchestrator.prepare"):
+                analysis = self.prepare(prompt, sources)
+        except AnalysisError as e:
+            return str(e)
+
+        # 5. Resolve common questions by rules; otherwise call the LLM, unless the reply is cached
+        content = self.fast_path(prompt, analysis, meta)
+        if content is not None:
+            return self.execute(analysis.datasets, content)
+        with metrics.stage("orchestrator.prompt"):
+            analysis = self.with_prompt(prompt, analysis)
+        key, content = self.cached_reply(prompt, model, sources, analysis, meta)
+        if content is None:
+            options = self.chat_options(model, analysis)
+            with metrics.stage("orchestrator.llm"):
+                try:
+                    response = ollama.chat(model=model, messages=_messages(analysis.agent_prompt), **options)
+                except ollama.ResponseError as e:
+                    if not self.tools_rejected(model, options, e):
+                        raise
+                    response = ollama.chat(model=model, messages=_messages(analysis.agent_prompt), **self.chat_options(model, analysis))
+            metrics.record_ollama(model, response)
+            content = reply_content(response)
+            self.remember_reply(key, model, content)
+
+        # 6. Parse the function call and execute the function
+        return self.execute(analysis.datasets, content)
+
+    async def arun(self, prompt: str, **kwargs) -> str:
+        """Run the agent without blocking the event loop."""
+
+        sources = kwargs.get("sources", [])
+        model = kwargs.get("model", "llama3")
+        meta = kwargs.get("meta")
+
+        try:
+            with metrics.stage("orchestrator.prepare"):
+                analysis = await asyncio.to_thread(self.prepare, prompt, sources)
+        except AnalysisError as e:
+            return str(e)
+
+        # Functions such as run_query can scan a whole dataset, so they run off the event loop too.
+        content = self.fast_path(prompt, analysis, meta)
+        if content is not None:
+            return await asyncio.to_thread(self.execute, analysis.datasets, content)
+        with metrics.stage("orchestrator.prompt"):
+            analysis = await asyncio.to_thread(self.with_prompt, prompt, analysis)
+        # The response cache is SQLite; its queries run off the event loop.
+        key, content = await asyncio.to_thread(self.cached_reply, prompt, model, sources, analysis, meta)
+        if content is None:
+            options = self.chat_options(model, analysis)
+            client = ollama.AsyncClient()
+            with metrics.stage("orchestrator.llm"):
+                try:
+                    response = await client.chat(model=model, messages=_messages(analysis.agent_prompt), **options)
+                except ollama.ResponseError as e:
+                    if not self.tools_rejected(model, options, e):
+                        raise
+                    response = await client.chat(model=model, messages=_messages(analysis.agent_prompt), **self.chat_options(model, analysis))
+            metrics.record_ollama(model, response)
+            content = reply_content(response)
+            await asyncio.to_thread(self.remember_reply, key, model, content)
+        return await asyncio.to_thread(self.execute, analysis.datasets, content)
+
+    async def astream(self, prompt: str, **kwargs) -> AsyncIterator[dict]:
+        """Run the agent and yield LLM tokens as they are generated, then the result.
+
+        Yields ``{"type": "token", "content": ...}`` events followed by a single
+        ``{"type": "result", "response": ..., "metadata": ...}`` event.  A cached
+        reply or a question resolved by rules is not streamed; only the result
+        event is sent.
+        """
+
+        sources = kwargs.get("sources", [])
+        model = kwargs.get("model", "llama3")
+        meta = {}
+
+        try:
+            with metrics.stage("orchestrator.prepare"):
+                analysis = await asyncio.to_thread(self.prepare, prompt, sources)
+        except AnalysisError as e:
+            yield {"type": "result", "response": str(e), "metadata": meta}
+            return
+
+        content = self.fast_path(prompt, analysis, meta)
+        if content is not None:
+            response = await asyncio.to_thread(self.execute, analysis.datasets, content)
+            yield {"type": "result", "response": response, "metadata": meta}
+            return
+        with metrics.stage("orchestrator.prompt"):
+            analysis = await asyncio.to_thread(self.with_prompt, prompt, analysis)
+        key, content = await asyncio.to_thread(self.cached_reply, prompt, model, sources, analysis, meta)
+        if content is None:
+            chunks = []
+            started = time.perf_counter()
+            stream = await ollama.AsyncClient().chat(
+                model=model, messages=_messages(analysis.agent_prompt), stream=True, **self.chat_options(model, analysis, stream=True)
+            )
+            async for part in stream:
+                token = part["message"]["content"]
+                chunks.append(token)
+                if part.get("done"):
+                    metrics.record_ollama(model, part)
+                yield {"type": "token", "content": token}
+            metrics.record("orchestrator.llm", time.perf_counter() - started)
+            content = "".join(chunks)
+            await asyncio.to_thread(self.remember_reply, key, model, content)
+
+        response = await asyncio.to_thread(self.execute, analysis.datasets, content)
+        yield {"type": "result", "response": response, "metadata": meta}
@@ -0,0 +1,175 @@
+"""
+Rule-based fast path for common data questions.
+
+Most questions have one of a few shapes: fatalities in a country in a year or
+a month, per year over a range of years, the top countries, or the totals per
+region.  These shapes are matched against the country names of the selected
+datasets and resolved to a function call without calling the LLM.
+
+The matcher is deliberately strict.  A question is left to the LLM if it
+names more than one country, asks for analysis the functions do not do
+(comparisons, ratios, averages, ...), lacks a required value, or could be
+answered from more than one selected dataset.
+"""
+
+import re
+import weakref
+from typing import Dict, List, NamedTuple, Optional, Pattern, Tuple
+
+from polaris.services.data_analysis import AggregateIndex, Dataset, _norm
+
+_METRIC = re.compile(r"\b(fatalit\w*|deaths?|deadl\w*|killed|killings?|casualt\w*|dead|died|lives lost|violent)\b")
+_UNSUPPORTED = re.compile(
+    r"\b(compar\w*|versus|vs|ratio|percent\w*|proportion|share|average|mean|median|per capita|why|"
+    r"differen\w*|increase\w*|decrease\w*|change\w*|growth|trend\w*|rank\w*|excluding|except|without|not)\b"
+)
+_YEAR = r"(1[89]\d\d|20\d\d)"
+_RANGE = re.compile(rf"\b(?:between {_YEAR} and {_YEAR}|from {_YEAR} (?:to|until|through) {_YEAR}|{_YEAR} ?(?:-|–|to) ?{_YEAR})\b")
+_SINCE = re.compile(rf"\b(?:since|after|from) {_YEAR}\b")
+_YEARS = re.compile(rf"\b{_YEAR}\b")
+_PER_YEAR = re.compile(r"\b(per year|by year|each year|every year|annual\w*|yearly|year by year|over the years)\b")
+_TOP = re.compile(
+    r"\b(?:top|most|deadliest|highest|worst)\b(?:\s+(\d{1,2}))?(?:\s+\w+){0,3}?\s+countries\b"
+    r"|\bwhich (?:(\d{1,2}) )?countries\b.*\b(?:most|highest|deadliest|worst)\b"
+)
+_REGIONS = re.compile(r"\bregions?\b")
+_ESTIMATE = re.compile(r"\b(high|low|best)(?:est)? estimates?\b|\b(upper|lower) (?:bound|estimate)\b")
+
+_MONTHS = {
+    name: number
+    for number, names in enumerate([
+        ("january", "jan"), ("february", "feb"), ("march", "mar"), ("april", "apr"), ("may",), ("june", "jun"),
+        ("july", "jul"), ("august", "aug"), ("september", "sep", "sept"), ("october", "oct"),
+        ("november", "nov"), ("december", "dec"),
+    ], start=1)
+    for name in names
+}
+# A month only counts when it is directly followed by a year, so "may" as a verb is not a month.
+_MONTH_YEAR = re.compile(rf"\b({'|'.join(sorted(_MONTHS, key=len, reverse=True))})\.?,? (?:of )?{_YEAR}\b")
+_ISO_MONTH = re.compile(rf"\b{_YEAR}-(0[1-9]|1[0-2])\b")
+
+# Default number of countries for "top countries" questions.
+DEFAULT_TOP_K = 5
+
+
+class FunctionCall(NamedTuple):
+    """A function call chosen for a question, in the format the LLM is asked to produce."""
+
+    function: str
+    parameters: dict
+    source: Optional[str] = None
+
+
+# Country names of each aggregate index and a pattern matching them, built once per index.
+_vocabularies: "weakref.WeakKeyDictionary[AggregateIndex, Tuple[Dict[str, str], Optional[Pattern]]]" = weakref.WeakKeyDictionary()
+
+
+def _vocabulary(index: AggregateIndex) -> Tuple[Dict[str, str], Optional[Pattern]]:
+    """Return the normalised country names of an index, mapped to their labels, and a pattern matching them."""
+    if index not in _vocabularies:
+        frame = index.country_year if index.country_year is not None else index.country_month
+        countries: Dict[str, str] = {}
+        if frame is not None:
+            for label in frame.index.get_level_values("country").unique():
+                countries.setdefault(_norm(label), str(label))
+        names = sorted((name for name in countries if name), key=len, reverse=True)
+        pattern = re.compile(rf"(?<!\w)({'|'.join(map(re.escape, names))})(?!\w)") if names else None
+        _vocabularies[index] = (countries, pattern)
+    return _vocabularies[index]
+
+
+def _estimate(question: str) -> str:
+    """Return the fatality estimate asked for, ``best`` by default."""
+    match = _ESTIMATE.search(question)
+    if not match:
+        return "best"
+    word = match.group(1) or match.group(2)
+    return {"upper": "high", "lower": "low"}.get(word, word)
+
+
+def _year_range(question: str) -> Tuple[Optional[int], Optional[int], bool]:
+    """Return the start and end year of a range in the question, and whether one was found."""
+    match = _RANGE.search(question)
+    if match:
+        years = sorted(int(y) for y in match.groups() if y)
+        return years[0], years[-1], True
+    match = _SINCE.search(question)
+    if match:
+        return int(match.group(1)), None, True
+    return None, None, False
+
+
+def _plan(question: str, index: AggregateIndex) -> Optional[FunctionCall]:
+    """Resolve a question against one dataset's index, or return ``None``."""
+    estimate = _estimate(question)
+    if estimate not in index.estimates:
+        return None
+    countries, pattern = _vocabulary(index)
+    found = {match for match in pattern.findall(question)} if pattern is not None else set()
+    start_year, end_year, has_range = _year_range(question)
+    years = sorted({int(y) for y in _YEARS.findall(question)})
+
+    if not _METRIC.search(question):
+        return None
+
+    top = _TOP.search(question)
+    if top and not found and index.country_year is not None:
+        parameters = {"k": int(top.group(1) or top.group(2) or DEFAULT_TOP_K), "estimate": estimate}
+        if has_range:
+            parameters.update(start_year=start_year, end_year=end_year)
+        elif len(years) == 1:
+            parameters.update(start_year=years[0], end_year=years[0])
+        elif years:
+            return None
+        return FunctionCall("get_top_countries", parameters)
+
+    if _REGIONS.search(question) and not found and index.region_year is not None:
+        parameters = {"estimate": estimate}
+        if has_range:
+            parameters.update(start_year=start_year, end_year=end_year)
+        elif len(years) == 1:
+            parameters.update(start_year=years[0], end_year=years[0])
+        elif years:
+            return None
+        return FunctionCall("get_region_totals", parameters)
+
+    if len(found) != 1:
+        return None
+    country = countries[found.pop()]
+
+    month = _MONTH_YEAR.search(question)
+    iso_month = _ISO_MONTH.search(question)
+    if (month or iso_month) and len(years) == 1 and index.country_month is not None:
+        number = _MONTHS[month.group(1)] if month else int(iso_month.group(2))
+        return FunctionCall("get_monthly_fatalities", {"country": country, "year": years[0], "month": number, "estimate": estimate})
+    if month or iso_month or index.country_year is None:
+        return None
+
+    if has_range or _PER_YEAR.search(question):
+        if not has_range and years:
+            return None
+        return FunctionCall("get_fatalities_by_year", {"country": country, "start_year": start_year, "end_year": end_year, "estimate": estimate})
+
+    if len(years) == 1:
+        return FunctionCall("get_total_fatalities", {"country": country, "year": years[0], "estimate": estimate})
+    return None
+
+
+def route(question: str, datasets: Dict[str, Dataset]) -> Optional[FunctionCall]:
+    """Return the function call that answers ``question`` without the LLM, or ``None``.
+
+    With several datasets, the question must resolve in exactly one of them,
+    which becomes the call's source.
+    """
+    question = " ".join(question.casefold().replace("?", " ").split())
+    if _UNSUPPORTED.search(question):
+        return None
+    calls: List[Tuple[str, FunctionCall]] = []
+    for name, dataset in datasets.items():
+        call = _plan(question, dataset.index)
+        if call is not None:
+            calls.append((name, call))
+    if len(calls) != 1:
+        return None
+    name, call = calls[0]
+    return call._replace(source=name) if len(datasets) > 1 else call
@@ -0,0 +1,102 @@
+"""
+Router for the /admin endpoints.
+
+These endpoints expose operational controls such as inspecting and evicting
+entries from the process-wide dataset cache and the LLM response cache,
+revalidating downloaded source files and filling the local event store.
+"""
+
+from typing import List, Optional
+
+from fastapi import APIRouter, Query
+
+from polaris.core.config import EVENT_INGEST_LOOKBACK_DAYS, EVENT_INGEST_QUERIES
+from polaris.services.dataframe_cache import dataframe_cache
+from polaris.services.dedupe import dedupe_index
+from polaris.services.event_ingester import ingest
+from polaris.services.event_store import event_store
+from polaris.services.llm_service import single_flight
+from polaris.services.news_fetcher import bucket_stats
+from polaris.services.response_cache import response_cache
+from polaris.services.search_index import search_index
+from polaris.services.source_refresh import refresh_sources
+
+
+router = APIRouter(prefix="/admin", tags=["admin"])
+
+
+@router.get("/cache")
+def get_cache() -> dict:
+    """Return the dataset cache statistics and its entries."""
+    return {"stats": dataframe_cache.stats(), "entries": dataframe_cache.entries()}
+
+
+@router.delete("/cache")
+def evict_cache(name: Optional[str] = Query(None, description="Data source name to evict; all entries if omitted")) -> dict:
+    """Evict cached datasets for one data source, or all of them."""
+    evicted = dataframe_cache.evict(name)
+    return {"evicted": evicted}
+
+
+@router.get("/response-cache")
+def get_response_cache() -> dict:
+    """Return the LLM response cache statistics, including the hit rate."""
+    return response_cache.stats()
+
+
+@router.delete("/response-cache")
+def clear_response_cache() -> dict:
+    """Remove all cached LLM responses."""
+    return {"evicted": response_cache.clear()}
+
+
+@router.get("/coalescing")
+def get_coalescing() -> dict:
+    """Return how many LLM calls were made and how many were coalesced into identical in-flight calls."""
+    return single_flight.stats()
+
+
+@router.get("/gdelt-cache")
+def get_gdelt_cache() -> dict:
+    """Return the number of cached GDELT day buckets and how many fetches were shared."""
+    return bucket_stats()
+
+
+@router.get("/dedupe-index")
+def get_dedupe_index() -> dict:
+    """Return the number of canonical and indexed events in the near-duplicate index."""
+    return dedupe_index.stats()
+
+
+@router.delete("/dedupe-index")
+def clear_dedupe_index() -> dict:
+    """Remove all events from the near-duplicate index."""
+    return {"evicted": dedupe_index.clear()}
+
+
+@router.get("/event-store")
+def get_event_store() -> dict:
+    """Return the number of stored events and the days they cover."""
+    return event_store.stats()
+
+
+@router.get("/search-index")
+def get_search_index() -> dict:
+    """Return the number of events and terms in the full-text search index."""
+    return search_index.stats()
+
+
+@router.post("/ingest")
+def ingest_events(q: Optional[List[str]] = Query(None, description="Queries to fetch; defaults to the configured ingestion queries"),
+                  days: int = Query(EVENT_INGEST_LOOKBACK_DAYS, ge=1, description="Number of most recent days to fetch")) -> dict:
+    """Fetch the most recent days of the given queries into the event store now."""
+    return {"ingested": ingest(q or EVENT_INGEST_QUERIES, days)}
+
+
+@router.post("/refresh")
+def refresh(
+    name: Optional[List[str]] = Query(None, description="Data source names to refresh; all sources if omitted"),
+    force: bool = Query(False, description="Download again even if the server reports the file unchanged"),
+) -> dict:
+    """Revalidate downloaded data files and codebooks and report which ones changed."""
+    return {"refreshed": refresh_sources(name, force=force)}
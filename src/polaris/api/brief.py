@@ -6,25 +6,24 @@ a structured brief summarising what happened, why it matters, and risks.
 """
 
 import json
+import time
+from typing import AsyncIterator
+
 from fastapi import APIRouter
+from fastapi.responses import StreamingResponse
 
+from polaris.api.streaming import ndjson_response
 from polaris.models import BriefRequest, BriefResponse, BriefSection
-from polaris.prompts import create_brief_prompt
-from polaris.services.llm_service import generate_response
+from polaris.services import metrics
+from polaris.services.brief_generator import generate_brief_reply, merge_llm_meta, prepare_brief_prompt
+from polaris.services.llm_service import astream_completion
 
 
 router = APIRouter(prefix="/generate-brief", tags=["brief"])
 
 
-@router.post("", response_model=BriefResponse)
-def generate_brief(request: BriefRequest) -> BriefResponse:
-    """Generate a simple brief from the provided events.
-    
-    This endpoint uses an LLM to generate a structured brief based on the
-    provided event items.
-    """
-    prompt = create_brief_prompt(request.items, request.focus)
-    llm_response_str = generate_response(prompt)
+def build_brief(request: BriefRequest, llm_response_str: str) -> BriefSection:
+    """Build the brief section from the LLM's JSON reply."""
     sources = [item.url for item in request.items]
 
     try:
@@ -39,7 +38,7 @@ def generate_brief(request: BriefRequest) -> BriefResponse:
             indicators=brief_data.get("indicators", []),
             sources=sources,
         )
-    except (json.JSONDecodeError, TypeError):
+    except (json.JSONDecodeError, TypeError, AttributeError):
         # Fallback if the LLM response is not valid JSON
         brief_section = BriefSection(
             title=f"Brief on {request.focus or 'selected events'}",
@@ -50,4 +49,47 @@ def generate_brief(request: BriefRequest) -> BriefResponse:
             indicators=[],
             sources=sources,
         )
-    return BriefResponse(brief=brief_section)
+    return brief_section
+
+
+@router.post("", response_model=BriefResponse)
+async def generate_brief(request: BriefRequest) -> BriefResponse:
+    """Generate a simple brief from the provided events.
+    
+    This endpoint uses an LLM to generate a structured brief based on the
+    provided event items.  Large event sets are summarised in chunks first;
+    the metadata reports the number of chunks and per-stage timings.
+    """
+    meta = {}
+    llm_response_str = await generate_brief_reply(request.items, request.focus, meta=meta)
+    return BriefResponse(brief=build_brief(request, llm_response_str), metadata=meta)
+
+
+@router.post("/stream")
+async def generate_brief_stream(request: BriefRequest) -> StreamingResponse:
+    """Generate a brief, streaming the LLM tokens as NDJSON.
+
+    Each line is a ``{"type": "token", "content": ...}`` event while the model
+    is generating, followed by a final ``{"type": "brief", "brief": ...}``
+    event with the structured brief and its metadata.  For large event sets,
+    only the final reduce step is streamed.
+    """
+    async def events() -> AsyncIterator[dict]:
+        started = time.perf_counter()
+        meta = {}
+        prompt = await prepare_brief_prompt(request.items, request.focus, meta=meta)
+        stage_started = time.perf_counter()
+        stream_meta = {}
+        chunks = []
+        async for token in astream_completion(prompt, format="json", meta=stream_meta):
+            chunks.append(token)
+            yield {"type": "token", "content": token}
+        stage = "reduce" if "map_calls" in meta else "generate"
+        metrics.record(f"brief.{stage}", time.perf_counter() - stage_started)
+        meta["timings_ms"][stage] = round((time.perf_counter() - stage_started) * 1000, 1)
+        meta["timings_ms"]["total"] = round((time.perf_counter() - started) * 1000, 1)
+        merge_llm_meta(meta, meta.pop("map_calls", []) + [stream_meta])
+        brief = build_brief(request, "".join(chunks))
+        yield {"type": "brief", "brief": brief.dict(), "metadata": meta}
+
+    return ndjson_response(events())
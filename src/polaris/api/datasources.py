@@ -8,7 +8,7 @@ from typing import List
 
 from fastapi import APIRouter, HTTPException
 
-from polaris.core.config import DataSource, load_data_sources, save_data_sources
+from polaris.core.config import DataSource, data_source_registry, load_data_sources
 
 router = APIRouter(prefix="/api/datasources", tags=["datasources"])
 
@@ -23,7 +23,4 @@ def list_data_sources() -> List[DataSource]:
 
 def add_data_source(data_source: DataSource) -> DataSource:
     """Add a new data source to the configuration."""
-    sources = load_data_sources()
-    sources.append(data_source)
-    save_data_sources(sources)
-    return data_source
+    return data_source_registry.add(data_source)
@@ -7,29 +7,56 @@ specify query parameters to filter events by keywords, countries and
 date ranges.
 """
 
-from typing import List
+from typing import Iterator, List
 
 from fastapi import APIRouter, Query
+from fastapi.responses import Response, StreamingResponse
 
+from polaris.api.streaming import NDJSON_MEDIA_TYPE
 from polaris.models import EventItem
-from polaris.services.news_fetcher import fetch_events
+from polaris.services.news_fetcher import dump_events_json, fetch_events, iter_events
 
 
 router = APIRouter(prefix="/fetch-events", tags=["events"])
 
 
-@router.get("", response_model=List[EventItem])
+@router.get(
+    "",
+    response_model=List[EventItem],
+    responses={200: {
+        "description": "A JSON array of events, or with `format=ndjson` one event per line.",
+        "content": {NDJSON_MEDIA_TYPE: {"schema": {"$ref": "#/components/schemas/EventItem"}}},
+    }},
+)
 def fetch_events_endpoint(
     q: str = Query("", description="Query string for event search"),
     countries: str = Query("", description="Comma-separated country codes"),
     since: str = Query("", description="Start date (YYYY-MM-DD)"),
     until: str = Query("", description="End date (YYYY-MM-DD)"),
     max: int = Query(50, description="Maximum number of events to return"),
-) -> List[EventItem]:
+    format: str = Query("json", pattern="^(json|ndjson)$", description="Response format: a JSON array, or NDJSON streamed as events are fetched"),
+    dedupe: bool = Query(False, description="Collapse near-duplicate events (e.g. syndicated copies) into one event with a duplicates count"),
+    mode: str = Query("live", pattern="^(live|store|delta)$", description="live: query GDELT; store: answer from the local event store only; delta: fetch only the days missing from the store, then answer from it"),
+) -> Response:
     """Return a list of events.
 
     This endpoint proxies the request to the ``news_fetcher.fetch_events`` service.
-    The response is a list of ``EventItem`` objects.
+    The response is a list of ``EventItem`` objects.  The events are already
+    validated, so they are serialised directly instead of being validated again
+    against the response model.  With ``format=ndjson`` the events are streamed,
+    one JSON object per line, as they are fetched.  With ``dedupe=true``,
+    near-duplicate events are collapsed into one event whose ``duplicates``
+    field counts the other copies.  ``mode=store`` answers from the local
+    event store without calling GDELT, with the events stored for the same
+    query and country codes; ``mode=delta`` first fetches the days the store
+    is missing for them.
     """
-    events = fetch_events(q=q, countries=countries, since=since, until=until, maxrecs=max)
-    return events
+    if format == "ndjson":
+        def lines() -> Iterator[bytes]:
+            for event in iter_events(q=q, countries=countries, since=since, until=until, maxrecs=max, dedupe=dedupe, mode=mode):
+                yield event.model_dump_json().encode("utf-8") + b"\n"
+
+        return StreamingResponse(lines(), media_type=NDJSON_MEDIA_TYPE)
+
+    events = fetch_events(q=q, countries=countries, since=since, until=until, maxrecs=max, dedupe=dedupe, mode=mode)
+    return Response(content=dump_events_json(events), media_type="application/json")
@@ -2,10 +2,14 @@
 API endpoint for interacting with the LLM service.
 """
 
+from typing import AsyncIterator
+
 from fastapi import APIRouter
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 
-from polaris.services import llm_service
+from polaris.api.streaming import ndjson_response
+from polaris.services import llm_service, metrics
 
 router = APIRouter(prefix="/v1/llm", tags=["LLM"])
 
@@ -17,9 +21,33 @@ class LLMRequest(BaseModel):
 
 
 @router.post("/generate")
-def generate(request: LLMRequest) -> dict:
+async def generate(request: LLMRequest) -> dict:
     """
     Generate a response from the language model.
     """
-    response = llm_service.generate_response(prompt=request.prompt, model=request.model, sources=request.sources)
-    return {"prompt": request.prompt, "response": response}
+    meta = {}
+    response = await llm_service.agenerate_response(prompt=request.prompt, model=request.model, sources=request.sources, meta=meta)
+    return {"prompt": request.prompt, "response": response, "metadata": meta}
+
+
+@router.post("/generate/stream")
+async def generate_stream(request: LLMRequest) -> StreamingResponse:
+    """
+    Generate a response from the language model, streamed as NDJSON.
+
+    Each line is a ``{"type": "token", "content": ...}`` event while the model
+    is generating, followed by a final ``{"type": "result", "prompt": ...,
+    "response": ...}`` event.  When the request timings were asked for with
+    the debug header, the result metadata includes them as ``timings_ms``,
+    since the ``Server-Timing`` header is sent before generation starts.
+    """
+    async def events() -> AsyncIterator[dict]:
+        async for event in llm_service.stream_response(prompt=request.prompt, model=request.model, sources=request.sources):
+            if event["type"] == "result":
+                event = {"type": "result", "prompt": request.prompt, **event}
+                timings = metrics.request_timings()
+                if timings is not None:
+                    event["metadata"] = {**event.get("metadata", {}), "timings_ms": metrics.timings_ms(timings)}
+            yield event
+
+    return ndjson_response(events())
@@ -0,0 +1,72 @@
+"""
+Router for the /metrics endpoint and the middleware that times requests.
+
+``GET /metrics`` returns the process metrics in the Prometheus text format.
+The middleware counts and times every request by route, and returns the
+timings of a request in a ``Server-Timing`` header when the client sends
+``X-Polaris-Debug: timings``.  For streamed responses the header is sent
+before the body, so it only covers the stages that finished before the first
+byte.
+"""
+
+import time
+
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from polaris.core.config import DEBUG_TIMINGS
+from polaris.services import metrics
+
+
+router = APIRouter(tags=["metrics"])
+
+PROMETHEUS_MEDIA_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+def get_metrics() -> PlainTextResponse:
+    """Return the process metrics in the Prometheus text format."""
+    return PlainTextResponse(metrics.registry.render(), media_type=PROMETHEUS_MEDIA_TYPE)
+
+
+def _wants_timings(scope) -> bool:
+    for name, value in scope.get("headers", []):
+        if name.decode("latin-1").lower() == metrics.DEBUG_HEADER:
+            return metrics.DEBUG_HEADER_TIMINGS in value.decode("latin-1").lower().split(",")
+    return False
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording the duration and status of each HTTP request."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        token = metrics.start_request_timings() if DEBUG_TIMINGS and _wants_timings(scope) else None
+        status = 500
+
+        async def send_with_timings(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                timings = metrics.request_timings()
+                if token is not None and timings is not None:
+                    value = metrics.server_timing(timings, time.perf_counter() - started)
+                    message = {**message, "headers": list(message.get("headers", [])) + [(b"server-timing", value.encode("latin-1"))]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timings)
+        finally:
+            if token is not None:
+                metrics.stop_request_timings(token)
+            # Label by route template (not the raw path) so the number of series stays bounded.
+            route = getattr(scope.get("route"), "path", None) or "other"
+            metrics.http_requests.inc(method=scope["method"], route=route, status=status)
+            metrics.http_request_duration.observe(time.perf_counter() - started, method=scope["method"], route=route)
@@ -0,0 +1,32 @@
+"""
+Router for the /risk-score endpoint.
+
+This endpoint accepts an area and a window and returns a risk score with the
+components it was computed from.
+"""
+
+from fastapi import APIRouter, HTTPException
+
+from polaris.models import RiskRequest, RiskScore
+from polaris.services.risk_scorer import RETRY_AFTER_SECONDS, ScoreUnavailable, risk_score
+
+
+router = APIRouter(prefix="/risk-score", tags=["risk"])
+
+
+@router.post("", response_model=RiskScore)
+def risk_score_endpoint(request: RiskRequest) -> RiskScore:
+    """Return the risk score for an area over the last ``window_days`` days.
+
+    Delegates to the ``risk_scorer.risk_score`` service.  The components are
+    GDELT event volume and its change, mean event tone and the fatality trend
+    in the loaded datasets.  Until the events of a new area have been fetched
+    in the background, the response is 503 with a ``Retry-After`` header.  An
+    area without any GDELT article is answered with 422.
+    """
+    try:
+        return risk_score(request.area, request.window_days)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except ScoreUnavailable as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(RETRY_AFTER_SECONDS)})
@@ -4,10 +4,10 @@ Router for the /generate-scenario endpoint.
 This endpoint accepts a scenario request and returns multiple scenario variants.
 """
 
-from fastapi import APIRouter
+from fastapi import APIRouter, HTTPException
 
 from polaris.models import ScenarioRequest, ScenarioResponse
-from polaris.services.scenario_generator import generate_scenarios
+from polaris.services.scenario_generator import ScenarioLimitError, simulate_scenarios
 
 
 router = APIRouter(prefix="/generate-scenario", tags=["scenario"])
@@ -17,14 +17,23 @@ router = APIRouter(prefix="/generate-scenario", tags=["scenario"])
 def generate_scenario(request: ScenarioRequest) -> ScenarioResponse:
     """Generate scenario variants based on the provided input.
 
-    Delegates to the ``scenario_generator.generate_scenarios`` service.  The
-    returned scenarios include dummy values for demonstration.
+    Delegates to the ``scenario_generator.simulate_scenarios`` service, which
+    clusters Monte Carlo trajectories into variants.  Pass ``seed`` to
+    reproduce a run; the seed used is returned in the metadata.  Requests for
+    more actors or variants, or a longer horizon, than the configured limits
+    get a 400.
     """
-    scenarios = generate_scenarios(
-        prompt=request.prompt,
-        actors=request.actors,
-        horizon=request.time_horizon_days,
-        assumptions=request.assumptions or [],
-        variants=request.variants,
-    )
-    return ScenarioResponse(scenarios=scenarios)
+    try:
+        scenarios, metadata = simulate_scenarios(
+            prompt=request.prompt,
+            actors=request.actors,
+            horizon=request.time_horizon_days,
+            assumptions=request.assumptions or [],
+            variants=request.variants,
+            seed=request.seed,
+        )
+    except ScenarioLimitError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    return ScenarioResponse(scenarios=scenarios, metadata=metadata)
@@ -0,0 +1,44 @@
+"""
+Router for the /search-events endpoint.
+
+This endpoint searches the events in the local event store by keyword and
+returns them ranked by relevance, without calling GDELT.
+"""
+
+from typing import List
+
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import Response
+
+from polaris.models import EventItem
+from polaris.services.news_fetcher import dump_events_json
+from polaris.services.search_index import search_index
+
+
+router = APIRouter(prefix="/search-events", tags=["events"])
+
+
+@router.get("", response_model=List[EventItem])
+def search_events_endpoint(
+    q: str = Query(..., description="Keywords to search for in event titles and summaries"),
+    source_countries: str = Query("", description="Comma-separated names of the countries of the publishing sources, e.g. Syria"),
+    since: str = Query("", description="Start date (YYYY-MM-DD)"),
+    until: str = Query("", description="End date (YYYY-MM-DD), exclusive"),
+    max: int = Query(50, ge=1, le=1000, description="Maximum number of events to return"),
+) -> Response:
+    """Return the stored events that best match ``q``, most relevant first.
+
+    Delegates to ``search_index.search``, which ranks events matching any of
+    the keywords by BM25 over their titles and summaries.  Each event's
+    ``score`` is its relevance.  Only events already in the store (from
+    earlier fetches or background ingestion) are searched.  Unlike the
+    country codes of ``/fetch-events``, ``source_countries`` are the country
+    names GDELT reports for the publishing sources.  An empty query or an
+    invalid date is answered with 422.
+    """
+    country_list = [c.strip() for c in source_countries.split(",") if c.strip()]
+    try:
+        events = search_index.search(q, source_countries=country_list, since=since, until=until, limit=max)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    return Response(content=dump_events_json(events), media_type="application/json")
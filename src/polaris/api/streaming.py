@@ -0,0 +1,25 @@
+"""
+Helpers for streaming responses.
+
+Streaming endpoints send newline-delimited JSON (NDJSON): one JSON object per
+line, flushed as soon as it is produced.
+"""
+
+import json
+from typing import AsyncIterator
+
+from fastapi.responses import StreamingResponse
+
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+
+async def _encode(events: AsyncIterator[dict]) -> AsyncIterator[bytes]:
+    """Encode each event as one line of JSON."""
+    async for event in events:
+        yield (json.dumps(event) + "\n").encode("utf-8")
+
+
+def ndjson_response(events: AsyncIterator[dict]) -> StreamingResponse:
+    """Stream ``events`` to the client as NDJSON."""
+    return StreamingResponse(_encode(events), media_type=NDJSON_MEDIA_TYPE)
@@ -6,31 +6,228 @@ and saving of data source configurations.
 """
 
 import json
+import os
+import tempfile
+import threading
 from pydantic import BaseModel, Field
-from typing import List, Literal
+from typing import Dict, List, Literal, Optional, Tuple
+
+# Directory where downloaded data files and codebooks are stored.
+DATA_DIR = os.path.join("src", "polaris", "data")
+
+# Directory for derived artefacts such as extracted codebook text.
+CACHE_DIR = os.path.join(DATA_DIR, "cache")
+
+# Memory budget (in megabytes) for the process-wide parsed DataFrame cache.
+DATAFRAME_CACHE_MAX_MB = int(os.environ.get("POLARIS_DATAFRAME_CACHE_MAX_MB", "2048"))
+
+# Number of CSV rows parsed at a time when a source is converted, which bounds peak ingestion memory.
+INGEST_CHUNK_ROWS = int(os.environ.get("POLARIS_INGEST_CHUNK_ROWS", "200000"))
+
+# Datasets whose columnar file is larger than this (in megabytes) are not loaded into memory;
+# only their aggregate index is built, one record batch at a time.
+INGEST_IN_MEMORY_MAX_MB = int(os.environ.get("POLARIS_INGEST_IN_MEMORY_MAX_MB", "1024"))
+
+# Number of worker processes used to extract text from codebook PDFs.
+CODEBOOK_EXTRACT_WORKERS = int(os.environ.get("POLARIS_CODEBOOK_EXTRACT_WORKERS", os.cpu_count() or 1))
+
+# Codebook retrieval: codebooks are split into sections of about CODEBOOK_SECTION_TOKENS tokens,
+# embedded with CODEBOOK_EMBED_MODEL, and the CODEBOOK_TOP_K sections most similar to a question
+# are added to its prompt within CODEBOOK_CONTEXT_TOKENS.  Codebooks with at least
+# CODEBOOK_ANN_MIN_SECTIONS sections use an approximate index (0 always searches exhaustively).
+CODEBOOK_EMBED_MODEL = os.environ.get("POLARIS_CODEBOOK_EMBED_MODEL", "nomic-embed-text")
+CODEBOOK_SECTION_TOKENS = int(os.environ.get("POLARIS_CODEBOOK_SECTION_TOKENS", "300"))
+CODEBOOK_CONTEXT_TOKENS = int(os.environ.get("POLARIS_CODEBOOK_CONTEXT_TOKENS", "1500"))
+CODEBOOK_TOP_K = int(os.environ.get("POLARIS_CODEBOOK_TOP_K", "6"))
+CODEBOOK_ANN_MIN_SECTIONS = int(os.environ.get("POLARIS_CODEBOOK_ANN_MIN_SECTIONS", "0"))
+
+# Planning of data questions: common question shapes are resolved by rules without the LLM
+# (PLANNER_FAST_PATH); the rest are sent to the model either as native tool calls
+# (PLANNER_TOOL_CALLING, for models that support tools) or constrained to a JSON schema.
+PLANNER_FAST_PATH = os.environ.get("POLARIS_PLANNER_FAST_PATH", "1").lower() in ("1", "true", "yes")
+PLANNER_TOOL_CALLING = os.environ.get("POLARIS_PLANNER_TOOL_CALLING", "0").lower() in ("1", "true", "yes")
+
+# Limits of LLM-planned queries: result rows, run time, and cached results per dataset.
+QUERY_MAX_ROWS = int(os.environ.get("POLARIS_QUERY_MAX_ROWS", "1000"))
+QUERY_TIMEOUT_SECONDS = float(os.environ.get("POLARIS_QUERY_TIMEOUT_SECONDS", "10"))
+QUERY_CACHE_MAX_ENTRIES = int(os.environ.get("POLARIS_QUERY_CACHE_MAX_ENTRIES", "256"))
+
+# Maximum number of data sources that are downloaded, extracted and parsed concurrently.
+SOURCE_LOAD_WORKERS = int(os.environ.get("POLARIS_SOURCE_LOAD_WORKERS", "4"))
+
+# Interval at which downloaded sources are revalidated in the background (0 disables it).
+SOURCE_REFRESH_INTERVAL_SECONDS = float(os.environ.get("POLARIS_SOURCE_REFRESH_INTERVAL_SECONDS", "0"))
+
+# Local event store, filled by live fetches and by a background ingester that fetches the
+# last EVENT_INGEST_LOOKBACK_DAYS days of each query in EVENT_INGEST_QUERIES (comma-separated)
+# every EVENT_INGEST_INTERVAL_SECONDS (0 disables it).  Events older than EVENT_STORE_RETENTION_DAYS
+# are removed by the ingester (0 keeps them).
+EVENT_STORE_PATH = os.environ.get("POLARIS_EVENT_STORE_PATH", os.path.join(CACHE_DIR, "events.sqlite3"))
+EVENT_INGEST_INTERVAL_SECONDS = float(os.environ.get("POLARIS_EVENT_INGEST_INTERVAL_SECONDS", "0"))
+EVENT_INGEST_QUERIES = [q.strip() for q in os.environ.get("POLARIS_EVENT_INGEST_QUERIES", "").split(",") if q.strip()]
+EVENT_INGEST_LOOKBACK_DAYS = int(os.environ.get("POLARIS_EVENT_INGEST_LOOKBACK_DAYS", "2"))
+EVENT_STORE_RETENTION_DAYS = int(os.environ.get("POLARIS_EVENT_STORE_RETENTION_DAYS", "0"))
+
+# Snapshot of the full-text search index over the event store.
+SEARCH_INDEX_PATH = os.environ.get("POLARIS_SEARCH_INDEX_PATH", os.path.join(CACHE_DIR, "search_index.npz"))
+
+# SQLite database and maximum number of canonical events of the near-duplicate event index.
+DEDUPE_INDEX_PATH = os.environ.get("POLARIS_DEDUPE_INDEX_PATH", os.path.join(CACHE_DIR, "dedupe.sqlite3"))
+DEDUPE_MAX_ENTRIES = int(os.environ.get("POLARIS_DEDUPE_MAX_ENTRIES", "100000"))
+
+# Monte Carlo scenario engine: trajectories per request, the cap on trajectories x actors x days
+# that keeps a request within about a second, worker processes for large runs, and the largest
+# numbers of variants and actors and the longest horizon (in days) a request may ask for.
+SCENARIO_SIMULATIONS = int(os.environ.get("POLARIS_SCENARIO_SIMULATIONS", "5000"))
+SCENARIO_MAX_CELLS = int(os.environ.get("POLARIS_SCENARIO_MAX_CELLS", "5000000"))
+SCENARIO_WORKERS = int(os.environ.get("POLARIS_SCENARIO_WORKERS", os.cpu_count() or 1))
+SCENARIO_MAX_VARIANTS = int(os.environ.get("POLARIS_SCENARIO_MAX_VARIANTS", "10"))
+SCENARIO_MAX_HORIZON_DAYS = int(os.environ.get("POLARIS_SCENARIO_MAX_HORIZON_DAYS", "365"))
+SCENARIO_MAX_ACTORS = int(os.environ.get("POLARIS_SCENARIO_MAX_ACTORS", "20"))
+
+# Briefs over more events than fit in one prompt of this many (estimated) tokens are summarised
+# in chunks first; at most BRIEF_MAP_CONCURRENCY chunk summaries are generated at a time.
+BRIEF_CHUNK_TOKENS = int(os.environ.get("POLARIS_BRIEF_CHUNK_TOKENS", "3000"))
+BRIEF_MAP_CONCURRENCY = int(os.environ.get("POLARIS_BRIEF_MAP_CONCURRENCY", "2"))
+
+# SQLite database, TTL and maximum size of the LLM response cache (0 entries disables it).
+RESPONSE_CACHE_PATH = os.environ.get("POLARIS_RESPONSE_CACHE_PATH", os.path.join(CACHE_DIR, "responses.sqlite3"))
+RESPONSE_CACHE_TTL_SECONDS = float(os.environ.get("POLARIS_RESPONSE_CACHE_TTL_SECONDS", "86400"))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.environ.get("POLARIS_RESPONSE_CACHE_MAX_ENTRIES", "10000"))
+
+# GDELT results are cached per (query, countries, day).  A day fetched at least GDELT_DAY_GRACE_SECONDS
+# after it ended (UTC) is complete and cached until evicted; any other day, such as the current one,
+# expires after a short TTL because new and late articles keep arriving.
+GDELT_CACHE_MAX_BUCKETS = int(os.environ.get("POLARIS_GDELT_CACHE_MAX_BUCKETS", "5000"))
+GDELT_TODAY_TTL_SECONDS = float(os.environ.get("POLARIS_GDELT_TODAY_TTL_SECONDS", "300"))
+GDELT_DAY_GRACE_SECONDS = float(os.environ.get("POLARIS_GDELT_DAY_GRACE_SECONDS", "3600"))
+# Maximum number of GDELT article searches (one per day of a window) that run concurrently.
+GDELT_FETCH_WORKERS = int(os.environ.get("POLARIS_GDELT_FETCH_WORKERS", "4"))
+
+# Risk scores are computed from the daily GDELT article counts and tone of each tracked area, which a
+# background updater fetches every RISK_UPDATE_INTERVAL_SECONDS.  The areas in RISK_AREAS
+# (comma-separated) are tracked from startup and always kept; others from their first request until
+# they have not been requested for RISK_AREA_IDLE_SECONDS, or until RISK_MAX_AREAS areas are tracked
+# and the least recently requested one makes room for a new area.
+RISK_AREAS = [a.strip() for a in os.environ.get("POLARIS_RISK_AREAS", "").split(",") if a.strip()]
+RISK_UPDATE_INTERVAL_SECONDS = float(os.environ.get("POLARIS_RISK_UPDATE_INTERVAL_SECONDS", "900"))
+RISK_MAX_AREAS = int(os.environ.get("POLARIS_RISK_MAX_AREAS", "200"))
+RISK_AREA_IDLE_SECONDS = float(os.environ.get("POLARIS_RISK_AREA_IDLE_SECONDS", "86400"))
+
+# Startup warmup: the datasets and codebooks of WARMUP_SOURCES (comma-separated source names) are
+# loaded, and Ollama is asked to load WARMUP_MODEL and keep it loaded for WARMUP_KEEP_ALIVE.
+# ``/health`` only reports the application as ready once the warmup has finished.
+WARMUP_SOURCES = [s.strip() for s in os.environ.get("POLARIS_WARMUP_SOURCES", "").split(",") if s.strip()]
+WARMUP_MODEL = os.environ.get("POLARIS_WARMUP_MODEL", "")
+WARMUP_KEEP_ALIVE = os.environ.get("POLARIS_WARMUP_KEEP_ALIVE", "30m")
+
+# Whether clients can ask for the timings of their request with the ``X-Polaris-Debug: timings`` header.
+# Off by default, since the timings reveal internal stages to any client.
+DEBUG_TIMINGS = os.environ.get("POLARIS_DEBUG_TIMINGS", "0").lower() in ("1", "true", "yes")
 
 class DataSource(BaseModel):
     """Represents a single data source for the RAG system."""
     name: str = Field(..., description="The human-readable name of the data source.")
     type: Literal["csv", "api", "website"] = Field(..., description="The type of the data source.")
     url: str = Field(..., description="The URL or endpoint of the data source.")
-    codebook_url: str = Field(None, description="The URL of the codebook for the data source.")
+    codebook_url: Optional[str] = Field(None, description="The URL of the codebook for the data source.")
 
 def get_default_data_sources() -> List[DataSource]:
     """Return a list of default data sources."""
     return []
 
+class DataSourceRegistry:
+    """In-memory registry of data sources backed by a JSON file.
+
+    Sources are kept in a dict keyed by name and the file is only parsed again
+    when its mtime or size changes.  Writes are serialised with a lock and go
+    through a temporary file that is renamed into place, so readers always see
+    either the old or the new configuration and never wait on a writer.
+    """
+
+    def __init__(self, path: str = "data_sources.json"):
+        self.path = path
+        self._sources: Dict[str, DataSource] = {}
+        self._version: Optional[Tuple[int, int]] = None
+        self._lock = threading.Lock()
+
+    def _file_version(self) -> Optional[Tuple[int, int]]:
+        """Return the (mtime, size) of the backing file, or ``None`` if it is missing."""
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def _refresh(self) -> Dict[str, DataSource]:
+        """Return the current sources, reloading the file if it changed on disk."""
+        if self._version is not None and self._file_version() == self._version:
+            return self._sources
+        with self._lock:
+            self._reload()
+            return self._sources
+
+    def _reload(self) -> None:
+        """Parse the backing file if it changed.  Caller holds the lock."""
+        version = self._file_version()
+        if version is not None and version == self._version:
+            return
+        try:
+            with open(self.path, "r") as f:
+                data = json.load(f)
+            self._sources = {item["name"]: DataSource(**item) for item in data}
+            self._version = version
+        except (FileNotFoundError, json.JSONDecodeError):
+            self._write({})  # Create an empty file
+
+    def _write(self, sources: Dict[str, DataSource]) -> None:
+        """Atomically write ``sources`` to the backing file.  Caller holds the lock."""
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(prefix=".data_sources.", suffix=".tmp", dir=directory)
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump([source.dict() for source in sources.values()], f, indent=4)
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        self._sources = sources
+        self._version = self._file_version()
+
+    def all(self) -> List[DataSource]:
+        """Return all configured data sources."""
+        return list(self._refresh().values())
+
+    def get(self, name: str) -> Optional[DataSource]:
+        """Return the data source called ``name``, if any."""
+        return self._refresh().get(name)
+
+    def get_many(self, names: List[str]) -> List[DataSource]:
+        """Return the configured data sources for ``names``, in the given order."""
+        sources = self._refresh()
+        return [sources[name] for name in names if name in sources]
+
+    def add(self, data_source: DataSource) -> DataSource:
+        """Add a data source, replacing any existing source with the same name."""
+        with self._lock:
+            self._reload()
+            sources = dict(self._sources)
+            sources[data_source.name] = data_source
+            self._write(sources)
+        return data_source
+
+    def save(self, data_sources: List[DataSource]) -> None:
+        """Replace all data sources."""
+        with self._lock:
+            self._write({source.name: source for source in data_sources})
+
+
+data_source_registry = DataSourceRegistry()
+
 def load_data_sources() -> List[DataSource]:
     """Load data sources from a JSON file, or create it if it doesn't exist."""
-    try:
-        with open("data_sources.json", "r") as f:
-            data = json.load(f)
-            return [DataSource(**item) for item in data]
-    except (FileNotFoundError, json.JSONDecodeError):
-        save_data_sources([]) # Create an empty file
-        return []
+    return data_source_registry.all()
 
 def save_data_sources(data_sources: List[DataSource]):
     """Save data sources to a JSON file."""
-    with open("data_sources.json", "w") as f:
-        json.dump([source.dict() for source in data_sources], f, indent=4)
+    data_source_registry.save(data_sources)
@@ -0,0 +1,46 @@
+"""
+Lazy imports of heavy dependencies.
+
+``lazy_import("pandas")`` returns a stand-in that imports the module the first
+time one of its attributes is used.  Importing the application then does not
+pay for pandas, pyarrow, pypdf, gdeltdoc or ollama; the first request that
+needs them does, or the startup warmup (see ``polaris.services.warmup``).
+"""
+
+import importlib
+import importlib.util
+from types import ModuleType
+from typing import Optional
+
+
+class LazyModule:
+    """A module that is imported on first attribute access."""
+
+    def __init__(self, name: str):
+        self._name = name
+        self._module: Optional[ModuleType] = None
+
+    def load(self) -> ModuleType:
+        """Import the module now, if it was not imported yet, and return it."""
+        if self._module is None:
+            # The import system serialises concurrent imports of the same module.
+            self._module = importlib.import_module(self._name)
+        return self._module
+
+    def __getattr__(self, attr: str):
+        return getattr(self.load(), attr)
+
+    def __repr__(self) -> str:
+        state = "loaded" if self._module is not None else "not loaded"
+        return f"<lazy module '{self._name}' ({state})>"
+
+
+def lazy_import(name: str, optional: bool = False) -> Optional[LazyModule]:
+    """Return ``name`` as a lazily imported module.
+
+    With ``optional``, ``None`` is returned if the module is not installed,
+    as a ``try: import ... except ImportError`` would.
+    """
+    if optional and importlib.util.find_spec(name) is None:
+        return None
+    return LazyModule(name)
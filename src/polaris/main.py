@@ -6,13 +6,40 @@ with a front‑end client or GPT, and includes the routers that define
 the available endpoints.
 """
 
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, JSONResponse
 import os
 
-from polaris.api import events, brief, scenario, llm, datasources
+from polaris.api import events, search, brief, scenario, llm, datasources, admin, risk, metrics
+from polaris.services.event_ingester import event_ingester
+from polaris.services.risk_scorer import risk_updater
+from polaris.services.search_index import search_index
+from polaris.services.source_refresh import source_refresher
+from polaris.services.warmup import warmup
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Run the background source refresher, event ingester and risk updater while the application is up.
+
+    The warmup starts in the background, so the server accepts requests at
+    once and ``/health`` reports when it is ready.  The search index is saved
+    on shutdown so the next start does not index the same events again.
+    """
+    warmup.start()
+    source_refresher.start()
+    event_ingester.start()
+    risk_updater.start()
+    yield
+    warmup.stop()
+    risk_updater.stop()
+    event_ingester.stop()
+    source_refresher.stop()
+    search_index.save()
 
 
 def create_app() -> FastAPI:
@@ -21,6 +48,7 @@ def create_app() -> FastAPI:
         title="POLARIS-IR API",
         description="API for POLARIS-IR (Policy & Open-source LLM Analytics for Relations & International Security)",
         version="0.1.0",
+        lifespan=lifespan,
     )
 
     # Allow CORS from any origin.  In production, restrict this to your domain.
@@ -30,7 +58,10 @@ def create_app() -> FastAPI:
         allow_credentials=True,
         allow_methods=["*"],
         allow_headers=["*"],
+        expose_headers=["Server-Timing"],
     )
+    # Count and time every request; see ``polaris.api.metrics``.
+    app.add_middleware(metrics.MetricsMiddleware)
 
     # Mount the static directory (use package-relative path so it works in Docker)
     package_dir = os.path.dirname(__file__)
@@ -45,16 +76,23 @@ def create_app() -> FastAPI:
 
     # Health check endpoint
     @app.get("/health")
-    def health() -> dict:
-        """Return a simple health check response."""
-        return {"status": "ok"}
+    def health() -> JSONResponse:
+        """Return a health check response, with status 503 until the warmup has finished."""
+        status = warmup.status()
+        if not status["ready"]:
+            return JSONResponse({"status": "warming_up", **status}, status_code=503)
+        return JSONResponse({"status": "ok", **status})
 
     # Include API routers
     app.include_router(events.router)
+    app.include_router(search.router)
     app.include_router(brief.router)
     app.include_router(scenario.router)
+    app.include_router(risk.router)
     app.include_router(llm.router)
     app.include_router(datasources.router)
+    app.include_router(admin.router)
+    app.include_router(metrics.router)
 
     return app
 
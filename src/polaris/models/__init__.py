@@ -5,7 +5,7 @@ These models define the structure of requests and responses for the API
 endpoints, making use of type annotations for validation and documentation.
 """
 
-from typing import List, Optional, Dict
+from typing import Any, List, Optional, Dict
 
 from pydantic import BaseModel
 
@@ -23,6 +23,8 @@ class EventItem(BaseModel):
     location: Optional[str] = None
     sentiment: Optional[float] = None
     summary: Optional[str] = None  # additional field for summarised event
+    duplicates: Optional[int] = None  # near-duplicate copies collapsed into this event
+    score: Optional[float] = None  # BM25 relevance in /search-events results
 
 
 class BriefRequest(BaseModel):
@@ -49,6 +51,7 @@ class BriefResponse(BaseModel):
     """Wrapper for the brief response."""
 
     brief: BriefSection
+    metadata: Optional[Dict[str, Any]] = None  # e.g. whether the LLM reply was cached
 
 
 class ScenarioRequest(BaseModel):
@@ -59,6 +62,7 @@ class ScenarioRequest(BaseModel):
     time_horizon_days: int
     assumptions: Optional[List[str]] = None
     variants: int = 3
+    seed: Optional[int] = None  # makes the simulation reproducible
 
 
 class ScenarioVariant(BaseModel):
@@ -76,6 +80,7 @@ class ScenarioResponse(BaseModel):
     """Wrapper for the scenario response."""
 
     scenarios: List[ScenarioVariant]
+    metadata: Optional[Dict[str, Any]] = None  # e.g. the seed and number of simulations
 
 
 class RiskRequest(BaseModel):
@@ -6,6 +6,11 @@ from typing import List
 from polaris.models import EventItem
 
 
+def format_event(item: EventItem) -> str:
+    """Format one event as a line of a prompt."""
+    return f"- {item.date}: {item.title} (Source: {item.source})"
+
+
 def create_brief_prompt(items: List[EventItem], focus: str = None) -> str:
     """
     Creates a prompt for the LLM to generate a structured brief from a list of events.
@@ -17,9 +22,7 @@ def create_brief_prompt(items: List[EventItem], focus: str = None) -> str:
     Returns:
         A formatted prompt string.
     """
-    event_list = "\n".join(
-        [f"- {item.date}: {item.title} (Source: {item.source})" for item in items]
-    )
+    event_list = "\n".join(format_event(item) for item in items)
 
     focus_instruction = (
         f"The specific focus for this brief is: {focus}." if focus else ""
@@ -41,4 +44,71 @@ Generate a brief with the following sections:
 - Leading Indicators: 2-3 indicators to watch for future developments.
 
 Format your response as a JSON object with keys: "tl_dr", "what_happened", "why_it_matters", "risk_level", "indicators".
-"""
\ No newline at end of file
+"""
+
+def create_chunk_summary_prompt(lines: List[str], focus: str = None) -> str:
+    """
+    Creates a prompt for the LLM to summarise one chunk of a large event set.
+
+    Args:
+        lines: Formatted events, or summaries of earlier chunks.
+        focus: The specific focus for the brief.
+
+    Returns:
+        A formatted prompt string.
+    """
+    item_list = "\n".join(lines)
+
+    focus_instruction = (
+        f"Pay particular attention to: {focus}." if focus else ""
+    )
+
+    return f"""You are POLARIS-IR Assistant, an AI for international security analysis.
+Summarise the following items for an intelligence brief.
+
+Items:
+{item_list}
+
+{focus_instruction}
+
+Write at most 8 short bullet points covering the key developments, the actors and locations involved,
+and any signs of escalation or de-escalation. Keep dates where they matter. Do not add an introduction.
+"""
+
+
+def create_brief_reduce_prompt(summaries: List[str], focus: str = None) -> str:
+    """
+    Creates a prompt for the LLM to merge partial summaries into a structured brief.
+
+    Args:
+        summaries: Summaries of chunks of the event set.
+        focus: The specific focus for the brief.
+
+    Returns:
+        A formatted prompt string.
+    """
+    summary_list = "\n\n".join(
+        f"Part {i}:\n{summary.strip()}" for i, summary in enumerate(summaries, start=1)
+    )
+
+    focus_instruction = (
+        f"The specific focus for this brief is: {focus}." if focus else ""
+    )
+
+    return f"""You are POLARIS-IR Assistant, an AI for international security analysis.
+Your task is to generate a structured intelligence brief. The events were too many to list, so they
+were summarised in parts:
+
+{summary_list}
+
+{focus_instruction}
+
+Generate a brief with the following sections:
+- TL;DR: A one-sentence summary.
+- What Happened: A concise narrative of the events.
+- Why It Matters: The geopolitical or security impact.
+- Risk Level: Assess the risk as Low, Medium, or High.
+- Leading Indicators: 2-3 indicators to watch for future developments.
+
+Format your response as a JSON object with keys: "tl_dr", "what_happened", "why_it_matters", "risk_level", "indicators".
+"""
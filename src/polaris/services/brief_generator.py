@@ -0,0 +1,112 @@
+"""
+Service for generating briefs from large event sets.
+
+A few hundred GDELT items do not fit in one prompt, and prompt processing
+time on CPU grows with prompt length.  Briefs over small event sets are still
+generated from a single prompt.  Larger sets go through a map-reduce pipeline:
+
+- map: the events are split into chunks of at most ``BRIEF_CHUNK_TOKENS``
+  estimated tokens, and each chunk is summarised, with at most
+  ``BRIEF_MAP_CONCURRENCY`` summaries generated at a time;
+- reduce: the partial summaries are merged into the ``BriefSection`` JSON
+  schema by a final prompt.  If the summaries themselves exceed the budget,
+  they are summarised again in chunks first.
+
+The time spent in each stage is recorded in the response metadata.
+"""
+
+import asyncio
+import time
+from typing import Dict, List, Optional
+
+from polaris.core.config import BRIEF_CHUNK_TOKENS, BRIEF_MAP_CONCURRENCY
+from polaris.models import EventItem
+from polaris.services import metrics
+from polaris.prompts import create_brief_prompt, create_brief_reduce_prompt, create_chunk_summary_prompt, format_event
+from polaris.services.llm_service import acomplete
+from polaris.services.tokens import chunk_lines, estimate_tokens
+
+# Maximum number of summarisation levels before the reduce step.
+MAX_MAP_LEVELS = 4
+
+
+def merge_llm_meta(meta: dict, calls: List[dict]) -> None:
+    """Summarise the cache and coalescing outcomes of several LLM calls into ``meta``."""
+    outcomes = {call.get("cache") for call in calls}
+    meta["cache"] = outcomes.pop() if len(outcomes) == 1 else "partial"
+    meta["coalesced"] = any(call.get("coalesced") for call in calls)
+
+
+async def _summarise(chunks: List[List[str]], focus: Optional[str], model: str, calls: List[dict]) -> List[str]:
+    """Summarise each chunk, generating at most ``BRIEF_MAP_CONCURRENCY`` summaries at a time."""
+    semaphore = asyncio.Semaphore(max(BRIEF_MAP_CONCURRENCY, 1))
+
+    async def summarise(chunk: List[str]) -> str:
+        call_meta = {}
+        calls.append(call_meta)
+        async with semaphore:
+            return await acomplete(create_chunk_summary_prompt(chunk, focus), model=model, meta=call_meta)
+
+    return list(await asyncio.gather(*(summarise(chunk) for chunk in chunks)))
+
+
+async def prepare_brief_prompt(items: List[EventItem], focus: Optional[str] = None, model: str = "llama3",
+                               meta: Optional[dict] = None) -> str:
+    """Return the prompt that produces the brief, running the map stage if it is needed.
+
+    ``meta`` is filled with the number of chunks and the map stage timings.
+    """
+    meta = meta if meta is not None else {}
+    started = time.perf_counter()
+    lines = [format_event(item) for item in items]
+    timings: Dict[str, float] = meta.setdefault("timings_ms", {})
+
+    prompt = create_brief_prompt(items, focus)
+    if estimate_tokens(prompt) <= BRIEF_CHUNK_TOKENS:
+        meta["chunks"] = 1
+        return prompt
+
+    # Leave room in each chunk for the instructions around the items.
+    budget = max(BRIEF_CHUNK_TOKENS - estimate_tokens(create_chunk_summary_prompt([], focus)), 1)
+    calls: List[dict] = []
+    level = 0
+    while True:
+        level += 1
+        chunks = chunk_lines(lines, budget)
+        if level == 1:
+            meta["chunks"] = len(chunks)
+        level_started = time.perf_counter()
+        lines = await _summarise(chunks, focus, model, calls)
+        timings[f"map_level_{level}"] = round((time.perf_counter() - level_started) * 1000, 1)
+        prompt = create_brief_reduce_prompt(lines, focus)
+        if estimate_tokens(prompt) <= BRIEF_CHUNK_TOKENS or len(lines) == 1 or level == MAX_MAP_LEVELS:
+            break
+
+    metrics.record("brief.map", time.perf_counter() - started)
+    timings["map"] = round((time.perf_counter() - started) * 1000, 1)
+    meta["map_levels"] = level
+    meta["map_calls"] = calls
+    return prompt
+
+
+async def generate_brief_reply(items: List[EventItem], focus: Optional[str] = None, model: str = "llama3",
+                               meta: Optional[dict] = None) -> str:
+    """Return the model's JSON reply for a brief over ``items``.
+
+    ``meta`` is filled with the number of chunks, per-stage timings in
+    milliseconds and the combined cache and coalescing outcomes.
+    """
+    meta = meta if meta is not None else {}
+    started = time.perf_counter()
+    prompt = await prepare_brief_prompt(items, focus, model, meta)
+
+    reduce_started = time.perf_counter()
+    reduce_meta = {}
+    reply = await acomplete(prompt, model=model, format="json", meta=reduce_meta)
+    stage = "reduce" if "map_calls" in meta else "generate"
+    metrics.record(f"brief.{stage}", time.perf_counter() - reduce_started)
+    meta["timings_ms"][stage] = round((time.perf_counter() - reduce_started) * 1000, 1)
+    meta["timings_ms"]["total"] = round((time.perf_counter() - started) * 1000, 1)
+
+    merge_llm_meta(meta, meta.pop("map_calls", []) + [reduce_meta])
+    return reply
@@ -0,0 +1,265 @@
+"""
+Retrieval of the codebook sections relevant to a question.
+
+A full codebook is tens of thousands of tokens, and pasting it into every
+function-calling prompt makes prompt processing on CPU dominate each
+question.  Instead, each codebook is split once into sections of about
+``CODEBOOK_SECTION_TOKENS`` tokens, the sections are embedded with a local
+Ollama embedding model, and only the sections most similar to the question
+are added to the prompt, up to ``CODEBOOK_TOP_K`` sections and
+``CODEBOOK_CONTEXT_TOKENS`` tokens.
+
+Sections are searched exhaustively with one matrix product.  Codebooks with at
+least ``CODEBOOK_ANN_MIN_SECTIONS`` sections use an inverted-file (IVF) index,
+which only searches the sections of the clusters closest to the question.
+Section embeddings are cached on disk next to the extracted codebook text.
+If the embedding model is unavailable, sections are ranked by the words they
+share with the question instead.
+"""
+
+import hashlib
+import math
+import os
+import re
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from polaris.core.config import (
+    CACHE_DIR,
+    CODEBOOK_ANN_MIN_SECTIONS,
+    CODEBOOK_CONTEXT_TOKENS,
+    CODEBOOK_EMBED_MODEL,
+    CODEBOOK_SECTION_TOKENS,
+    CODEBOOK_TOP_K,
+)
+from polaris.core.lazy import lazy_import
+from polaris.services.tokens import chunk_lines, estimate_tokens
+
+ollama = lazy_import("ollama")
+
+# Sections embedded per request to Ollama.
+EMBED_BATCH = 64
+
+# How long to rank by shared words before trying the embedding model again.
+EMBED_RETRY_SECONDS = 300
+
+# Clusters searched per question by the IVF index.
+IVF_PROBES = 4
+IVF_ITERATIONS = 10
+
+# Placed between non-adjacent sections in the context.
+SECTION_SEPARATOR = "\n...\n"
+
+_WORD = re.compile(r"\w+")
+_PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+
+
+def embed_errors() -> tuple:
+    """Return the errors raised when the embedding model cannot be reached or run."""
+    return (ollama.ResponseError, ollama.RequestError, OSError, KeyError)
+
+
+def split_sections(text: str, max_tokens: int = CODEBOOK_SECTION_TOKENS) -> List[str]:
+    """Split a codebook into consecutive sections of at most about ``max_tokens`` tokens.
+
+    Paragraphs are kept together where possible; text extracted from PDFs
+    often has no blank lines, so lines are used instead.  Longer paragraphs
+    are split between words.
+    """
+    paragraphs = [p.strip() for p in _PARAGRAPH_BREAK.split(text) if p.strip()]
+    if len(paragraphs) <= 1:
+        paragraphs = [line.strip() for line in text.splitlines() if line.strip()]
+    pieces = []
+    for paragraph in paragraphs:
+        if estimate_tokens(paragraph) <= max_tokens:
+            pieces.append(paragraph)
+        else:
+            pieces.extend(" ".join(words) for words in chunk_lines(paragraph.split(), max_tokens))
+    return ["\n".join(chunk) for chunk in chunk_lines(pieces, max_tokens)]
+
+
+def embed(texts: List[str], model: str = CODEBOOK_EMBED_MODEL) -> np.ndarray:
+    """Return the unit-length embeddings of ``texts``, one row per text."""
+    rows = []
+    for start in range(0, len(texts), EMBED_BATCH):
+        response = ollama.embed(model=model, input=texts[start:start + EMBED_BATCH])
+        rows.extend(response["embeddings"])
+    vectors = np.asarray(rows, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms > 0, norms, 1.0)
+
+
+class VectorIndex:
+    """Exhaustive cosine-similarity search over unit-length vectors."""
+
+    def __init__(self, vectors: np.ndarray):
+        self.vectors = vectors
+
+    def search(self, query: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Return the positions of the ``k`` most similar vectors and their similarities, best first."""
+        scores = self.vectors @ query
+        k = min(k, len(scores))
+        if k <= 0:
+            return np.empty(0, np.int64), np.empty(0, np.float32)
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.argsort(-scores[best], kind="stable")]
+        return best, scores[best]
+
+
+class IVFIndex(VectorIndex):
+    """Approximate search: vectors are clustered and only the closest clusters are searched."""
+
+    def __init__(self, vectors: np.ndarray, probes: int = IVF_PROBES, seed: int = 0):
+        super().__init__(vectors)
+        self.probes = probes
+        rng = np.random.default_rng(seed)
+        lists = max(1, int(math.sqrt(len(vectors))))
+        centroids = vectors[rng.choice(len(vectors), size=lists, replace=False)]
+        for _ in range(IVF_ITERATIONS):
+            labels = (vectors @ centroids.T).argmax(axis=1)
+            for c in range(lists):
+                members = vectors[labels == c]
+                if len(members):
+                    centroid = members.sum(axis=0)
+                    centroids[c] = centroid / max(float(np.linalg.norm(centroid)), 1e-12)
+        self.centroids = centroids
+        labels = (vectors @ centroids.T).argmax(axis=1)
+        self.lists = [np.flatnonzero(labels == c) for c in range(lists)]
+
+    def search(self, query: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Return the ``k`` most similar vectors among the clusters closest to ``query``."""
+        nearest = np.argsort(-(self.centroids @ query))[:self.probes]
+        candidates = np.concatenate([self.lists[c] for c in nearest])
+        found, scores = VectorIndex(self.vectors[candidates]).search(query, k)
+        return candidates[found], scores
+
+
+class _Codebook:
+    """The sections of one codebook and the indexes used to rank them."""
+
+    def __init__(self, sections: List[str]):
+        self.sections = sections
+        self.tokens = [estimate_tokens(section) for section in sections]
+        self.words = [set(_WORD.findall(section.casefold())) for section in sections]
+        document_frequency: Dict[str, int] = {}
+        for words in self.words:
+            for word in words:
+                document_frequency[word] = document_frequency.get(word, 0) + 1
+        self.idf = {word: math.log(1 + len(sections) / df) for word, df in document_frequency.items()}
+        self.index: Optional[VectorIndex] = None
+        self.retry_at = 0.0
+
+    def rank_by_words(self, question: str, k: int) -> List[int]:
+        """Return the ``k`` sections sharing the most (rare) words with ``question``."""
+        query = set(_WORD.findall(question.casefold()))
+        scores = np.array([sum(self.idf[w] for w in query & words) for words in self.words])
+        return [int(i) for i in np.argsort(-scores, kind="stable")[:k] if scores[i] > 0]
+
+
+class CodebookRetriever:
+    """Process-wide cache of codebook section indexes."""
+
+    def __init__(self, model: str = CODEBOOK_EMBED_MODEL, cache_dir: str = os.path.join(CACHE_DIR, "codebooks")):
+        self.model = model
+        self.cache_dir = cache_dir
+        self._lock = threading.Lock()
+        self._codebooks: Dict[str, _Codebook] = {}
+        self._building: Dict[str, threading.Lock] = {}
+
+    def _embeddings_path(self, digest: str) -> str:
+        """Return the cache file of the section embeddings of a codebook."""
+        model = re.sub(r"[^\w.-]+", "_", self.model)
+        return os.path.join(self.cache_dir, f"{digest}.{model}.{CODEBOOK_SECTION_TOKENS}.npy")
+
+    def _load_embeddings(self, digest: str, codebook: _Codebook) -> None:
+        """Embed the sections of a codebook, or load their cached embeddings."""
+        path = self._embeddings_path(digest)
+        vectors = None
+        if os.path.exists(path):
+            try:
+                vectors = np.load(path, allow_pickle=False)
+            except (OSError, ValueError) as e:
+                print(f"Could not load cached codebook embeddings from {path}: {e}")
+            if vectors is not None and len(vectors) != len(codebook.sections):
+                vectors = None
+        if vectors is None:
+            try:
+                vectors = embed(codebook.sections, self.model)
+            except embed_errors() as e:
+                print(f"Could not embed codebook sections with '{self.model}', ranking by shared words: {e}")
+                codebook.retry_at = time.monotonic() + EMBED_RETRY_SECONDS
+                return
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.tmp.npy"
+            np.save(tmp_path, vectors)
+            os.replace(tmp_path, path)
+        use_ivf = CODEBOOK_ANN_MIN_SECTIONS > 0 and len(vectors) >= CODEBOOK_ANN_MIN_SECTIONS
+        codebook.index = IVFIndex(vectors) if use_ivf else VectorIndex(vectors)
+
+    def _codebook(self, text: str) -> _Codebook:
+        """Return the sections and index of a codebook, building them on first use."""
+        digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        with self._lock:
+            codebook = self._codebooks.get(digest)
+            building = self._building.setdefault(digest, threading.Lock())
+        if codebook is not None and (codebook.index is not None or time.monotonic() < codebook.retry_at):
+            return codebook
+        # Concurrent questions about the same codebook embed it only once.
+        with building:
+            with self._lock:
+                codebook = self._codebooks.get(digest)
+            if codebook is None:
+                codebook = _Codebook(split_sections(text))
+            if codebook.index is None and time.monotonic() >= codebook.retry_at:
+                self._load_embeddings(digest, codebook)
+            with self._lock:
+                self._codebooks[digest] = codebook
+        return codebook
+
+    def warm(self, text: str) -> None:
+        """Build the index of a codebook and load the embedding model, so the first question waits for neither."""
+        if not text.strip():
+            return
+        codebook = self._codebook(text)
+        if codebook.index is None:
+            return
+        try:
+            embed(codebook.sections[:1], self.model)
+        except embed_errors() as e:
+            print(f"Could not warm up the embedding model '{self.model}': {e}")
+
+    def context(self, text: str, question: str, budget_tokens: int = CODEBOOK_CONTEXT_TOKENS, top_k: int = CODEBOOK_TOP_K) -> str:
+        """Return the sections of a codebook most relevant to ``question``, within ``budget_tokens``.
+
+        Codebooks within the budget are returned whole.  Selected sections are
+        returned in the order they appear in the codebook.  If no section can
+        be ranked, the leading sections are returned.
+        """
+        if not text.strip() or estimate_tokens(text) <= budget_tokens:
+            return text
+        codebook = self._codebook(text)
+        ranked = None
+        if codebook.index is not None:
+            try:
+                ranked = codebook.index.search(embed([question], self.model)[0], top_k)[0].tolist()
+            except embed_errors() as e:
+                print(f"Could not embed the question with '{self.model}', ranking by shared words: {e}")
+        if ranked is None:
+            ranked = codebook.rank_by_words(question, top_k)
+        if not ranked:
+            # No section shares a word with the question; the leading sections usually describe the dataset.
+            ranked = list(range(min(top_k, len(codebook.sections))))
+
+        selected, used = [], 0
+        for i in ranked:
+            cost = codebook.tokens[i] + (estimate_tokens(SECTION_SEPARATOR) if selected else 0)
+            if used + cost <= budget_tokens:
+                selected.append(i)
+                used += cost
+        return SECTION_SEPARATOR.join(codebook.sections[i] for i in sorted(selected))
+
+
+codebook_retriever = CodebookRetriever()
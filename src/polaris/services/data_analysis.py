@@ -1,9 +1,208 @@
 """
 Service for performing data analysis on dataframes.
+
+The analysis functions are answered from an ``AggregateIndex`` of grouped
+fatality sums, which is built once when a dataset is loaded and cached with
+it.  Point lookups are dictionary lookups, and range queries only touch the
+much smaller aggregated frames instead of scanning every event.
 """
 
-import pandas as pd
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from polaris.core.lazy import lazy_import
+
+pd = lazy_import("pandas")
+
+# Fatality estimates available in UCDP-style datasets.
+ESTIMATES = ("best", "low", "high")
+
+
+def _month_of(dates: "pd.Series") -> "pd.Series":
+    """Return the month of each date, parsing each distinct value only once."""
+    if isinstance(dates.dtype, pd.CategoricalDtype):
+        months = pd.to_datetime(dates.cat.categories, errors="coerce").month
+        return pd.Series(months[dates.cat.codes], index=dates.index).where(dates.cat.codes >= 0)
+    return pd.to_datetime(dates, errors="coerce").dt.month
+
+
+def _norm(key) -> str:
+    """Normalise a country or region name for lookups."""
+    return str(key).strip().casefold()
+
+
+class AggregateIndex:
+    """Grouped fatality sums by (country, year), (country, year, month) and (region, year)."""
+
+    def __init__(self, estimates: List[str], country_year: "Optional[pd.DataFrame]", region_year: "Optional[pd.DataFrame]", country_month: "Optional[pd.DataFrame]"):
+        self.estimates = estimates
+        self.country_year = country_year
+        self.region_year = region_year
+        self.country_month = country_month
+
+        self._country_year_lookup = self._lookup(self.country_year)
+        self._country_month_lookup = self._lookup(self.country_month)
+
+    @staticmethod
+    def _frames(df: "pd.DataFrame") -> "Tuple[List[str], Optional[pd.DataFrame], Optional[pd.DataFrame], Optional[pd.DataFrame]]":
+        """Return the estimates and grouped sums of one DataFrame."""
+        estimates = [e for e in ESTIMATES if e in df.columns]
+        # Missing estimates count as zero, as a plain ``sum`` would skip them.
+        values = df[estimates].fillna(0).astype("int64")
+
+        country_year = AggregateIndex._group(df, values, ["country", "year"])
+        region_year = AggregateIndex._group(df, values, ["region", "year"])
+        if "date_start" in df.columns and {"country", "year"} <= set(df.columns):
+            keys = [df["country"], df["year"], _month_of(df["date_start"]).rename("month")]
+            country_month = values.groupby(keys, observed=True).sum()
+        else:
+            country_month = None
+        return estimates, country_year, region_year, country_month
+
+    @classmethod
+    def from_frame(cls, df: "pd.DataFrame") -> "AggregateIndex":
+        """Build the index of a DataFrame."""
+        return cls(*cls._frames(df))
+
+    @classmethod
+    def from_chunks(cls, chunks: "Iterable[pd.DataFrame]") -> "AggregateIndex":
+        """Build the index by folding the grouped sums of each chunk into running totals.
+
+        Only one chunk and the (much smaller) partial sums are in memory at a
+        time, so the dataset itself never has to fit in memory.
+        """
+        estimates, totals = None, [None, None, None]
+        for chunk in chunks:
+            estimates, *frames = cls._frames(chunk)
+            totals = [cls._combine(total, frame) for total, frame in zip(totals, frames)]
+        return cls(estimates or [], *totals)
+
+    @staticmethod
+    def _combine(total: "Optional[pd.DataFrame]", frame: "Optional[pd.DataFrame]") -> "Optional[pd.DataFrame]":
+        """Add the grouped sums of ``frame`` to ``total``."""
+        if total is None or frame is None:
+            return frame if total is None else total
+        # Categories can differ between chunks, so the keys are compared as plain values.
+        combined = pd.concat([total, frame])
+        combined.index = pd.MultiIndex.from_arrays(
+            [combined.index.get_level_values(i).astype(object) for i in range(combined.index.nlevels)],
+            names=combined.index.names,
+        )
+        return combined.groupby(level=list(range(combined.index.nlevels))).sum()
+
+    @staticmethod
+    def _group(df: "pd.DataFrame", values: "pd.DataFrame", columns: List[str]) -> "Optional[pd.DataFrame]":
+        """Sum ``values`` grouped by ``columns``, or ``None`` if a column is missing."""
+        if not set(columns) <= set(df.columns):
+            return None
+        return values.groupby([df[c] for c in columns], observed=True).sum()
+
+    def _lookup(self, frame: "Optional[pd.DataFrame]") -> Dict[Tuple, Dict[str, int]]:
+        """Build a dictionary from normalised group keys to estimate sums."""
+        if frame is None:
+            return {}
+        keys = [
+            (_norm(k[0]),) + tuple(int(v) for v in k[1:])
+            for k in frame.index
+        ]
+        rows = [dict(zip(self.estimates, row)) for row in frame.to_numpy().tolist()]
+        return dict(zip(keys, rows))
+
+    @property
+    def nbytes(self) -> int:
+        """Return an estimate of the memory used by the index, in bytes."""
+        frames = [f for f in (self.country_year, self.region_year, self.country_month) if f is not None]
+        lookups = len(self._country_year_lookup) + len(self._country_month_lookup)
+        # Rough per-entry overhead of the lookup dictionaries (key tuple and row dict).
+        return int(sum(f.memory_usage(deep=True).sum() for f in frames)) + lookups * 400
 
-def get_total_fatalities(df: pd.DataFrame, country: str, year: int) -> int:
+    def require(self, frame: "Optional[pd.DataFrame]", estimate: str, columns: str) -> "pd.DataFrame":
+        """Return ``frame`` or raise a ValueError if the dataset does not support the query."""
+        if estimate not in self.estimates:
+            raise ValueError(f"Unknown fatality estimate '{estimate}'.")
+        if frame is None:
+            raise ValueError(f"The dataset does not have the columns {columns}.")
+        return frame
+
+    def total(self, country: str, year: int, estimate: str = "best") -> int:
+        """Return the fatalities for a country and year."""
+        self.require(self.country_year, estimate, "country and year")
+        row = self._country_year_lookup.get((_norm(country), int(year)))
+        return row[estimate] if row else 0
+
+    def monthly_total(self, country: str, year: int, month: int, estimate: str = "best") -> int:
+        """Return the fatalities for a country in a given month."""
+        self.require(self.country_month, estimate, "country, year and date_start")
+        row = self._country_month_lookup.get((_norm(country), int(year), int(month)))
+        return row[estimate] if row else 0
+
+    def by_year(self, frame: "pd.DataFrame", estimate: str, start_year: Optional[int], end_year: Optional[int]) -> "pd.Series":
+        """Return the ``estimate`` column of ``frame`` restricted to a year range."""
+        years = frame.index.get_level_values("year")
+        mask = pd.Series(True, index=frame.index)
+        if start_year is not None:
+            mask &= years >= int(start_year)
+        if end_year is not None:
+            mask &= years <= int(end_year)
+        return frame.loc[mask.to_numpy(), estimate]
+
+
+def build_index(df: "pd.DataFrame") -> AggregateIndex:
+    """Build the aggregate index for a dataset."""
+    return AggregateIndex.from_frame(df)
+
+
+class Dataset:
+    """A loaded DataFrame together with its aggregate index.
+
+    Datasets too large to keep in memory have only an index (``df`` is ``None``).
+    """
+
+    def __init__(self, df: "Optional[pd.DataFrame]", index: AggregateIndex = None):
+        self.df = df
+        self.index = index or build_index(df)
+
+    @property
+    def nbytes(self) -> int:
+        """Return an estimate of the memory used by the dataset and its index, in bytes."""
+        df_bytes = int(self.df.memory_usage(deep=True).sum()) if self.df is not None else 0
+        return df_bytes + self.index.nbytes
+
+
+def get_total_fatalities(df: "pd.DataFrame", country: str, year: int, estimate: str = "best", index: AggregateIndex = None) -> int:
     """Get the total number of fatalities for a given country and year."""
-    return df[(df['country'] == country) & (df['year'] == year)]['best'].sum()
+    index = index or build_index(df)
+    return index.total(country, year, estimate)
+
+
+def get_monthly_fatalities(df: "pd.DataFrame", country: str, year: int, month: int, estimate: str = "best", index: AggregateIndex = None) -> int:
+    """Get the number of fatalities for a given country, year and month (1-12)."""
+    index = index or build_index(df)
+    return index.monthly_total(country, year, month, estimate)
+
+
+def get_fatalities_by_year(df: "pd.DataFrame", country: str, start_year: int = None, end_year: int = None, estimate: str = "best", index: AggregateIndex = None) -> Dict[int, int]:
+    """Get the number of fatalities per year for a given country over a range of years."""
+    index = index or build_index(df)
+    frame = index.require(index.country_year, estimate, "country and year")
+    series = index.by_year(frame, estimate, start_year, end_year)
+    countries = series.index.get_level_values("country").map(_norm)
+    series = series[countries == _norm(country)]
+    return {int(year): int(total) for (_, year), total in series.items()}
+
+
+def get_top_countries(df: "pd.DataFrame", start_year: int = None, end_year: int = None, k: int = 5, estimate: str = "best", index: AggregateIndex = None) -> Dict[str, int]:
+    """Get the k countries with the most fatalities over a range of years."""
+    index = index or build_index(df)
+    frame = index.require(index.country_year, estimate, "country and year")
+    series = index.by_year(frame, estimate, start_year, end_year)
+    totals = series.groupby(level="country", observed=True).sum().nlargest(int(k))
+    return {str(country): int(total) for country, total in totals.items()}
+
+
+def get_region_totals(df: "pd.DataFrame", start_year: int = None, end_year: int = None, estimate: str = "best", index: AggregateIndex = None) -> Dict[str, int]:
+    """Get the total number of fatalities per region over a range of years."""
+    index = index or build_index(df)
+    frame = index.require(index.region_year, estimate, "region and year")
+    series = index.by_year(frame, estimate, start_year, end_year)
+    totals = series.groupby(level="region", observed=True).sum().sort_values(ascending=False)
+    return {str(region): int(total) for region, total in totals.items()}
@@ -5,37 +5,144 @@ This module provides functions to load data from different types of sources,
 including CSV files from URLs, APIs, and websites.
 """
 
-import pandas as pd
-import requests
-import zipfile
+import hashlib
 import io
-from pypdf import PdfReader
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack, contextmanager
+from typing import BinaryIO, Dict, Iterator, List
+
+import requests
+
+from polaris.core.config import CACHE_DIR, CODEBOOK_EXTRACT_WORKERS, INGEST_CHUNK_ROWS
+from polaris.core.lazy import lazy_import
+from polaris.services import metrics
+
+pd = lazy_import("pandas")
+pa = lazy_import("pyarrow", optional=True)
+pypdf = lazy_import("pypdf")
+
+# Size of the blocks in which streamed downloads are copied.
+STREAM_CHUNK_SIZE = 1024 * 1024
+
+
+def _first_csv_member(z: zipfile.ZipFile) -> str:
+    """Return the name of the first CSV file in a zip archive."""
+    csv_file = next((f for f in z.namelist() if f.endswith('.csv')), None)
+    if csv_file is None:
+        raise ValueError("No CSV file found in the zip archive.")
+    return csv_file
 
-def load_csv(location: str) -> pd.DataFrame:
+
+@contextmanager
+def open_csv_stream(location: str) -> Iterator[BinaryIO]:
+    """Open the CSV content of a URL or local file path as a stream, handling zip files.
+
+    HTTP bodies and zip members are read incrementally rather than loaded into
+    memory.  Zip archives need random access, so a zip served over HTTP is
+    first spooled to a temporary file.
+    """
+    with ExitStack() as stack:
+        if location.startswith('http'):
+            response = stack.enter_context(requests.get(location, stream=True))
+            response.raise_for_status()  # Raise an exception for bad status codes
+            response.raw.decode_content = True
+            if not location.endswith('.zip'):
+                yield response.raw
+                return
+            archive = stack.enter_context(tempfile.TemporaryFile())
+            shutil.copyfileobj(response.raw, archive, STREAM_CHUNK_SIZE)
+            archive.seek(0)
+        elif location.endswith('.zip'):
+            archive = location
+        else:
+            yield stack.enter_context(open(location, 'rb'))
+            return
+
+        z = stack.enter_context(zipfile.ZipFile(archive))
+        yield stack.enter_context(z.open(_first_csv_member(z)))
+
+
+def load_csv(location: str, **read_csv_kwargs) -> "pd.DataFrame":
     """Load a CSV file from a URL or a local file path, handling zip files."""
-    if location.startswith('http'):
-        response = requests.get(location)
-        response.raise_for_status()  # Raise an exception for bad status codes
-        content = response.content
-    else:
-        with open(location, 'rb') as f:
-            content = f.read()
+    with open_csv_stream(location) as f:
+        return pd.read_csv(f, **read_csv_kwargs)
+
+
+def iter_csv_chunks(location: str, chunksize: int = INGEST_CHUNK_ROWS, **read_csv_kwargs) -> "Iterator[pd.DataFrame]":
+    """Yield a CSV file from a URL or a local file path as DataFrames of ``chunksize`` rows.
+
+    Only one chunk is held in memory at a time; pass ``usecols`` to parse just
+    the columns that are needed.
+    """
+    with open_csv_stream(location) as f:
+        with pd.read_csv(f, chunksize=chunksize, **read_csv_kwargs) as reader:
+            yield from reader
+
+
+def load_columnar(location: str) -> "pd.DataFrame":
+    """Load an Arrow IPC file through a memory map."""
+    with pa.memory_map(location, 'r') as source:
+        table = pa.ipc.open_file(source).read_all()
+    return table.to_pandas(split_blocks=True, self_destruct=True)
+
+
+def iter_columnar_batches(location: str) -> "Iterator[pd.DataFrame]":
+    """Yield the record batches of a memory-mapped Arrow IPC file as DataFrames, one at a time."""
+    with pa.memory_map(location, 'r') as source:
+        reader = pa.ipc.open_file(source)
+        for i in range(reader.num_record_batches):
+            yield reader.get_batch(i).to_pandas()
+
+
+def load_dataset(location: str) -> "pd.DataFrame":
+    """Load a dataset from a columnar file or a CSV file, depending on its extension."""
+    if location.endswith('.arrow'):
+        return load_columnar(location)
+    return load_csv(location)
 
-    if location.endswith('.zip'):
-        with zipfile.ZipFile(io.BytesIO(content)) as z:
-            # Find the first CSV file in the zip archive
-            csv_file = next((f for f in z.namelist() if f.endswith('.csv')), None)
-            if csv_file:
-                with z.open(csv_file) as f:
-                    return pd.read_csv(f)
-            else:
-                raise ValueError("No CSV file found in the zip archive.")
+
+# Codebooks with fewer pages than this are extracted in-process.
+PDF_PARALLEL_MIN_PAGES = 16
+
+# Extracted codebook text, keyed by the SHA-256 of the PDF content.
+_pdf_text_cache: Dict[str, str] = {}
+_pdf_text_lock = threading.Lock()
+
+
+def _extract_pdf_pages(content: bytes, start: int, stop: int) -> List[str]:
+    """Extract the text of pages ``start`` to ``stop`` of a PDF."""
+    reader = pypdf.PdfReader(io.BytesIO(content))
+    return [reader.pages[i].extract_text() or "" for i in range(start, stop)]
+
+
+def extract_pdf_text(content: bytes) -> str:
+    """Extract the text of a PDF, splitting large documents across a process pool."""
+    page_count = len(pypdf.PdfReader(io.BytesIO(content)).pages)
+    workers = min(CODEBOOK_EXTRACT_WORKERS, page_count // PDF_PARALLEL_MIN_PAGES or 1)
+    if workers <= 1:
+        pages = _extract_pdf_pages(content, 0, page_count)
     else:
-        return pd.read_csv(io.BytesIO(content))
+        step = -(-page_count // workers)
+        ranges = [(start, min(start + step, page_count)) for start in range(0, page_count, step)]
+        # Use "spawn" so worker processes do not inherit the server's threads and locks.
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            chunks = pool.map(_extract_pdf_pages, [content] * len(ranges), *zip(*ranges))
+            pages = [page for chunk in chunks for page in chunk]
+    return "\n".join(pages)
 
 
 def get_pdf_text_from_location(location: str) -> str:
-    """Download a PDF from a URL or a local file path and extract its text content."""
+    """Download a PDF from a URL or a local file path and extract its text content.
+
+    Extracted text is cached in memory and on disk, keyed by the SHA-256 of the
+    PDF content, so a codebook is only parsed once.
+    """
     if location.startswith('http'):
         response = requests.get(location)
         response.raise_for_status()
@@ -44,9 +151,29 @@ def get_pdf_text_from_location(location: str) -> str:
         with open(location, 'rb') as f:
             content = f.read()
 
-    with io.BytesIO(content) as f:
-        reader = PdfReader(f)
-        text = ""
-        for page in reader.pages:
-            text += page.extract_text()
+    digest = hashlib.sha256(content).hexdigest()
+    text = _pdf_text_cache.get(digest)
+    metrics.count_cache("codebook_text", text is not None)
+    if text is not None:
+        return text
+
+    with _pdf_text_lock:
+        text = _pdf_text_cache.get(digest)
+        if text is not None:
+            return text
+
+        cache_path = os.path.join(CACHE_DIR, "codebooks", f"{digest}.txt")
+        if os.path.exists(cache_path):
+            with open(cache_path, 'r', encoding='utf-8') as f:
+                text = f.read()
+        else:
+            with metrics.stage("codebook.extract"):
+                text = extract_pdf_text(content)
+            os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+            tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(text)
+            os.replace(tmp_path, cache_path)
+
+        _pdf_text_cache[digest] = text
     return text
@@ -0,0 +1,165 @@
+"""
+Process-wide cache for parsed datasets.
+
+Parsing a large CSV such as the UCDP GED file takes seconds, so the parsed
+DataFrame is kept in memory and shared between requests.  Entries are keyed by
+the data source name, the file path and the file's mtime/size, so a refreshed
+file is picked up automatically.  The cache has a memory budget and evicts the
+least recently used entries when it is exceeded.
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from polaris.core.config import DATAFRAME_CACHE_MAX_MB
+from polaris.core.lazy import lazy_import
+from polaris.services import metrics
+
+pd = lazy_import("pandas")
+
+
+CacheKey = Tuple[str, str, int, int]
+
+
+def _sizeof(value: Any) -> int:
+    """Return an estimate of the memory used by a cached value, in bytes."""
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True).sum())
+    return int(getattr(value, "nbytes", 0))
+
+
+class _Entry:
+    """A single cached value and its bookkeeping."""
+
+    def __init__(self, value: Any, nbytes: int):
+        self.value = value
+        self.nbytes = nbytes
+        self.hits = 0
+
+
+class DataFrameCache:
+    """Thread-safe LRU cache for parsed datasets with a memory budget."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[CacheKey, _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._load_locks: Dict[CacheKey, threading.Lock] = {}
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(name: str, path: str) -> CacheKey:
+        """Build a cache key from the source name and the file's mtime/size."""
+        stat = os.stat(path)
+        return (name, os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+
+    def get_or_load(self, name: str, path: str, loader: Callable[[str], Any]) -> Any:
+        """Return the cached value for ``path``, loading it with ``loader`` if needed.
+
+        Concurrent callers asking for the same key wait on a single load
+        instead of parsing the file in parallel.
+        """
+        key = self.make_key(name, path)
+        with self._lock:
+            value = self._lookup(key)
+            if value is not None:
+                return value
+            load_lock = self._load_locks.setdefault(key, threading.Lock())
+
+        try:
+            with load_lock:
+                with self._lock:
+                    value = self._lookup(key)
+                    if value is not None:
+                        return value
+                    self.misses += 1
+                    metrics.count_cache("dataframe", False)
+
+                value = loader(path)
+                if value is None:
+                    return None
+
+                with self._lock:
+                    self._drop_stale(key)
+                    self._entries[key] = _Entry(value, _sizeof(value))
+                    self._evict()
+        finally:
+            # Failed loads must not leave their lock behind; a later caller creates a new one.
+            with self._lock:
+                self._load_locks.pop(key, None)
+        return value
+
+    def _lookup(self, key: CacheKey) -> Optional[Any]:
+        """Return the value for ``key`` and mark it as recently used.  Caller holds the lock."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        self._entries.move_to_end(key)
+        entry.hits += 1
+        self.hits += 1
+        metrics.count_cache("dataframe", True)
+        return entry.value
+
+    def _drop_stale(self, key: CacheKey) -> None:
+        """Remove older versions of the same source and path.  Caller holds the lock."""
+        for other in [k for k in self._entries if k[:2] == key[:2] and k != key]:
+            del self._entries[other]
+
+    def _evict(self) -> None:
+        """Evict least recently used entries until within budget.  Caller holds the lock.
+
+        The most recently loaded entry is always kept, even if it alone exceeds
+        the budget.
+        """
+        total = sum(e.nbytes for e in self._entries.values())
+        while total > self.max_bytes and len(self._entries) > 1:
+            _, entry = self._entries.popitem(last=False)
+            total -= entry.nbytes
+
+    def values(self) -> List[Tuple[str, Any]]:
+        """Return the cached values with their source names, without marking them as used."""
+        with self._lock:
+            return [(key[0], entry.value) for key, entry in self._entries.items()]
+
+    def entries(self) -> List[dict]:
+        """Describe the cached entries, from least to most recently used."""
+        with self._lock:
+            return [
+                {
+                    "name": key[0],
+                    "path": key[1],
+                    "mtime_ns": key[2],
+                    "size": key[3],
+                    "nbytes": entry.nbytes,
+                    "hits": entry.hits,
+                }
+                for key, entry in self._entries.items()
+            ]
+
+    def stats(self) -> dict:
+        """Return aggregate cache statistics."""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "nbytes": sum(e.nbytes for e in self._entries.values()),
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+    def evict(self, name: Optional[str] = None) -> int:
+        """Evict all entries for the source ``name``, or everything if no name is given.
+
+        Returns the number of evicted entries.
+        """
+        with self._lock:
+            keys = [k for k in self._entries if name is None or k[0] == name]
+            for key in keys:
+                del self._entries[key]
+            return len(keys)
+
+
+dataframe_cache = DataFrameCache(max_bytes=DATAFRAME_CACHE_MAX_MB * 1024 * 1024)
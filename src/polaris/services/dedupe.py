@@ -0,0 +1,227 @@
+"""
+Near-duplicate detection for news events.
+
+GDELT returns many syndicated copies of the same wire story under different
+URLs.  Each title is normalised, split into character shingles and reduced to
+a MinHash signature.  The signatures are indexed with locality-sensitive
+hashing (LSH): a signature is cut into bands and only events that share a
+band are compared, so finding the duplicates of a new event does not scan
+the whole index.  Events whose signatures agree on at least
+``SIMILARITY_THRESHOLD`` of their values are grouped under the first event
+seen, the canonical event.
+
+The index is kept in memory and persisted to SQLite, so duplicates are
+recognised across fetches and restarts.
+"""
+
+import os
+import re
+import sqlite3
+import threading
+import zlib
+from collections import OrderedDict
+from typing import Dict, List, Optional, Set
+
+import numpy as np
+
+from polaris.core.config import DEDUPE_INDEX_PATH, DEDUPE_MAX_ENTRIES
+from polaris.models import EventItem
+
+# Length of the character shingles titles are split into.
+SHINGLE_SIZE = 5
+
+# Number of hash functions in a signature, split into BANDS bands of NUM_PERM // BANDS rows.
+NUM_PERM = 64
+BANDS = 16
+
+# Minimum estimated Jaccard similarity for two titles to be near-duplicates.
+SIMILARITY_THRESHOLD = 0.6
+
+# Hash functions are (a * x + b) mod a Mersenne prime; the products fit in 64 bits.
+_PRIME = (1 << 31) - 1
+_rng = np.random.default_rng(20240601)  # fixed, so persisted signatures stay comparable
+_A = _rng.integers(1, _PRIME, size=NUM_PERM, dtype=np.uint64)
+_B = _rng.integers(0, _PRIME, size=NUM_PERM, dtype=np.uint64)
+
+# Trailing " - Source" or " | Source" segments that syndication adds to titles.
+_SOURCE_SUFFIX = re.compile(r"\s+[-|–—]\s+[^-|–—]{1,40}$")
+_NON_WORD = re.compile(r"[^\w\s]+")
+
+
+def normalize_title(title: str) -> str:
+    """Normalise a title: drop a trailing source name and punctuation, casefold and collapse spaces."""
+    title = _SOURCE_SUFFIX.sub("", title or "")
+    return " ".join(_NON_WORD.sub(" ", title).casefold().split())
+
+
+def shingles(text: str) -> Set[str]:
+    """Return the character shingles of a normalised title."""
+    if len(text) <= SHINGLE_SIZE:
+        return {text} if text else set()
+    return {text[i:i + SHINGLE_SIZE] for i in range(len(text) - SHINGLE_SIZE + 1)}
+
+
+def signature(title: str) -> Optional[np.ndarray]:
+    """Return the MinHash signature of a title, or ``None`` if it has no text."""
+    grams = shingles(normalize_title(title))
+    if not grams:
+        return None
+    hashes = np.fromiter((zlib.crc32(g.encode("utf-8")) for g in grams), dtype=np.uint64, count=len(grams)) % _PRIME
+    return ((_A[:, None] * hashes[None, :] + _B[:, None]) % _PRIME).min(axis=1).astype(np.uint32)
+
+
+def _band_keys(sig: np.ndarray) -> List[bytes]:
+    """Return the LSH bucket keys of a signature, one per band."""
+    rows = NUM_PERM // BANDS
+    return [bytes([band]) + sig[band * rows:(band + 1) * rows].tobytes() for band in range(BANDS)]
+
+
+class _Canonical:
+    """A canonical event: its signature and the ids of all events grouped under it."""
+
+    def __init__(self, canonical_id: str, sig: np.ndarray):
+        self.signature = sig
+        self.members = [canonical_id]
+
+
+class DedupeIndex:
+    """Persistent MinHash-LSH index grouping near-duplicate events under a canonical event."""
+
+    def __init__(self, path: str, max_entries: int):
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._canonicals: "OrderedDict[str, _Canonical]" = OrderedDict()
+        self._members: Dict[str, str] = {}
+        self._buckets: Dict[bytes, List[str]] = {}
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open the database and load the index on first use.  Caller holds the lock."""
+        if self._conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS canonicals (id TEXT PRIMARY KEY, signature BLOB NOT NULL)")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS members (id TEXT PRIMARY KEY, canonical_id TEXT NOT NULL)")
+            for canonical_id, blob in self._conn.execute("SELECT id, signature FROM canonicals ORDER BY rowid"):
+                self._insert_canonical(canonical_id, np.frombuffer(blob, dtype=np.uint32))
+            for member_id, canonical_id in self._conn.execute("SELECT id, canonical_id FROM members"):
+                if canonical_id in self._canonicals and member_id != canonical_id:
+                    self._members[member_id] = canonical_id
+                    self._canonicals[canonical_id].members.append(member_id)
+        return self._conn
+
+    def _insert_canonical(self, canonical_id: str, sig: np.ndarray) -> None:
+        """Add a canonical event to the in-memory index.  Caller holds the lock."""
+        self._canonicals[canonical_id] = _Canonical(canonical_id, sig)
+        self._members[canonical_id] = canonical_id
+        for key in _band_keys(sig):
+            self._buckets.setdefault(key, []).append(canonical_id)
+
+    def _find(self, sig: np.ndarray) -> Optional[str]:
+        """Return the most similar canonical event sharing an LSH bucket with ``sig``.  Caller holds the lock."""
+        best, best_similarity = None, SIMILARITY_THRESHOLD
+        seen = set()
+        for key in _band_keys(sig):
+            for candidate in self._buckets.get(key, ()):
+                if candidate in seen:
+                    continue
+                seen.add(candidate)
+                similarity = float(np.mean(self._canonicals[candidate].signature == sig))
+                if similarity >= best_similarity:
+                    best, best_similarity = candidate, similarity
+        return best
+
+    def _evict(self, conn: sqlite3.Connection) -> None:
+        """Remove the oldest canonical events until within ``max_entries``.  Caller holds the lock."""
+        while len(self._canonicals) > self.max_entries:
+            canonical_id, canonical = self._canonicals.popitem(last=False)
+            for key in _band_keys(canonical.signature):
+                bucket = self._buckets.get(key, [])
+                if canonical_id in bucket:
+                    bucket.remove(canonical_id)
+                if not bucket:
+                    self._buckets.pop(key, None)
+            for member_id in canonical.members:
+                self._members.pop(member_id, None)
+            conn.execute("DELETE FROM canonicals WHERE id = ?", (canonical_id,))
+            conn.execute("DELETE FROM members WHERE canonical_id = ?", (canonical_id,))
+
+    def add_many(self, events: List[EventItem]) -> List[str]:
+        """Index ``events`` and return the id of the canonical event of each one.
+
+        Events already in the index are not hashed again.  Events without a
+        title are their own canonical event and are not indexed.
+        """
+        canonical_ids = []
+        with self._lock:
+            conn = self._connect()
+            for event in events:
+                canonical_id = self._members.get(event.id)
+                if canonical_id is None:
+                    sig = signature(event.title)
+                    if sig is None:
+                        canonical_ids.append(event.id)
+                        continue
+                    canonical_id = self._find(sig)
+                    if canonical_id is None:
+                        canonical_id = event.id
+                        self._insert_canonical(canonical_id, sig)
+                        conn.execute("INSERT OR REPLACE INTO canonicals (id, signature) VALUES (?, ?)", (canonical_id, sig.tobytes()))
+                    else:
+                        self._members[event.id] = canonical_id
+                        self._canonicals[canonical_id].members.append(event.id)
+                        conn.execute("INSERT OR REPLACE INTO members (id, canonical_id) VALUES (?, ?)", (event.id, canonical_id))
+                canonical_ids.append(canonical_id)
+            self._evict(conn)
+            conn.commit()
+        return canonical_ids
+
+    def duplicates(self, canonical_id: str) -> int:
+        """Return how many other events are grouped under a canonical event."""
+        with self._lock:
+            canonical = self._canonicals.get(canonical_id)
+            return len(canonical.members) - 1 if canonical is not None else 0
+
+    def stats(self) -> dict:
+        """Return the number of canonical events, indexed events and LSH buckets."""
+        with self._lock:
+            self._connect()
+            return {
+                "canonical_events": len(self._canonicals),
+                "events": len(self._members),
+                "buckets": len(self._buckets),
+                "max_entries": self.max_entries,
+            }
+
+    def clear(self) -> int:
+        """Remove every indexed event and return how many canonical events were removed."""
+        with self._lock:
+            conn = self._connect()
+            removed = len(self._canonicals)
+            self._canonicals.clear()
+            self._members.clear()
+            self._buckets.clear()
+            conn.execute("DELETE FROM canonicals")
+            conn.execute("DELETE FROM members")
+            conn.commit()
+            return removed
+
+
+def collapse(events: List[EventItem], index: "DedupeIndex" = None) -> "OrderedDict[str, EventItem]":
+    """Collapse near-duplicate ``events`` into one event per canonical event.
+
+    Returns the first event of each group, in order and keyed by the id of the
+    canonical event, with ``duplicates`` set to the number of other copies
+    seen so far, including those from earlier fetches.
+    """
+    index = index or dedupe_index
+    collapsed: "OrderedDict[str, EventItem]" = OrderedDict()
+    for event, canonical_id in zip(events, index.add_many(events)):
+        if canonical_id not in collapsed:
+            collapsed[canonical_id] = event.model_copy(update={"duplicates": index.duplicates(canonical_id)})
+    return collapsed
+
+
+dedupe_index = DedupeIndex(path=DEDUPE_INDEX_PATH, max_entries=DEDUPE_MAX_ENTRIES)
@@ -0,0 +1,79 @@
+"""
+Background ingestion of GDELT events into the local event store.
+
+A daemon thread fetches the most recent days of each configured query on a
+fixed interval.  Fetched days go through the per-day GDELT cache, which
+writes them to the event store, so ``/fetch-events?mode=store`` can answer
+without waiting on GDELT.  After each run the new events are added to the
+search index and its snapshot is saved.
+"""
+
+import datetime
+import threading
+from typing import Dict, List, Optional
+
+import requests
+
+from polaris.core.config import (
+    EVENT_INGEST_INTERVAL_SECONDS,
+    EVENT_INGEST_LOOKBACK_DAYS,
+    EVENT_INGEST_QUERIES,
+    EVENT_STORE_RETENTION_DAYS,
+)
+from polaris.services.event_store import event_store
+from polaris.services.news_fetcher import day_events
+from polaris.services.search_index import search_index
+
+
+def ingest(queries: List[str], lookback_days: int = EVENT_INGEST_LOOKBACK_DAYS) -> Dict[str, int]:
+    """Fetch the last ``lookback_days`` days of each query into the store; return the events per query.
+
+    A failure for one query does not stop the others.
+    """
+    today = datetime.datetime.utcnow().date()
+    counts = {}
+    for q in queries:
+        try:
+            counts[q] = sum(len(day_events(q, today - datetime.timedelta(days=i))[0]) for i in range(lookback_days))
+        except (ValueError, OSError, requests.RequestException) as e:
+            print(f"Could not ingest events for '{q}': {e}")
+    if EVENT_STORE_RETENTION_DAYS > 0:
+        event_store.prune((today - datetime.timedelta(days=EVENT_STORE_RETENTION_DAYS)).isoformat())
+    search_index.refresh()
+    search_index.save()
+    return counts
+
+
+class EventIngester:
+    """Background thread that ingests the configured queries on a fixed interval."""
+
+    def __init__(self, queries: List[str], interval_seconds: float):
+        self.queries = queries
+        self.interval_seconds = interval_seconds
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        """Start ingesting in the background, if an interval and queries are configured."""
+        if self.interval_seconds <= 0 or not self.queries or self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="polaris-event-ingest", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the background thread."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _loop(self) -> None:
+        """Ingest immediately, then on every interval until stopped."""
+        while True:
+            ingest(self.queries)
+            if self._stop.wait(self.interval_seconds):
+                return
+
+
+event_ingester = EventIngester(EVENT_INGEST_QUERIES, EVENT_INGEST_INTERVAL_SECONDS)
@@ -0,0 +1,270 @@
+"""
+Local store of news events.
+
+Events fetched from GDELT are written to an embedded SQLite database, indexed
+by day, source country and source domain.  ``/fetch-events`` can then answer
+from the store in milliseconds instead of calling GDELT, which also keeps the
+API usable while GDELT is slow or unavailable.  The store is filled by every
+live fetch and by the background ingester in ``event_ingester``.
+
+Each fetched (query, countries, day) is also recorded, with when it was
+fetched and which events it returned.  Stored results for a query are the
+events of its recorded fetches, so the country codes of a query match
+exactly what GDELT returned for them, and the days a query is missing are
+known per query rather than for the store as a whole.
+"""
+
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from polaris.core.config import EVENT_STORE_PATH
+from polaris.models import EventItem
+
+_COLUMNS = ("id", "date", "source", "title", "url", "country", "actors", "location", "sentiment", "summary")
+
+
+def event_day(date: str) -> str:
+    """Return the YYYY-MM-DD day of an event date (GDELT ``20240131T101500Z`` or ISO 8601)."""
+    if re.match(r"^\d{8}", date or ""):
+        return f"{date[:4]}-{date[4:6]}-{date[6:8]}"
+    return (date or "")[:10]
+
+
+def _event(row: tuple) -> EventItem:
+    """Build an event from a row of ``_COLUMNS``."""
+    record = dict(zip(_COLUMNS, row))
+    record["actors"] = json.loads(record["actors"]) if record["actors"] is not None else None
+    return EventItem(**record)
+
+
+class EventStore:
+    """SQLite-backed store of events with indexes on day, source country and domain."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open the database on first use.  Caller holds the lock."""
+        if self._conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS events (
+                    id TEXT PRIMARY KEY,
+                    day TEXT NOT NULL,
+                    date TEXT NOT NULL,
+                    source TEXT NOT NULL,
+                    title TEXT NOT NULL,
+                    url TEXT NOT NULL,
+                    country TEXT,
+                    actors TEXT,
+                    location TEXT,
+                    sentiment REAL,
+                    summary TEXT,
+                    ingested_at REAL NOT NULL
+                )
+                """
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS events_day ON events (day, date)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS events_country ON events (country COLLATE NOCASE, day)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS events_source ON events (source, day)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS events_ingested ON events (ingested_at)")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS fetches (
+                    q TEXT NOT NULL,
+                    countries TEXT NOT NULL,
+                    day TEXT NOT NULL,
+                    fetched_at REAL NOT NULL,
+                    num_records INTEGER NOT NULL,
+                    events INTEGER NOT NULL,
+                    PRIMARY KEY (q, countries, day)
+                )
+                """
+            )
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS fetched_events (
+                    q TEXT NOT NULL,
+                    countries TEXT NOT NULL,
+                    day TEXT NOT NULL,
+                    id TEXT NOT NULL,
+                    PRIMARY KEY (q, countries, day, id)
+                )
+                """
+            )
+        return self._conn
+
+    def add_many(self, events: List[EventItem]) -> int:
+        """Insert new events and update changed ones; return how many were written.
+
+        ``ingested_at`` is only set when an event is new or changed, so the
+        search index can follow the store incrementally.
+        """
+        if not events:
+            return 0
+        with self._lock:
+            conn = self._connect()
+            self._upsert(conn, events)
+            conn.commit()
+        return len(events)
+
+    def _upsert(self, conn: sqlite3.Connection, events: List[EventItem]) -> None:
+        """Insert new events and update changed ones.  Caller holds the lock."""
+        # Taken under the lock so ``ingested_at`` increases in commit order.
+        now = time.time()
+        rows = [
+            (
+                e.id, event_day(e.date), e.date, e.source, e.title, e.url, e.country,
+                json.dumps(e.actors) if e.actors is not None else None,
+                e.location, e.sentiment, e.summary, now,
+            )
+            for e in events
+        ]
+        conn.executemany(
+            """
+            INSERT INTO events
+                (id, day, date, source, title, url, country, actors, location, sentiment, summary, ingested_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (id) DO UPDATE SET
+                day = excluded.day, date = excluded.date, source = excluded.source, title = excluded.title,
+                url = excluded.url, country = excluded.country, actors = excluded.actors,
+                location = excluded.location, sentiment = excluded.sentiment, summary = excluded.summary,
+                ingested_at = excluded.ingested_at
+            WHERE (events.date, events.source, events.title, events.url, events.country, events.actors,
+                   events.location, events.sentiment, events.summary)
+                IS NOT (excluded.date, excluded.source, excluded.title, excluded.url, excluded.country,
+                        excluded.actors, excluded.location, excluded.sentiment, excluded.summary)
+            """,
+            rows,
+        )
+
+    def add_fetch(self, q: str, countries: str, day: str, events: List[EventItem], fetched_at: float,
+                  num_records: int) -> None:
+        """Store the events GDELT returned for ``q`` and ``countries`` on ``day``, replacing an earlier fetch.
+
+        ``countries`` are the sorted, comma-separated country codes of the query.
+        """
+        with self._lock:
+            conn = self._connect()
+            self._upsert(conn, events)
+            conn.execute("DELETE FROM fetched_events WHERE q = ? AND countries = ? AND day = ?", (q, countries, day))
+            conn.executemany(
+                "INSERT OR IGNORE INTO fetched_events (q, countries, day, id) VALUES (?, ?, ?, ?)",
+                [(q, countries, day, e.id) for e in events],
+            )
+            conn.execute(
+                "INSERT OR REPLACE INTO fetches (q, countries, day, fetched_at, num_records, events) VALUES (?, ?, ?, ?, ?, ?)",
+                (q, countries, day, fetched_at, num_records, len(events)),
+            )
+            conn.commit()
+
+    def fetches(self, q: str, countries: str, since: str, until: str) -> Dict[str, Tuple[float, int, int]]:
+        """Return the recorded fetches of ``q`` and ``countries`` from ``since`` to ``until`` (exclusive).
+
+        Maps each fetched day to ``(fetched_at, num_records, events)``.
+        """
+        with self._lock:
+            rows = self._connect().execute(
+                "SELECT day, fetched_at, num_records, events FROM fetches WHERE q = ? AND countries = ? AND day >= ? AND day < ?",
+                (q, countries, since[:10], until[:10]),
+            ).fetchall()
+        return {day: (fetched_at, num_records, count) for day, fetched_at, num_records, count in rows}
+
+    def query_fetched(self, q: str, countries: str, since: str, until: str, limit: int = 50) -> List[EventItem]:
+        """Return the events fetched for ``q`` and ``countries`` from ``since`` to ``until`` (exclusive), most recent first."""
+        sql = f"""
+            SELECT {', '.join(f'e.{column}' for column in _COLUMNS)} FROM fetched_events f JOIN events e ON e.id = f.id
+            WHERE f.q = ? AND f.countries = ? AND f.day >= ? AND f.day < ?
+            GROUP BY e.id ORDER BY e.day DESC, e.date DESC LIMIT ?
+        """
+        with self._lock:
+            rows = self._connect().execute(sql, (q, countries, since[:10], until[:10], int(limit))).fetchall()
+        return [_event(row) for row in rows]
+
+    def query(self, q: str = "", countries: List[str] = (), since: str = "", until: str = "",
+              sources: List[str] = (), limit: int = 50) -> List[EventItem]:
+        """Return stored events, most recent first.
+
+        ``since`` is inclusive and ``until`` exclusive (YYYY-MM-DD), as with
+        GDELT.  Every word of ``q`` must appear in the title.  ``countries``
+        match the source country name, case-insensitively.
+        """
+        clauses, params = [], []
+        if since:
+            clauses.append("day >= ?")
+            params.append(since[:10])
+        if until:
+            clauses.append("day < ?")
+            params.append(until[:10])
+        if countries:
+            clauses.append(f"country COLLATE NOCASE IN ({', '.join('?' * len(countries))})")
+            params.extend(countries)
+        if sources:
+            clauses.append(f"source IN ({', '.join('?' * len(sources))})")
+            params.extend(sources)
+        for word in q.split():
+            clauses.append("title LIKE ?")
+            params.append(f"%{word}%")
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        sql = f"SELECT {', '.join(_COLUMNS)} FROM events {where} ORDER BY day DESC, date DESC LIMIT ?"
+
+        with self._lock:
+            rows = self._connect().execute(sql, (*params, int(limit))).fetchall()
+        return [_event(row) for row in rows]
+
+    def get_many(self, ids: List[str]) -> Dict[str, EventItem]:
+        """Return the stored events with the given ids, by id; missing ids are left out."""
+        events = {}
+        with self._lock:
+            conn = self._connect()
+            # Stay below SQLite's limit on the number of bound parameters.
+            for start in range(0, len(ids), 500):
+                batch = ids[start:start + 500]
+                sql = f"SELECT {', '.join(_COLUMNS)} FROM events WHERE id IN ({', '.join('?' * len(batch))})"
+                for row in conn.execute(sql, batch):
+                    events[row[0]] = _event(row)
+        return events
+
+    def changed_since(self, after: Tuple[float, int], limit: int) -> List[tuple]:
+        """Return up to ``limit`` events added or changed after the ``(ingested_at, rowid)`` position.
+
+        Rows are ``(ingested_at, rowid, id, day, country, title, summary)``, in
+        the order they were written.
+        """
+        with self._lock:
+            return self._connect().execute(
+                """
+                SELECT ingested_at, rowid, id, day, country, title, summary FROM events
+                WHERE (ingested_at, rowid) > (?, ?) ORDER BY ingested_at, rowid LIMIT ?
+                """,
+                (after[0], after[1], int(limit)),
+            ).fetchall()
+
+    def prune(self, before_day: str) -> int:
+        """Remove events and fetches from days before ``before_day`` and return how many events were removed."""
+        with self._lock:
+            conn = self._connect()
+            removed = conn.execute("DELETE FROM events WHERE day < ?", (before_day,)).rowcount
+            conn.execute("DELETE FROM fetches WHERE day < ?", (before_day,))
+            conn.execute("DELETE FROM fetched_events WHERE day < ?", (before_day,))
+            conn.commit()
+            return removed
+
+    def stats(self) -> dict:
+        """Return the number of stored events and the range of days they cover."""
+        with self._lock:
+            count, first, last = self._connect().execute("SELECT COUNT(*), MIN(day), MAX(day) FROM events").fetchone()
+        return {"events": count, "first_day": first, "last_day": last}
+
+
+event_store = EventStore(EVENT_STORE_PATH)
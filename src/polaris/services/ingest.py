@@ -0,0 +1,203 @@
+"""
+Service for converting downloaded data sources into a compact columnar format.
+
+Each source is converted once from CSV into an Arrow IPC file.  During the
+conversion, columns the codebook does not mention are dropped, low-cardinality
+string columns become categoricals and numeric columns are downcast.  Later
+loads memory-map the Arrow file instead of parsing the CSV again.  The name
+of the Arrow file includes a hash of the selected columns, so a codebook that
+selects other columns gets its own conversion.
+
+The conversion streams the CSV in chunks of ``INGEST_CHUNK_ROWS`` rows, so it
+runs in bounded memory regardless of the file size: a first pass settles the
+dtype of each column across the whole file, and a second pass parses each
+chunk with those dtypes and appends it to the Arrow file as a record batch.
+"""
+
+import glob
+import hashlib
+import json
+import os
+import re
+import tempfile
+from typing import Dict, List, Optional, Tuple
+
+from polaris.core.lazy import lazy_import
+from polaris.services.data_loader import iter_csv_chunks
+
+pd = lazy_import("pandas")
+pa = lazy_import("pyarrow", optional=True)
+
+
+COLUMNAR_SUFFIX = ".arrow"
+
+# Part of the columnar file name; bump it when the conversion rules change so files are converted again.
+CONVERSION_VERSION = 1
+
+# String columns with at most this ratio of unique values become categoricals.
+CATEGORICAL_MAX_UNIQUE_RATIO = 0.5
+
+# Unique values tracked per string column while scanning; columns with more stay strings.
+CATEGORICAL_MAX_CATEGORIES = 100_000
+
+
+def columnar_path(csv_path: str, columns: Optional[List[str]] = None) -> str:
+    """Return the path of the columnar file of a CSV file converted with ``columns`` (``None`` for all)."""
+    digest = hashlib.sha256(json.dumps([CONVERSION_VERSION, columns]).encode("utf-8")).hexdigest()[:12]
+    return f"{os.path.splitext(csv_path)[0]}.{digest}{COLUMNAR_SUFFIX}"
+
+
+def _remove_other_conversions(csv_path: str, keep: str) -> None:
+    """Remove the columnar files of ``csv_path`` written with other columns or rules."""
+    stem = glob.escape(os.path.splitext(csv_path)[0])
+    for path in glob.glob(f"{stem}{COLUMNAR_SUFFIX}") + glob.glob(f"{stem}.*{COLUMNAR_SUFFIX}"):
+        if path != keep:
+            try:
+                os.unlink(path)
+            except OSError as e:
+                print(f"Could not remove the outdated columnar file {path}: {e}")
+
+
+def codebook_columns(header: List[str], codebook_context: str) -> Optional[List[str]]:
+    """Return the columns of ``header`` that the codebook mentions.
+
+    Returns ``None`` (keep every column) if there is no codebook or it does not
+    mention any of the columns.
+    """
+    if not codebook_context:
+        return None
+    columns = [
+        column for column in header
+        if re.search(rf"(?<![\w]){re.escape(column)}(?![\w])", codebook_context)
+    ]
+    return columns or None
+
+
+def compact_dtypes(df: "pd.DataFrame") -> "pd.DataFrame":
+    """Convert low-cardinality strings to categoricals and downcast numerics in place."""
+    for column in df.columns:
+        series = df[column]
+        if pd.api.types.is_bool_dtype(series):
+            continue
+        if pd.api.types.is_integer_dtype(series):
+            df[column] = pd.to_numeric(series, downcast="integer")
+        elif pd.api.types.is_float_dtype(series):
+            df[column] = pd.to_numeric(series, downcast="float")
+        elif pd.api.types.is_object_dtype(series) or pd.api.types.is_string_dtype(series):
+            if len(series) and series.nunique(dropna=True) <= CATEGORICAL_MAX_UNIQUE_RATIO * len(series):
+                df[column] = series.astype("category")
+    return df
+
+
+class _ColumnScan:
+    """Dtype information gathered for one column across all chunks of a CSV file."""
+
+    def __init__(self):
+        self.kind: Optional[str] = None
+        self.minimum = None
+        self.maximum = None
+        self.values: Optional[set] = set()
+
+    def update(self, series: "pd.Series") -> None:
+        """Fold one chunk of the column into the scan."""
+        if pd.api.types.is_bool_dtype(series):
+            kind = "bool"
+        elif pd.api.types.is_integer_dtype(series):
+            kind = "int"
+        elif pd.api.types.is_float_dtype(series):
+            kind = "float"
+        else:
+            kind = "str"
+
+        if self.kind is None or self.kind == kind:
+            self.kind = kind
+        elif {self.kind, kind} == {"int", "float"}:
+            self.kind = "float"
+        else:
+            # Columns that mix types are kept as strings, as pandas would with the whole file.
+            self.kind, self.values = "str", None
+
+        if kind in ("int", "float") and series.notna().any():
+            low, high = series.min(), series.max()
+            self.minimum = low if self.minimum is None else min(self.minimum, low)
+            self.maximum = high if self.maximum is None else max(self.maximum, high)
+        if self.values is not None:
+            if kind == "str":
+                self.values.update(series.dropna().astype(str).unique().tolist())
+                if len(self.values) > CATEGORICAL_MAX_CATEGORIES:
+                    self.values = None
+            elif self.kind == "str":
+                self.values = None
+
+    def dtype(self, num_rows: int):
+        """Return the compact dtype for the column, as ``compact_dtypes`` would choose it."""
+        if self.kind == "bool":
+            return "bool"
+        if self.kind in ("int", "float"):
+            bounds = pd.Series([self.minimum or 0, self.maximum or 0], dtype="float64" if self.kind == "float" else "int64")
+            return pd.to_numeric(bounds, downcast="integer" if self.kind == "int" else "float").dtype
+        if self.values is not None and num_rows and len(self.values) <= CATEGORICAL_MAX_UNIQUE_RATIO * num_rows:
+            return pd.CategoricalDtype(sorted(self.values))
+        return "object"
+
+
+def scan_dtypes(csv_path: str, columns: Optional[List[str]] = None) -> Tuple[Dict[str, object], int]:
+    """Scan a CSV file chunk by chunk and return the compact dtype of each column and the row count."""
+    scans: Dict[str, _ColumnScan] = {}
+    num_rows = 0
+    for chunk in iter_csv_chunks(csv_path, usecols=columns):
+        num_rows += len(chunk)
+        for column in chunk.columns:
+            scans.setdefault(column, _ColumnScan()).update(chunk[column])
+    return {column: scan.dtype(num_rows) for column, scan in scans.items()}, num_rows
+
+
+def _read_dtypes(dtypes: Dict[str, object]) -> Dict[str, object]:
+    """Return the dtypes to pass to ``read_csv`` for the second pass."""
+    # String columns are read as ``str`` so values that look numeric in one chunk stay strings.
+    return {column: str if dtype == "object" else dtype for column, dtype in dtypes.items()}
+
+
+def ensure_columnar(csv_path: str, codebook_context: str = "") -> str:
+    """Convert ``csv_path`` to a compact Arrow IPC file if it is not already converted.
+
+    Returns the path to the columnar file, or ``csv_path`` unchanged if the
+    file is not a CSV or pyarrow is not installed.  The file is converted again
+    when the codebook selects other columns.
+    """
+    if pa is None or not csv_path.endswith(".csv"):
+        return csv_path
+
+    header = list(pd.read_csv(csv_path, nrows=0).columns)
+    columns = codebook_columns(header, codebook_context)
+    arrow_path = columnar_path(csv_path, columns)
+    if os.path.exists(arrow_path) and os.path.getmtime(arrow_path) >= os.path.getmtime(csv_path):
+        return arrow_path
+
+    print(f"Converting {csv_path} to columnar format ({len(columns or header)} of {len(header)} columns)")
+    dtypes, num_rows = scan_dtypes(csv_path, columns)
+    print(f"Scanned {num_rows} rows of {csv_path}")
+
+    # Write to a temporary file first so readers never see a partial file.
+    fd, tmp_path = tempfile.mkstemp(suffix=".tmp", dir=os.path.dirname(arrow_path))
+    os.close(fd)
+    try:
+        with pa.OSFile(tmp_path, "wb") as sink:
+            writer = None
+            for chunk in iter_csv_chunks(csv_path, usecols=columns, dtype=_read_dtypes(dtypes)):
+                chunk = chunk.astype(dtypes)
+                if writer is None:
+                    schema = pa.Table.from_pandas(chunk, preserve_index=False).schema
+                    writer = pa.ipc.new_file(sink, schema)
+                writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+            if writer is None:
+                # A CSV without rows still gets a (header-only) columnar file.
+                empty = pd.read_csv(csv_path, nrows=0, usecols=columns)
+                writer = pa.ipc.new_file(sink, pa.Table.from_pandas(empty, preserve_index=False).schema)
+            writer.close()
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    os.replace(tmp_path, arrow_path)
+    _remove_other_conversions(csv_path, arrow_path)
+    return arrow_path
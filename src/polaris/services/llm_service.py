@@ -1,15 +1,153 @@
 """
 Service for interacting with the LLM.
 
-This service now uses a multi-agent system to generate responses.
+This service now uses a multi-agent system to generate responses.  Data
+questions go through the ``OrchestratorAgent``; plain prompts such as briefs
+are sent to the model directly.
 """
 
+import asyncio
+import time
+from typing import AsyncIterator, Optional
+
 from polaris.agents.orchestrator import OrchestratorAgent
+from polaris.core.lazy import lazy_import
+from polaris.services import metrics
+from polaris.services.response_cache import normalize_prompt, response_cache
+from polaris.services.single_flight import SingleFlight
+
+ollama = lazy_import("ollama")
+
+_orchestrator_agent: Optional[OrchestratorAgent] = None
+
+# Identical concurrent generations are coalesced into one call to the model.
+single_flight = SingleFlight()
+
+
+def get_orchestrator_agent() -> OrchestratorAgent:
+    """Return the shared orchestrator, creating it on first use."""
+    global _orchestrator_agent
+    if _orchestrator_agent is None:
+        _orchestrator_agent = OrchestratorAgent()
+    return _orchestrator_agent
+
+
+def _flight_key(kind: str, model: str, prompt: str, sources: list[str] = (), format: str = "") -> tuple:
+    """Build the key under which identical concurrent calls are coalesced."""
+    return (kind, model, normalize_prompt(prompt), tuple(sorted(sources)), format)
+
+
+def _merge_meta(meta: Optional[dict], shared_meta: dict, coalesced: bool) -> None:
+    """Copy the metadata of a (possibly shared) generation into the caller's ``meta``."""
+    if meta is not None:
+        meta.update(shared_meta)
+        meta["coalesced"] = coalesced
 
-orchestrator_agent = OrchestratorAgent()
 
 def generate_response(prompt: str, model: str = "llama3", sources: list[str] = []) -> str:
     """
     Generates a response from the language model.
+
+    Concurrent calls with the same model, prompt and sources share one generation.
+    """
+    response, _ = single_flight.do_sync(
+        _flight_key("generate", model, prompt, sources),
+        lambda: get_orchestrator_agent().run(prompt, sources=sources, model=model),
+    )
+    return response
+
+
+async def agenerate_response(prompt: str, model: str = "llama3", sources: list[str] = [], meta: Optional[dict] = None) -> str:
+    """
+    Generates a response from the language model without blocking the event loop.
+
+    Concurrent calls with the same model, prompt and sources share one
+    generation.  If a ``meta`` dict is passed, it is filled with response
+    metadata such as whether the response came from the cache and whether the
+    call was coalesced into another one.
+    """
+    async def generate() -> tuple:
+        shared_meta = {}
+        response = await get_orchestrator_agent().arun(prompt, sources=sources, model=model, meta=shared_meta)
+        return response, shared_meta
+
+    (response, shared_meta), coalesced = await single_flight.do(_flight_key("generate", model, prompt, sources), generate)
+    _merge_meta(meta, shared_meta, coalesced)
+    return response
+
+
+def stream_response(prompt: str, model: str = "llama3", sources: list[str] = []) -> AsyncIterator[dict]:
+    """
+    Generates a response from the language model, yielding tokens as they arrive.
+    """
+    return get_orchestrator_agent().astream(prompt, sources=sources, model=model)
+
+
+async def acomplete(prompt: str, model: str = "llama3", format: str = "", meta: Optional[dict] = None) -> str:
+    """
+    Returns the model's reply to a plain prompt, without any data analysis.
+
+    Replies are served from the response cache when possible, and concurrent
+    identical prompts share one generation; ``meta`` is filled with both
+    outcomes.
+    """
+    async def complete() -> tuple:
+        shared_meta = {}
+        content = await _complete(prompt, model, format, shared_meta)
+        return content, shared_meta
+
+    (content, shared_meta), coalesced = await single_flight.do(_flight_key("complete", model, prompt, format=format), complete)
+    _merge_meta(meta, shared_meta, coalesced)
+    return content
+
+
+async def _complete(prompt: str, model: str, format: str, meta: dict) -> str:
+    """Return the model's reply to a plain prompt, using the response cache."""
+    key = response_cache.make_key(model, prompt, version=format)
+    content = await asyncio.to_thread(response_cache.get, key)
+    meta["cache"] = "hit" if content is not None else "miss"
+    if content is not None:
+        return content
+
+    with metrics.stage("llm.complete"):
+        response = await ollama.AsyncClient().chat(
+            model=model,
+            messages=[{"role": "user", "content": prompt}],
+            format=format,
+        )
+    metrics.record_ollama(model, response)
+    content = response["message"]["content"]
+    await asyncio.to_thread(response_cache.put, key, model, content)
+    return content
+
+
+async def astream_completion(prompt: str, model: str = "llama3", format: str = "", meta: Optional[dict] = None) -> AsyncIterator[str]:
+    """
+    Yields the model's reply to a plain prompt token by token.
+
+    A cached reply is yielded in one piece; ``meta`` is filled with the cache
+    outcome.
     """
-    return orchestrator_agent.run(prompt, sources=sources, model=model)
+    key = response_cache.make_key(model, prompt, version=format)
+    content = await asyncio.to_thread(response_cache.get, key)
+    if meta is not None:
+        meta["cache"] = "hit" if content is not None else "miss"
+    if content is not None:
+        yield content
+        return
+
+    chunks = []
+    started = time.perf_counter()
+    stream = await ollama.AsyncClient().chat(
+        model=model,
+        messages=[{"role": "user", "content": prompt}],
+        format=format,
+        stream=True,
+    )
+    async for part in stream:
+        chunks.append(part["message"]["content"])
+        if part.get("done"):
+            metrics.record_ollama(model, part)
+        yield chunks[-1]
+    metrics.record("llm.complete", time.perf_counter() - started)
+    await asyncio.to_thread(response_cache.put, key, model, "".join(chunks))
@@ -0,0 +1,240 @@
+"""
+Process-wide metrics, exposed in the Prometheus text format on ``/metrics``.
+
+Counters and histograms are kept in memory.  ``stage`` times one step of a
+request, such as a download, a dataset load or an LLM call, into the
+``polaris_stage_duration_seconds`` histogram.  ``record_ollama`` adds the token
+counts and durations Ollama reports for each call.
+
+A client can also ask for the timings of its own request by sending the
+``X-Polaris-Debug: timings`` header.  The stages and Ollama durations recorded
+while the request is handled are then collected for that request only and
+returned in a ``Server-Timing`` response header.
+"""
+
+import bisect
+import contextvars
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# Histogram buckets in seconds, from fast lookups to slow generations on CPU.
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+# Request header asking for a per-request timing breakdown, and the value that enables it.
+DEBUG_HEADER = "x-polaris-debug"
+DEBUG_HEADER_TIMINGS = "timings"
+
+# Duration fields of an Ollama response (in nanoseconds), by phase.
+_OLLAMA_PHASES = {"load": "load_duration", "prompt_eval": "prompt_eval_duration", "eval": "eval_duration"}
+
+
+def _format(value: float) -> str:
+    """Format a sample value as Prometheus expects."""
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    """Return the label set of a sample, e.g. ``{stage="load",le="0.5"}``."""
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    """A named metric with a fixed set of label names."""
+
+    type = ""
+
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple[str, ...], object] = {}
+
+    def _key(self, labels: Dict[str, object]) -> Tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} takes the labels {', '.join(self.labelnames)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+        return "\n".join(lines + self.samples())
+
+
+class Counter(_Metric):
+    """A value that only goes up, per label set."""
+
+    type = "counter"
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0.0)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        return [f"{self.name}{_labels(self.labelnames, key)} {_format(value)}" for key, value in values]
+
+
+class Histogram(_Metric):
+    """Counts of observations in cumulative buckets, with their sum, per label set."""
+
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = (), buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.get(key) or ([0] * (len(self.buckets) + 1), 0.0)
+            counts[bisect.bisect_left(self.buckets, value)] += 1
+            self._values[key] = (counts, total + value)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = sorted((key, (list(counts), total)) for key, (counts, total) in self._values.items())
+        lines = []
+        for key, (counts, total) in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                le = 'le="%s"' % _format(bound)
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {_format(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+
+class Registry:
+    """The metrics of the process, rendered together."""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def counter(self, name: str, help: str, labelnames: Tuple[str, ...] = ()) -> Counter:
+        return self._register(Counter(name, help, labelnames))
+
+    def histogram(self, name: str, help: str, labelnames: Tuple[str, ...] = (), buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help, labelnames, buckets))
+
+    def _register(self, metric: _Metric) -> _Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        """Return every metric in the Prometheus text exposition format."""
+        return "\n".join(metric.render() for metric in self._metrics.values()) + "\n"
+
+
+registry = Registry()
+
+http_requests = registry.counter("polaris_http_requests_total", "HTTP requests handled, by route and status.", ("method", "route", "status"))
+http_request_duration = registry.histogram("polaris_http_request_duration_seconds", "Time to handle an HTTP request.", ("method", "route"))
+stage_duration = registry.histogram("polaris_stage_duration_seconds", "Time spent in each stage of a request.", ("stage",))
+cache_requests = registry.counter("polaris_cache_requests_total", "Cache lookups, by cache and result.", ("cache", "result"))
+ollama_tokens = registry.counter("polaris_ollama_tokens_total", "Tokens processed by Ollama, by model and kind (prompt or completion).", ("model", "kind"))
+ollama_duration = registry.histogram("polaris_ollama_duration_seconds", "Time Ollama reported for loading the model, processing the prompt and generating.", ("model", "phase"))
+
+# Timings of the current request, when the client asked for them.
+_request_timings: "contextvars.ContextVar[Optional[List[Tuple[str, float]]]]" = contextvars.ContextVar("request_timings", default=None)
+
+
+def start_request_timings() -> contextvars.Token:
+    """Collect the timings of the current request; undo with ``stop_request_timings``."""
+    return _request_timings.set([])
+
+
+def stop_request_timings(token: contextvars.Token) -> None:
+    _request_timings.reset(token)
+
+
+def request_timings() -> Optional[List[Tuple[str, float]]]:
+    """Return the ``(stage, seconds)`` recorded so far for the current request, if they are collected."""
+    return _request_timings.get()
+
+
+def _add_request_timing(name: str, seconds: float) -> None:
+    timings = _request_timings.get()
+    if timings is not None:
+        timings.append((name, seconds))
+
+
+def record(name: str, seconds: float) -> None:
+    """Record the duration of a stage that was timed elsewhere."""
+    stage_duration.observe(seconds, stage=name)
+    _add_request_timing(name, seconds)
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Time the body of the ``with`` block as the stage ``name``."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - started)
+
+
+def count_cache(cache: str, hit: bool) -> None:
+    """Count a lookup in ``cache``."""
+    cache_requests.inc(cache=cache, result="hit" if hit else "miss")
+
+
+def _field(response, name: str):
+    """Return a field of an Ollama response, which is a mapping or a model object depending on the client version."""
+    try:
+        return response.get(name)
+    except AttributeError:
+        return getattr(response, name, None)
+
+
+def record_ollama(model: str, response) -> None:
+    """Record the token counts and durations of a (final, for streams) Ollama chat response."""
+    for kind, field in (("prompt", "prompt_eval_count"), ("completion", "eval_count")):
+        count = _field(response, field)
+        if count:
+            ollama_tokens.inc(count, model=model, kind=kind)
+    for phase, field in _OLLAMA_PHASES.items():
+        nanoseconds = _field(response, field)
+        if nanoseconds:
+            ollama_duration.observe(nanoseconds / 1e9, model=model, phase=phase)
+            _add_request_timing(f"ollama.{phase}", nanoseconds / 1e9)
+
+
+def timings_ms(timings: List[Tuple[str, float]]) -> Dict[str, float]:
+    """Return the total milliseconds of each stage in ``timings``."""
+    totals: Dict[str, float] = {}
+    for name, seconds in timings:
+        totals[name] = totals.get(name, 0.0) + seconds
+    return {name: round(seconds * 1000, 1) for name, seconds in totals.items()}
+
+
+def server_timing(timings: List[Tuple[str, float]], total: Optional[float] = None) -> str:
+    """Format timings as a ``Server-Timing`` header value, in milliseconds."""
+    entries = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in timings]
+    if total is not None:
+        entries.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(entries)
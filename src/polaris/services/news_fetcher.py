@@ -2,14 +2,321 @@
 Service for fetching news events.
 
 This module provides an implementation for fetching events from the GDELT DOC API.
+
+Results are cached in per-day buckets keyed by (query, countries, day).  A
+request for a date window is split into days and only the days that are not
+cached are fetched from GDELT, up to ``GDELT_FETCH_WORKERS`` at a time.  Each
+day returns at most 250 articles, so a window yields the most recent
+``maxrecs`` events rather than GDELT's own selection over the whole window.  A day fetched after it was over (plus a grace
+period for late articles) is cached until evicted, while the current day, or a
+past day fetched before it was over, expires after a short TTL because new
+articles keep arriving.
+This makes sliding-window polling cheap and keeps us under the GDELT rate
+limits.
+
+Fetched events are also written to the local event store, together with the
+(query, countries, day) they were fetched for.  The store can answer a query
+without calling GDELT (``mode="store"``), or after a live fetch of only the
+days of the window that were not stored for that query yet, or were stored
+before they were complete (``mode="delta"``).
 """
 
-from typing import List
-import gdeltdoc
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List, Optional, Tuple
+import contextvars
+import threading
+import time
+from pydantic import TypeAdapter
+from polaris.core.config import GDELT_CACHE_MAX_BUCKETS, GDELT_DAY_GRACE_SECONDS, GDELT_FETCH_WORKERS, GDELT_TODAY_TTL_SECONDS
+from polaris.core.lazy import lazy_import
 from polaris.models import EventItem
+from polaris.services import metrics
+from polaris.services.dedupe import collapse
+from polaris.services.event_store import event_store
+from polaris.services.single_flight import SingleFlight
 import datetime
 
-def fetch_events(q: str = "", countries: str = "", since: str = "", until: str = "", maxrecs: int = 50) -> List[EventItem]:
+gdeltdoc = lazy_import("gdeltdoc")
+pd = lazy_import("pandas")
+
+# The GDELT DOC API returns at most this many records per query.
+GDELT_MAX_RECORDS = 250
+
+BucketKey = Tuple[str, Tuple[str, ...], datetime.date]
+
+# Validates a whole list of event records in one call.
+_event_list = TypeAdapter(List[EventItem])
+
+
+class _DayBucket:
+    """The events fetched for one (query, countries, day)."""
+
+    def __init__(self, events: List[EventItem], num_records: int):
+        self.events = events
+        self.num_records = num_records
+        self.fetched_at = time.time()
+
+    def covers(self, maxrecs: int) -> bool:
+        """Return whether the bucket can answer a request for ``maxrecs`` records."""
+        return _covers(self.num_records, len(self.events), maxrecs)
+
+
+def _covers(num_records: int, events: int, maxrecs: int) -> bool:
+    """Return whether ``events`` fetched with ``num_records`` can answer a request for ``maxrecs`` records."""
+    # A fetch that returned fewer events than were requested has every event of its day.
+    return num_records >= maxrecs or events < num_records
+
+
+_buckets: "OrderedDict[BucketKey, _DayBucket]" = OrderedDict()
+_buckets_lock = threading.Lock()
+_bucket_fetches = SingleFlight()
+# Shared by all requests, so it also bounds the concurrent GDELT calls of the process.
+_fetch_executor = ThreadPoolExecutor(max_workers=GDELT_FETCH_WORKERS, thread_name_prefix="polaris-gdelt")
+_gdelt_client: "Optional[gdeltdoc.GdeltDoc]" = None
+
+
+def _client() -> "gdeltdoc.GdeltDoc":
+    """Return the shared GDELT DOC client."""
+    global _gdelt_client
+    if _gdelt_client is None:
+        _gdelt_client = gdeltdoc.GdeltDoc()
+    return _gdelt_client
+
+
+def _parse_date(value: str) -> datetime.date:
+    """Parse a YYYY-MM-DD (or longer ISO 8601) date."""
+    return datetime.date.fromisoformat(value[:10])
+
+
+def _to_events(articles) -> List[EventItem]:
+    """Convert a GDELT article DataFrame into event items, most recent first.
+
+    The columns are mapped in bulk and the records are validated in one pass,
+    instead of building one model per ``iterrows()`` row.
+    """
+    if articles is None or articles.empty:
+        return []
+
+    articles = articles.sort_values("seendate", ascending=False, kind="stable")
+    columns = pd.DataFrame({
+        "id": articles["url"],  # GDELT DOC API does not provide a stable ID
+        "date": articles["seendate"],
+        "source": articles["domain"],
+        "title": articles["title"],
+        "url": articles["url"],
+        "country": articles["sourcecountry"],
+        "sentiment": pd.to_numeric(articles["tone"], errors="coerce") if "tone" in articles else None,
+    })
+    # Missing values become None rather than NaN so they validate as optional fields.
+    columns = columns.astype(object).where(columns.notna(), None)
+    # Actors, location and summary are not directly available in the DOC API.
+    records = columns.to_dict("records")
+    for record in records:
+        record["actors"] = []
+    return _event_list.validate_python(records)
+
+
+def _fetch_day(q: str, countries: Tuple[str, ...], day: datetime.date, num_records: int) -> _DayBucket:
+    """Fetch the events for a single day from GDELT."""
+    filters = gdeltdoc.Filters(
+        start_date=day.strftime("%Y-%m-%d"),
+        end_date=(day + datetime.timedelta(days=1)).strftime("%Y-%m-%d"),
+        keyword=q,
+        country=list(countries) if countries else None,
+        num_records=num_records
+    )
+    with metrics.stage("gdelt.fetch"):
+        return _DayBucket(_to_events(_client().article_search(filters)), num_records)
+
+
+def _day_end(day: datetime.date) -> float:
+    """Return the end of ``day`` (UTC) as a timestamp."""
+    return datetime.datetime.combine(day + datetime.timedelta(days=1), datetime.time(), tzinfo=datetime.timezone.utc).timestamp()
+
+
+def is_complete(day: datetime.date, fetched_at: float) -> bool:
+    """Return whether results for ``day`` fetched at ``fetched_at`` include its late articles."""
+    return fetched_at >= _day_end(day) + GDELT_DAY_GRACE_SECONDS
+
+
+def is_fresh(day: datetime.date, fetched_at: float, now: float) -> bool:
+    """Return whether results for ``day`` fetched at ``fetched_at`` can still be used at ``now``.
+
+    Complete days are kept until evicted; other days are fetched again once
+    their results are older than the TTL.
+    """
+    return is_complete(day, fetched_at) or now - fetched_at < GDELT_TODAY_TTL_SECONDS
+
+
+def _get_bucket(q: str, countries: Tuple[str, ...], day: datetime.date, maxrecs: int) -> _DayBucket:
+    """Return the cached bucket for a day, fetching it if it is missing, stale or too small."""
+    key = (q, countries, day)
+    with _buckets_lock:
+        bucket = _buckets.get(key)
+        if bucket is not None:
+            _buckets.move_to_end(key)
+    wanted = min(maxrecs, GDELT_MAX_RECORDS)
+    fresh = bucket is not None and is_fresh(day, bucket.fetched_at, time.time())
+    metrics.count_cache("gdelt", fresh and bucket.covers(wanted))
+    if fresh and bucket.covers(wanted):
+        return bucket
+
+    num_records = max(wanted, bucket.num_records if fresh else 0)
+    # Concurrent requests for the same missing day share one GDELT call.
+    bucket, coalesced = _bucket_fetches.do_sync(key + (num_records,), lambda: _fetch_day(q, countries, day, num_records))
+    if not coalesced:
+        # Every live fetch also fills the local event store.
+        event_store.add_fetch(q, ",".join(countries), day.isoformat(), bucket.events, bucket.fetched_at, bucket.num_records)
+    with _buckets_lock:
+        _buckets[key] = bucket
+        _buckets.move_to_end(key)
+        while len(_buckets) > GDELT_CACHE_MAX_BUCKETS:
+            _buckets.popitem(last=False)
+    return bucket
+
+
+def _iter_buckets(q: str, countries: Tuple[str, ...], days: List[datetime.date], maxrecs: int,
+                  ahead: int = 1) -> Iterator[_DayBucket]:
+    """Yield the buckets of ``days`` in order, getting the following ones concurrently.
+
+    The first ``ahead`` days are requested at once, and ``GDELT_FETCH_WORKERS``
+    once the first bucket was consumed, so a request answered by its first day
+    makes a single call.  A consumer that stops early leaves at most that many
+    fetches running, which still fill the cache.
+    """
+    remaining = iter(days)
+    pending: "deque" = deque()
+
+    def submit(limit: int) -> None:
+        while len(pending) < limit:
+            day = next(remaining, None)
+            if day is None:
+                return
+            pending.append(_fetch_executor.submit(contextvars.copy_context().run, _get_bucket, q, countries, day, maxrecs))
+
+    submit(ahead)
+    while pending:
+        bucket = pending.popleft().result()
+        submit(GDELT_FETCH_WORKERS)
+        yield bucket
+
+
+def day_events(q: str, day: datetime.date, countries: str = "") -> Tuple[List[EventItem], float]:
+    """Return the events of a single day and when they were fetched, using the day cache."""
+    bucket = _get_bucket(q, _split_countries(countries), day, GDELT_MAX_RECORDS)
+    return bucket.events, bucket.fetched_at
+
+
+def bucket_stats() -> Dict[str, int]:
+    """Return the number of cached day buckets and how many fetches were shared."""
+    with _buckets_lock:
+        return {"buckets": len(_buckets), **_bucket_fetches.stats()}
+
+
+def _window(since: str, until: str) -> Tuple[datetime.date, datetime.date]:
+    """Return the first and the (exclusive) last day of a query window, defaulting to the last day."""
+    if not since:
+        since = (datetime.datetime.utcnow() - datetime.timedelta(days=1)).strftime("%Y-%m-%d")
+    if not until:
+        until = datetime.datetime.utcnow().strftime("%Y-%m-%d")
+    return _parse_date(since), _parse_date(until)
+
+
+def _split_countries(countries: str) -> Tuple[str, ...]:
+    """Return the sorted country codes of a comma-separated list."""
+    return tuple(sorted(c.strip() for c in countries.split(",") if c.strip()))
+
+
+def _days(start: datetime.date, end: datetime.date) -> List[datetime.date]:
+    """Return the days of a window, oldest first."""
+    # As with the GDELT API, the end date is exclusive; a single-day window is still fetched.
+    return [start + datetime.timedelta(days=i) for i in range(max((end - start).days, 1))]
+
+
+def _iter_live(q: str, countries: str, start: datetime.date, end: datetime.date, maxrecs: int, dedupe: bool) -> Iterator[EventItem]:
+    """Yield events from the GDELT DOC API day by day, most recent first, up to ``maxrecs``."""
+    days = _days(start, end)
+    country_key = _split_countries(countries)
+
+    seen = set()
+    if maxrecs <= 0:
+        return
+    for bucket in _iter_buckets(q, country_key, list(reversed(days)), maxrecs):
+        events = bucket.events
+        # With dedupe, copies of a story published on different days are also skipped.
+        if dedupe:
+            with metrics.stage("events.dedupe"):
+                keyed = collapse(events).items()
+        else:
+            keyed = ((event.id, event) for event in events)
+        for key, event in keyed:
+            if key not in seen:
+                seen.add(key)
+                yield event
+                if len(seen) >= maxrecs:
+                    return
+
+
+def _iter_store(q: str, countries: str, start: datetime.date, end: datetime.date, maxrecs: int, dedupe: bool) -> Iterator[EventItem]:
+    """Yield the stored events fetched for the query and countries, most recent first."""
+    if maxrecs <= 0:
+        return
+    until = max(end, start + datetime.timedelta(days=1))
+    with metrics.stage("events.store_query"):
+        events = event_store.query_fetched(q, ",".join(_split_countries(countries)), start.isoformat(),
+                                           until.isoformat(), limit=maxrecs)
+    if dedupe:
+        with metrics.stage("events.dedupe"):
+            events = list(collapse(events).values())
+    yield from events
+
+
+def missing_days(q: str, countries: str, start: datetime.date, end: datetime.date, maxrecs: int) -> List[datetime.date]:
+    """Return the days of a window that the store cannot answer for the query and countries.
+
+    A day is missing if it was not fetched for them, if it was fetched before
+    it was complete and the results are older than the TTL, or if it was
+    fetched with fewer records than ``maxrecs`` and more may exist.
+    """
+    days = _days(start, end)
+    fetches = event_store.fetches(q, ",".join(_split_countries(countries)), days[0].isoformat(),
+                                  (days[-1] + datetime.timedelta(days=1)).isoformat())
+    wanted = min(maxrecs, GDELT_MAX_RECORDS)
+    now = time.time()
+    missing = []
+    for day in days:
+        fetch = fetches.get(day.isoformat())
+        if fetch is None or not is_fresh(day, fetch[0], now) or not _covers(fetch[1], fetch[2], wanted):
+            missing.append(day)
+    return missing
+
+
+def iter_events(q: str = "", countries: str = "", since: str = "", until: str = "", maxrecs: int = 50,
+                dedupe: bool = False, mode: str = "live") -> Iterator[EventItem]:
+    """Yield events, most recent first.
+
+    Takes the same parameters as ``fetch_events``.  In live mode days are
+    visited from the most recent to the oldest and each day's events are
+    already sorted, so events can be streamed to the client without
+    materialising the full list; the following days are fetched meanwhile.
+    """
+    start, end = _window(since, until)
+    if mode == "live":
+        yield from _iter_live(q, countries, start, end, maxrecs, dedupe)
+        return
+    if mode == "delta":
+        # Fetch only the days the store is missing for this query; the other days come from the store.
+        missing = list(reversed(missing_days(q, countries, start, end, maxrecs)))
+        for _ in _iter_buckets(q, _split_countries(countries), missing, maxrecs, ahead=GDELT_FETCH_WORKERS):
+            pass
+    elif mode != "store":
+        raise ValueError(f"Unknown mode '{mode}'.")
+    yield from _iter_store(q, countries, start, end, maxrecs, dedupe)
+
+
+def fetch_events(q: str = "", countries: str = "", since: str = "", until: str = "", maxrecs: int = 50,
+                 dedupe: bool = False, mode: str = "live") -> List[EventItem]:
     """Return a list of events from GDELT DOC API.
 
     Parameters
@@ -24,46 +331,25 @@ def fetch_events(q: str = "", countries: str = "", since: str = "", until: str =
         End date (ISO 8601).
     maxrecs: int
         Maximum number of records to return.
+    dedupe: bool
+        Collapse near-duplicate events (e.g. syndicated copies of a story)
+        into one event with a ``duplicates`` count.
+    mode: str
+        ``"live"`` to query GDELT, ``"store"`` to answer from the events
+        stored for the same query and countries only, or ``"delta"`` to fetch
+        only the days the store is missing for them and answer from the store.
 
     Returns
     -------
     List[EventItem]
-        A list of EventItem objects from GDELT.
+        A list of EventItem objects from GDELT, most recent first.  GDELT is
+        queried per day, so these are the most recent ``maxrecs`` events of
+        the window.
     """
+    with metrics.stage("events.fetch"):
+        return list(iter_events(q=q, countries=countries, since=since, until=until, maxrecs=maxrecs, dedupe=dedupe, mode=mode))
 
-    if not since:
-        since = (datetime.datetime.utcnow() - datetime.timedelta(days=1)).strftime("%Y-%m-%d")
-    if not until:
-        until = datetime.datetime.utcnow().strftime("%Y-%m-%d")
-
-    filters = gdeltdoc.Filters(
-        start_date=since,
-        end_date=until,
-        keyword=q,
-        country=countries.split(",") if countries else None,
-        num_records=maxrecs
-    )
 
-    gd = gdeltdoc.GdeltDoc()
-
-    articles = gd.article_search(filters)
-
-    events: List[EventItem] = []
-    if articles is not None and not articles.empty:
-        for index, row in articles.iterrows():
-            events.append(
-                EventItem(
-                    id=row["url"],  # GDELT DOC API does not provide a stable ID
-                    date=row["seendate"],
-                    source=row["domain"], 
-                    title=row["title"],
-                    url=row["url"],
-                    country=row["sourcecountry"],
-                    actors=[], # Not directly available in DOC API
-                    location=None, # Not directly available in DOC API
-                    sentiment=float(row["tone"]) if "tone" in row else None,
-                    summary=None # Not directly available in DOC API
-                )
-            )
-            
-    return events
+def dump_events_json(events: List[EventItem]) -> bytes:
+    """Serialise a list of events to JSON in one pass."""
+    return _event_list.dump_json(events)
@@ -0,0 +1,340 @@
+"""
+Declarative queries over loaded datasets.
+
+The predefined analysis functions only answer a few question shapes.  For
+anything else the LLM can emit a query plan: a small JSON document of
+filters, group-by columns, aggregates, sort keys and a limit.  Plans are data,
+not code: they are validated against a fixed grammar and the dataset's
+columns, and executed with vectorised pandas operations, so a plan cannot run
+arbitrary code.
+
+Results are cached per dataset, keyed by the normalised plan, so a repeated
+question is a lookup.  The cache lives as long as the dataset's aggregate
+index, so results are never served from a dataset that has been reloaded.
+Results are capped at ``QUERY_MAX_ROWS`` rows, and a plan is abandoned once
+it has run for ``QUERY_TIMEOUT_SECONDS``.
+"""
+
+import json
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from typing import Any, Dict, List, Literal, Optional
+
+import numpy as np
+from pydantic import BaseModel, ConfigDict, Field
+
+from polaris.core.config import QUERY_CACHE_MAX_ENTRIES, QUERY_MAX_ROWS, QUERY_TIMEOUT_SECONDS
+from polaris.core.lazy import lazy_import
+from polaris.services import metrics
+from polaris.services.data_analysis import AggregateIndex
+
+pd = lazy_import("pandas")
+
+# Limits on the size of a plan.
+MAX_FILTERS = 20
+MAX_GROUP_BY = 4
+MAX_AGGREGATES = 10
+MAX_VALUES = 1000
+
+Operator = Literal["==", "!=", "<", "<=", ">", ">=", "in", "not in", "between", "contains"]
+Function = Literal["count", "sum", "mean", "median", "min", "max", "nunique"]
+
+# Operators whose string comparisons ignore case, so their values can be normalised.
+_CASELESS = {"==", "!=", "in", "not in", "contains"}
+
+
+class QueryError(ValueError):
+    """Raised when a query plan is invalid or cannot be run.  The message is returned to the user."""
+
+
+class Filter(BaseModel):
+    """Keep the rows where ``column op value`` holds."""
+
+    model_config = ConfigDict(extra="forbid")
+
+    column: str
+    op: Operator
+    value: Any = None
+
+
+class Aggregate(BaseModel):
+    """An aggregate of a column (or of the rows, for ``count``), named ``name`` in the result."""
+
+    model_config = ConfigDict(extra="forbid")
+
+    func: Function
+    column: Optional[str] = None
+    name: Optional[str] = None
+
+    @property
+    def label(self) -> str:
+        """Return the name of the aggregate in the result."""
+        return self.name or (f"{self.func}_{self.column}" if self.column else self.func)
+
+
+class Sort(BaseModel):
+    """Sort the result by a column."""
+
+    model_config = ConfigDict(extra="forbid")
+
+    column: str
+    descending: bool = True
+
+
+class QueryPlan(BaseModel):
+    """A declarative query: filter, then group and aggregate (or select columns), then sort and limit."""
+
+    model_config = ConfigDict(extra="forbid")
+
+    filters: List[Filter] = Field(default_factory=list, max_length=MAX_FILTERS)
+    group_by: List[str] = Field(default_factory=list, max_length=MAX_GROUP_BY)
+    aggregates: List[Aggregate] = Field(default_factory=list, max_length=MAX_AGGREGATES)
+    columns: List[str] = Field(default_factory=list)
+    sort: List[Sort] = Field(default_factory=list, max_length=MAX_GROUP_BY + MAX_AGGREGATES)
+    limit: Optional[int] = Field(None, ge=1)
+
+
+# JSON schema of a plan, given to the LLM to constrain its output.
+PLAN_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "filters": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "column": {"type": "string"},
+                    "op": {"type": "string", "enum": list(Operator.__args__)},
+                    "value": {},
+                },
+                "required": ["column", "op", "value"],
+            },
+        },
+        "group_by": {"type": "array", "items": {"type": "string"}},
+        "aggregates": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "func": {"type": "string", "enum": list(Function.__args__)},
+                    "column": {"type": "string"},
+                    "name": {"type": "string"},
+                },
+                "required": ["func"],
+            },
+        },
+        "columns": {"type": "array", "items": {"type": "string"}},
+        "sort": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {"column": {"type": "string"}, "descending": {"type": "boolean"}},
+                "required": ["column"],
+            },
+        },
+        "limit": {"type": "integer"},
+    },
+}
+
+
+def describe_query_language(columns: Dict[str, List[str]]) -> str:
+    """Describe the query plan language and the columns of each dataset for the function-calling prompt."""
+    lines = [
+        "For questions the other functions cannot answer, call run_query with a plan:",
+        '{"filters": [{"column": ..., "op": one of ' + ", ".join(Operator.__args__) + ', "value": ...}],',
+        ' "group_by": [columns], "aggregates": [{"func": one of ' + ", ".join(Function.__args__) + ', "column": ..., "name": ...}],',
+        ' "columns": [columns to return when not aggregating], "sort": [{"column": ..., "descending": true}], "limit": n}',
+        "Use 'between' with a [low, high] list and 'in' with a list of values.",
+    ]
+    for name, names in columns.items():
+        lines.append(f"Columns of '{name}': {', '.join(names)}")
+    return "\n        ".join(lines)
+
+
+def normalize_plan(plan: QueryPlan) -> str:
+    """Return a canonical form of a plan: filter order and the case of caseless values do not matter."""
+    data = plan.model_dump()
+    for f in data["filters"]:
+        if f["op"] in _CASELESS:
+            values = f["value"] if isinstance(f["value"], list) else [f["value"]]
+            values = [v.strip().casefold() if isinstance(v, str) else v for v in values]
+            f["value"] = sorted(values, key=repr) if isinstance(f["value"], list) else values[0]
+    data["filters"] = sorted(data["filters"], key=lambda f: json.dumps(f, sort_keys=True, default=str))
+    return json.dumps(data, sort_keys=True, default=str)
+
+
+def _is_text(series: "pd.Series") -> bool:
+    """Return whether a column holds text (including categorical text)."""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return not pd.api.types.is_numeric_dtype(series.cat.categories.dtype)
+    return not (pd.api.types.is_numeric_dtype(series.dtype) or pd.api.types.is_datetime64_any_dtype(series.dtype))
+
+
+def _text_mask(series: "pd.Series", test) -> np.ndarray:
+    """Apply ``test`` to the casefolded text of a column, once per category for categorical columns."""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        categories = pd.Series(series.cat.categories.astype(str)).str.strip().str.casefold()
+        matched = np.append(np.asarray(test(categories), dtype=bool), False)  # code -1 (missing) never matches
+        return matched[series.cat.codes.to_numpy()]
+    text = series.astype(str).str.strip().str.casefold()
+    return np.asarray(test(text), dtype=bool) & series.notna().to_numpy()
+
+
+def _scalar(series: "pd.Series", value):
+    """Convert a filter value to the type of a numeric or date column."""
+    if _is_text(series):
+        return value
+    try:
+        if pd.api.types.is_datetime64_any_dtype(series.dtype):
+            return pd.Timestamp(value)
+        return float(value)
+    except (TypeError, ValueError):
+        raise QueryError(f"Column '{series.name}' cannot be compared with '{value}'.")
+
+
+def _condition(series: "pd.Series", f: Filter) -> np.ndarray:
+    """Return the rows of ``series`` that satisfy a filter."""
+    if f.op in ("in", "not in", "between"):
+        if not isinstance(f.value, list) or len(f.value) > MAX_VALUES or (f.op == "between" and len(f.value) != 2):
+            raise QueryError(f"Operator '{f.op}' needs a list of {'two' if f.op == 'between' else 'at most %d' % MAX_VALUES} values.")
+    elif isinstance(f.value, (list, dict)):
+        raise QueryError(f"Operator '{f.op}' needs a single value.")
+
+    if f.op == "contains":
+        needle = str(f.value).strip().casefold()
+        return _text_mask(series, lambda text: text.str.contains(needle, regex=False))
+    if f.op in ("==", "!=", "in", "not in") and _is_text(series):
+        values = f.value if isinstance(f.value, list) else [f.value]
+        wanted = [str(v).strip().casefold() for v in values]
+        mask = _text_mask(series, lambda text: text.isin(wanted))
+        return ~mask if f.op in ("!=", "not in") else mask
+
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        series = series.astype(series.cat.categories.dtype)
+    if f.op == "between":
+        low, high = (_scalar(series, v) for v in f.value)
+        return (series.between(low, high)).to_numpy()
+    if f.op in ("in", "not in"):
+        mask = series.isin([_scalar(series, v) for v in f.value]).to_numpy()
+        return ~mask if f.op == "not in" else mask
+    value = _scalar(series, f.value)
+    comparisons = {"==": series.eq, "!=": series.ne, "<": series.lt, "<=": series.le, ">": series.gt, ">=": series.ge}
+    try:
+        return comparisons[f.op](value).to_numpy()
+    except TypeError as e:
+        raise QueryError(f"Cannot compare column '{series.name}' with '{f.value}': {e}")
+
+
+def _check_columns(df: "pd.DataFrame", columns: List[str]) -> None:
+    """Raise a QueryError naming the first column the dataset does not have."""
+    for column in columns:
+        if column not in df.columns:
+            raise QueryError(f"The dataset has no column '{column}'.")
+
+
+class _Deadline:
+    """Checked between the stages of a plan; pandas operations themselves cannot be interrupted."""
+
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+        self.at = time.monotonic() + seconds
+
+    def check(self) -> None:
+        """Raise a QueryError once the deadline has passed."""
+        if self.seconds > 0 and time.monotonic() > self.at:
+            raise QueryError(f"The query took longer than {self.seconds:g} seconds and was stopped.")
+
+
+def _top(frame: "pd.DataFrame", sort: List[Sort], limit: int) -> "pd.DataFrame":
+    """Return the first ``limit`` rows of ``frame`` in ``sort`` order."""
+    if not sort:
+        return frame.head(limit)
+    if len(sort) == 1 and pd.api.types.is_numeric_dtype(frame[sort[0].column].dtype):
+        key = sort[0]
+        return frame.nlargest(limit, key.column) if key.descending else frame.nsmallest(limit, key.column)
+    return frame.sort_values([s.column for s in sort], ascending=[not s.descending for s in sort]).head(limit)
+
+
+def execute_plan(df: "Optional[pd.DataFrame]", plan: QueryPlan, timeout_seconds: float = QUERY_TIMEOUT_SECONDS,
+                 max_rows: int = QUERY_MAX_ROWS) -> List[dict]:
+    """Run a validated plan against a DataFrame and return at most ``max_rows`` result rows."""
+    if df is None:
+        raise QueryError("The dataset is too large to query directly; only the predefined functions are available.")
+    deadline = _Deadline(timeout_seconds)
+    aggregated = bool(plan.group_by or plan.aggregates)
+    aggregates = plan.aggregates or ([Aggregate(func="count")] if plan.group_by else [])
+    _check_columns(df, [f.column for f in plan.filters] + plan.group_by + plan.columns
+                   + [a.column for a in aggregates if a.column])
+    for a in aggregates:
+        if a.func != "count" and not a.column:
+            raise QueryError(f"Aggregate '{a.func}' needs a column.")
+
+    mask = np.ones(len(df), dtype=bool)
+    for f in plan.filters:
+        mask &= _condition(df[f.column], f)
+        deadline.check()
+
+    limit = min(plan.limit or max_rows, max_rows)
+    if aggregated:
+        needed = list(dict.fromkeys(plan.group_by + [a.column for a in aggregates if a.column]))
+        frame = df.loc[mask, needed]
+        if plan.group_by:
+            groups = frame.groupby(plan.group_by, observed=True, sort=False)
+            result = pd.DataFrame({
+                a.label: groups.size() if a.column is None else groups[a.column].agg(a.func)
+                for a in aggregates
+            }).reset_index()
+        else:
+            result = pd.DataFrame([{
+                a.label: int(mask.sum()) if a.column is None else frame[a.column].agg(a.func)
+                for a in aggregates
+            }])
+        deadline.check()
+        if plan.sort:
+            _check_columns(result, [s.column for s in plan.sort])
+        result = _top(result, plan.sort, limit)
+    else:
+        # Only the rows and columns of the result are copied: the first ``limit`` matching rows, or
+        # the best ``limit`` by the sort keys, which are the only columns read from the other rows.
+        rows = np.flatnonzero(mask)
+        columns = df.columns.get_indexer(plan.columns or list(df.columns))
+        if plan.sort:
+            _check_columns(df, [s.column for s in plan.sort])
+            keys = df.iloc[rows, df.columns.get_indexer(list(dict.fromkeys(s.column for s in plan.sort)))]
+            keys.index = rows
+            deadline.check()
+            rows = _top(keys, plan.sort, limit).index.to_numpy()
+        result = df.iloc[rows[:limit], columns]
+    deadline.check()
+    return json.loads(result.to_json(orient="records", date_format="iso"))
+
+
+_results: "weakref.WeakKeyDictionary[AggregateIndex, OrderedDict[str, List[dict]]]" = weakref.WeakKeyDictionary()
+_results_lock = threading.Lock()
+
+
+def run_query(df: "pd.DataFrame", plan: dict, index: AggregateIndex = None) -> List[dict]:
+    """Run a query plan of filters, group-by columns, aggregates, sort keys and a limit."""
+    parsed = QueryPlan.model_validate(plan)
+    key = normalize_plan(parsed)
+    if index is not None:
+        with _results_lock:
+            cached = _results.get(index, {}).get(key)
+            if cached is not None:
+                _results[index].move_to_end(key)
+        metrics.count_cache("query", cached is not None)
+        if cached is not None:
+            return cached
+
+    with metrics.stage("query.execute"):
+        result = execute_plan(df, parsed)
+
+    if index is not None and QUERY_CACHE_MAX_ENTRIES > 0:
+        with _results_lock:
+            entries = _results.setdefault(index, OrderedDict())
+            entries[key] = result
+            while len(entries) > QUERY_CACHE_MAX_ENTRIES:
+                entries.popitem(last=False)
+    return result
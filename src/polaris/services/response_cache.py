@@ -0,0 +1,142 @@
+"""
+Persistent cache for LLM responses.
+
+Analysts often ask the same question several times.  Responses are stored in
+a local SQLite database keyed by the model name, a hash of the normalised
+prompt, the selected sources and the dataset/codebook version, so a repeated
+question skips the LLM round trip.  Entries expire after a TTL and the
+least recently used entries are evicted once the cache is full.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import List, Optional
+
+from polaris.core.config import RESPONSE_CACHE_MAX_ENTRIES, RESPONSE_CACHE_PATH, RESPONSE_CACHE_TTL_SECONDS
+from polaris.services import metrics
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Normalise a prompt so trivially different phrasings share a cache entry."""
+    return " ".join(prompt.casefold().split()).rstrip("?.! ")
+
+
+class ResponseCache:
+    """SQLite-backed LLM response cache with a TTL and size-bounded eviction."""
+
+    def __init__(self, path: str, ttl_seconds: float, max_entries: int):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    @property
+    def enabled(self) -> bool:
+        """Return whether the cache stores responses at all."""
+        return self.max_entries > 0
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open the database on first use.  Caller holds the lock."""
+        if self._conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    model TEXT NOT NULL,
+                    response TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                )
+                """
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed_at ON responses (accessed_at)")
+        return self._conn
+
+    @staticmethod
+    def make_key(model: str, prompt: str, sources: List[str] = (), version: str = "") -> str:
+        """Build a cache key from the model, normalised prompt, sources and data version."""
+        payload = json.dumps([model, normalize_prompt(prompt), sorted(sources), version])
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached response for ``key``, or ``None`` on a miss."""
+        if not self.enabled:
+            return None
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute("SELECT response, created_at FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is not None and self.ttl_seconds > 0 and row[1] < now - self.ttl_seconds:
+                conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                conn.commit()
+                row = None
+            metrics.count_cache("response", row is not None)
+            if row is None:
+                self.misses += 1
+                return None
+            conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+            conn.commit()
+            self.hits += 1
+            return row[0]
+
+    def put(self, key: str, model: str, response: str) -> None:
+        """Store a response and evict the least recently used entries if the cache is full."""
+        if not self.enabled:
+            return
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO responses (key, model, response, created_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (key, model, response, now, now),
+            )
+            conn.execute(
+                """
+                DELETE FROM responses WHERE key IN (
+                    SELECT key FROM responses ORDER BY accessed_at DESC LIMIT -1 OFFSET ?
+                )
+                """,
+                (self.max_entries,),
+            )
+            conn.commit()
+
+    def stats(self) -> dict:
+        """Return cache statistics, including the hit rate since startup."""
+        with self._lock:
+            entries = self._connect().execute("SELECT COUNT(*) FROM responses").fetchone()[0] if self.enabled else 0
+            lookups = self.hits + self.misses
+            return {
+                "entries": entries,
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+    def clear(self) -> int:
+        """Remove all cached responses and return how many were removed."""
+        if not self.enabled:
+            return 0
+        with self._lock:
+            conn = self._connect()
+            removed = conn.execute("DELETE FROM responses").rowcount
+            conn.commit()
+            return removed
+
+
+response_cache = ResponseCache(
+    path=RESPONSE_CACHE_PATH,
+    ttl_seconds=RESPONSE_CACHE_TTL_SECONDS,
+    max_entries=RESPONSE_CACHE_MAX_ENTRIES,
+)
@@ -0,0 +1,468 @@
+"""
+Service for computing risk scores for an area.
+
+A risk score combines three components over the last ``window_days``:
+
+- the number of GDELT articles mentioning the area, and its change against
+  the preceding window of the same length;
+- the mean tone of those articles;
+- the trend in fatalities for the area in the loaded UCDP-style datasets.
+
+Each tracked area keeps a daily table of article counts and tone sums, taken
+from the GDELT volume and tone timelines, which count every article rather
+than the first 250.  A background updater (``risk_updater``) fetches the
+days of each area that are missing or were not complete yet, so a request
+never waits on GDELT: it reads the rolling window sums of the table, which
+are recomputed with vectorised pandas operations when the table changes.
+The first request for an area tracks it and is answered with
+``ScoreUnavailable`` until its table has been fetched.  Areas other than the
+configured ``RISK_AREAS`` are only tracked while they are requested: they are
+dropped after ``RISK_AREA_IDLE_SECONDS`` without a request, when a new area
+needs their slot, or when GDELT has no article for them.  Scores are memoised
+per (area, window) until the area's data changes, so a repeated request is a
+lookup rather than a recomputation.
+"""
+
+import datetime
+import threading
+import time
+import weakref
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import requests
+
+from polaris.core.config import RISK_AREA_IDLE_SECONDS, RISK_AREAS, RISK_MAX_AREAS, RISK_UPDATE_INTERVAL_SECONDS
+from polaris.core.lazy import lazy_import
+from polaris.models import RiskScore
+from polaris.services import metrics
+from polaris.services.data_analysis import AggregateIndex, _norm
+from polaris.services.dataframe_cache import dataframe_cache
+from polaris.services.news_fetcher import _client, is_complete
+
+gdeltdoc = lazy_import("gdeltdoc")
+pd = lazy_import("pandas")
+
+# Longest window a score can be computed for; GDELT DOC only covers recent months.
+MAX_WINDOW_DAYS = 90
+
+# Days kept per area: the longest window and the preceding window it is compared with.
+SERIES_DAYS = 2 * MAX_WINDOW_DAYS
+
+# Weights of the normalised components in the overall score.
+WEIGHTS = {"event_volume": 0.3, "volume_change": 0.2, "mean_tone": 0.3, "fatality_trend": 0.2}
+
+# Articles per day at which the volume component reaches about 63% of its maximum.
+VOLUME_SCALE = 500.0
+
+# GDELT tone ranges roughly from -10 (very negative) to +10 (very positive).
+TONE_SCALE = 10.0
+
+# Seconds after which a client should ask again for the score of an area that is still being fetched.
+RETRY_AFTER_SECONDS = 10
+
+# Errors that stop the series of an area from being updated.
+UPDATE_ERRORS = (ValueError, KeyError, OSError, requests.RequestException)
+
+
+class ScoreUnavailable(Exception):
+    """Raised when the series of an area has not been fetched yet."""
+
+
+def fetch_timeline(area: str, start: datetime.date, end: datetime.date) -> "pd.DataFrame":
+    """Return the article count, tone sum and toned articles of ``area`` per day from ``start`` to ``end``.
+
+    GDELT timelines count every matching article, while an article search
+    returns at most 250.  Their resolution depends on the span, so the bins
+    are summed per UTC day; days without bins are 0.
+    """
+    filters = gdeltdoc.Filters(
+        start_date=start.strftime("%Y-%m-%d"),
+        end_date=(end + datetime.timedelta(days=1)).strftime("%Y-%m-%d"),
+        keyword=area,
+    )
+    with metrics.stage("gdelt.timeline"):
+        volume = _client().timeline_search("timelinevolraw", filters)
+        tone = _client().timeline_search("timelinetone", filters)
+    days = pd.date_range(start, end, freq="D").date
+    if volume.empty:
+        return pd.DataFrame(0, index=days, columns=["events", "tone_sum", "toned"])
+    bins = pd.DataFrame({"events": volume["Article Count"].to_numpy()}, index=pd.to_datetime(volume["datetime"], utc=True))
+    bins["tone"] = np.nan
+    if not tone.empty:
+        tones = pd.Series(tone["Average Tone"].to_numpy(), index=pd.to_datetime(tone["datetime"], utc=True))
+        bins["tone"] = tones.groupby(level=0).mean().reindex(bins.index)
+    toned = bins["tone"].notna()
+    frame = pd.DataFrame({
+        "events": bins["events"],
+        "tone_sum": (bins["tone"] * bins["events"]).where(toned, 0.0),
+        "toned": bins["events"].where(toned, 0),
+    })
+    return frame.groupby(bins.index.date).sum().reindex(days, fill_value=0)
+
+
+class _AreaSeries:
+    """Daily article counts and tone sums for one area, with memoised rolling sums.
+
+    ``pinned`` areas are configured and never dropped; ``requested_at`` is the
+    monotonic time of the last request for the area.
+    """
+
+    def __init__(self, area: str, pinned: bool = False):
+        self.area = area
+        self.pinned = pinned
+        self.requested_at = time.monotonic()
+        self.lock = threading.Lock()
+        self.fetched_at: Dict[datetime.date, float] = {}
+        self.rows: Dict[datetime.date, Tuple[int, float, int]] = {}
+        self.version = 0
+        self.updated_at: Optional[float] = None
+        self._rolling: Dict[int, Tuple[int, pd.DataFrame]] = {}
+
+    def pending(self, first: datetime.date, today: datetime.date) -> List[datetime.date]:
+        """Return the days from ``first`` to ``today`` that were not fetched after they were complete."""
+        days = (first + datetime.timedelta(days=i) for i in range((today - first).days + 1))
+        return [day for day in days if day not in self.fetched_at or not is_complete(day, self.fetched_at[day])]
+
+    def update(self, daily: "pd.DataFrame", fetched_at: float, first: datetime.date) -> bool:
+        """Replace the rows of the days in ``daily`` and drop days before ``first``; return whether a row changed."""
+        changed = False
+        for day, events, tone_sum, toned in daily[["events", "tone_sum", "toned"]].itertuples():
+            self.fetched_at[day] = fetched_at
+            row = (int(events), float(tone_sum), int(toned))
+            if self.rows.get(day) != row:
+                self.rows[day] = row
+                changed = True
+        # Days before ``first`` can no longer be in a window.
+        for day in [day for day in self.rows if day < first]:
+            del self.rows[day]
+            self.fetched_at.pop(day, None)
+        if changed:
+            self.version += 1
+        self.updated_at = fetched_at
+        return changed
+
+    def rolling(self, window_days: int) -> "pd.DataFrame":
+        """Return the rolling ``window_days`` sums of the daily table, one row per day."""
+        cached = self._rolling.get(window_days)
+        if cached is not None and cached[0] == self.version:
+            return cached[1]
+        daily = pd.DataFrame.from_dict(self.rows, orient="index", columns=["events", "tone_sum", "toned"])
+        daily.index = pd.DatetimeIndex(daily.index)
+        daily = daily.sort_index().asfreq("D", fill_value=0)
+        sums = daily.rolling(f"{window_days}D").sum()
+        self._rolling[window_days] = (self.version, sums)
+        return sums
+
+    def has_articles(self) -> bool:
+        """Return whether any day of the series has an article."""
+        return any(events for events, _, _ in self.rows.values())
+
+
+_areas: Dict[str, _AreaSeries] = {}
+_areas_lock = threading.Lock()
+
+# Areas that were dropped after their first fetch failed or found no article, with the
+# monotonic time until which they are not tracked again and the error raised meanwhile.
+_dropped: Dict[str, Tuple[float, type, str]] = {}
+
+# Memoised scores by (area, window_days, today), with the versions they were computed from.
+_scores: Dict[Tuple[str, int, datetime.date], Tuple[tuple, RiskScore]] = {}
+
+# Monthly fatality totals by normalised country, per aggregate index.
+_monthly_fatalities: "weakref.WeakKeyDictionary[AggregateIndex, Dict[str, pd.Series]]" = weakref.WeakKeyDictionary()
+
+# Guards ``_scores`` and ``_monthly_fatalities``, which are shared by all areas.
+_memo_lock = threading.Lock()
+
+
+def _forget(key: str) -> None:
+    """Stop tracking an area and drop its memoised scores.  Caller holds ``_areas_lock``."""
+    _areas.pop(key, None)
+    with _memo_lock:
+        for stale in [k for k in _scores if k[0] == key]:
+            del _scores[stale]
+
+
+def _area_series(area: str, pinned: bool = False) -> _AreaSeries:
+    """Return the daily series of an area, tracking the area on first use.
+
+    When ``RISK_MAX_AREAS`` areas are tracked, the least recently requested
+    area that is not pinned makes room; if all are pinned, ``ValueError`` is raised.
+    """
+    key = _norm(area)
+    now = time.monotonic()
+    with _areas_lock:
+        series = _areas.get(key)
+        if series is None:
+            until, error, message = _dropped.get(key, (0.0, ValueError, ""))
+            if until > now and not pinned:
+                raise error(message)
+            _dropped.pop(key, None)
+            if len(_areas) >= RISK_MAX_AREAS:
+                unpinned = [s for s in _areas.values() if not s.pinned]
+                if not unpinned:
+                    raise ValueError(f"At most {RISK_MAX_AREAS} areas can be scored.")
+                _forget(min(unpinned, key=lambda s: s.requested_at).area)
+            series = _areas[key] = _AreaSeries(key, pinned)
+        series.requested_at = now
+        series.pinned = series.pinned or pinned
+        return series
+
+
+def _tracked() -> List[_AreaSeries]:
+    """Return the series of every tracked area."""
+    with _areas_lock:
+        return list(_areas.values())
+
+
+def _drop(series: _AreaSeries, error: type, message: str, seconds: float) -> None:
+    """Stop tracking an area that is not pinned and answer its requests with ``error(message)`` for ``seconds``."""
+    if series.pinned:
+        return
+    with _areas_lock:
+        if _areas.get(series.area) is series:
+            _forget(series.area)
+            _dropped[series.area] = (time.monotonic() + seconds, error, message)
+
+
+def _evict_idle() -> None:
+    """Stop tracking the areas that are not pinned and were not requested for ``RISK_AREA_IDLE_SECONDS``."""
+    now = time.monotonic()
+    with _areas_lock:
+        for series in [s for s in _areas.values() if not s.pinned and now - s.requested_at > RISK_AREA_IDLE_SECONDS]:
+            _forget(series.area)
+        for key in [k for k, (until, _, _) in _dropped.items() if until <= now]:
+            del _dropped[key]
+
+
+def update_area(area: str) -> bool:
+    """Fetch the days of ``area`` that are missing or incomplete; return whether its series changed.
+
+    The first update fetches the whole series; later ones usually only the
+    current and the previous day.
+    """
+    return _update(_area_series(area))
+
+
+def _update(series: _AreaSeries) -> bool:
+    """Fetch the days of ``series`` that are missing or incomplete; return whether it changed."""
+    today = datetime.datetime.utcnow().date()
+    first = today - datetime.timedelta(days=SERIES_DAYS - 1)
+    with series.lock:
+        pending = series.pending(first, today)
+    if not pending:
+        return False
+    fetched_at = time.time()
+    daily = fetch_timeline(series.area, min(pending), today)
+    with series.lock:
+        return series.update(daily, fetched_at, first)
+
+
+def _monthly_series(index: AggregateIndex, area: str) -> "Optional[pd.Series]":
+    """Return the monthly fatalities of ``area`` in an aggregate index, with missing months as 0."""
+    with _memo_lock:
+        return _monthly_series_locked(index, area)
+
+
+def _monthly_series_locked(index: AggregateIndex, area: str) -> "Optional[pd.Series]":
+    """Compute or look up the monthly series of ``area``.  Caller holds ``_memo_lock``."""
+    by_area = _monthly_fatalities.setdefault(index, {})
+    key = _norm(area)
+    if key not in by_area:
+        series = None
+        if index.country_month is not None and "best" in index.estimates:
+            frame = index.country_month["best"]
+            countries = frame.index.get_level_values("country").map(_norm)
+            selected = frame[np.asarray(countries == key)]
+            if len(selected):
+                periods = pd.PeriodIndex(pd.to_datetime(pd.DataFrame({
+                    "year": selected.index.get_level_values("year").astype(int),
+                    "month": selected.index.get_level_values("month").astype(int),
+                    "day": 1,
+                })), freq="M")
+                series = pd.Series(selected.to_numpy(), index=periods).groupby(level=0).sum().asfreq("M", fill_value=0)
+        by_area[key] = series
+    return by_area[key]
+
+
+def fatality_trend(area: str, window_days: int) -> Optional[float]:
+    """Return the relative change in fatalities between the latest and the preceding window.
+
+    UCDP-style data is monthly and lags behind the news, so the window is
+    rounded up to whole months and ends at the latest month in the data.
+    Returns ``None`` if no loaded dataset has monthly fatalities for the area.
+    """
+    months = max(1, -(-window_days // 30))
+    trends = []
+    for _, value in dataframe_cache.values():
+        index = getattr(value, "index", None)
+        series = _monthly_series(index, area) if isinstance(index, AggregateIndex) else None
+        if series is None:
+            continue
+        sums = series.rolling(months, min_periods=1).sum()
+        recent = float(sums.iloc[-1])
+        previous = float(sums.iloc[-1 - months]) if len(sums) > months else 0.0
+        trends.append((recent - previous) / max(previous, 1.0))
+    return max(trends) if trends else None
+
+
+def _dataset_versions() -> tuple:
+    """Return identifiers of the loaded datasets, so scores are recomputed when they change."""
+    return tuple(sorted((name, id(value)) for name, value in dataframe_cache.values()))
+
+
+def _normalised(components: Dict[str, float], window_days: int) -> Dict[str, float]:
+    """Map each available component onto [0, 1], where 1 is the highest risk."""
+    scaled = {
+        "event_volume": 1.0 - np.exp(-components["event_volume"] / window_days / VOLUME_SCALE),
+        "volume_change": np.clip(components["volume_change"], 0.0, 2.0) / 2.0,
+    }
+    if "mean_tone" in components:
+        scaled["mean_tone"] = np.clip(-components["mean_tone"] / TONE_SCALE, 0.0, 1.0)
+    if "fatality_trend" in components:
+        scaled["fatality_trend"] = np.clip(components["fatality_trend"], 0.0, 1.0)
+    return scaled
+
+
+def risk_score(area: str, window_days: int = 14) -> RiskScore:
+    """Compute the risk score for ``area`` over the last ``window_days`` days.
+
+    The score ranges from 0 to 100.  Components without data are left out and
+    the remaining weights are rescaled; the notes say which ones are missing.
+    """
+    if not area.strip():
+        raise ValueError("An area is required.")
+    if not 1 <= window_days <= MAX_WINDOW_DAYS:
+        raise ValueError(f"window_days must be between 1 and {MAX_WINDOW_DAYS}.")
+
+    series = _area_series(area)
+    with series.lock:
+        if series.updated_at is None:
+            risk_updater.wake()
+            raise ScoreUnavailable(f"The events of '{area}' are being fetched; try again shortly.")
+        # Scores are computed as of the last day the updater fetched.
+        today = max(series.rows)
+
+        key = (series.area, window_days, today)
+        versions = (series.version, _dataset_versions())
+        with _memo_lock:
+            cached = _scores.get(key)
+        if cached is not None and cached[0] == versions:
+            return cached[1]
+
+        sums = series.rolling(window_days)
+        current = sums.loc[pd.Timestamp(today)]
+        previous_day = pd.Timestamp(today - datetime.timedelta(days=window_days))
+        previous = sums.loc[previous_day] if previous_day in sums.index else None
+
+    components = {
+        "event_volume": float(current["events"]),
+        "volume_change": (float(current["events"]) - float(previous["events"])) / max(float(previous["events"]), 1.0) if previous is not None else 0.0,
+    }
+    notes = []
+    if today != datetime.datetime.utcnow().date():
+        notes.append(f"Events up to {today.isoformat()}.")
+    if current["toned"]:
+        components["mean_tone"] = float(current["tone_sum"] / current["toned"])
+    else:
+        notes.append("No tone information for the events in the window.")
+    trend = fatality_trend(area, window_days)
+    if trend is not None:
+        components["fatality_trend"] = trend
+    else:
+        notes.append("No loaded dataset has monthly fatalities for this area.")
+
+    scaled = _normalised(components, window_days)
+    total_weight = sum(WEIGHTS[name] for name in scaled)
+    score = 100.0 * sum(WEIGHTS[name] * value for name, value in scaled.items()) / total_weight
+    result = RiskScore(
+        score=round(float(score), 1),
+        components={name: round(value, 4) for name, value in components.items()},
+        notes=" ".join(notes) or None,
+    )
+    with _memo_lock:
+        # Scores from previous days can no longer be requested.
+        for stale in [k for k in _scores if k[2] != today]:
+            _scores.pop(stale, None)
+        _scores[key] = (versions, result)
+    return result
+
+
+class RiskUpdater:
+    """Background thread that keeps the daily series of the tracked areas up to date.
+
+    Every ``interval_seconds`` all areas are updated.  An area requested for
+    the first time wakes the thread, which then only fetches the new areas.
+    """
+
+    def __init__(self, areas: List[str], interval_seconds: float):
+        self.areas = areas
+        self.interval_seconds = interval_seconds
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        """Track the configured areas and start updating in the background."""
+        if self._thread is not None:
+            return
+        for area in self.areas:
+            _area_series(area, pinned=True)
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="polaris-risk-update", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the background thread."""
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def wake(self) -> None:
+        """Ask the background thread to fetch newly tracked areas now."""
+        self._wake.set()
+
+    def run(self, new_only: bool = False) -> None:
+        """Update every tracked area, or with ``new_only`` those that have no series yet.
+
+        Idle areas are dropped first.  A failure for one area does not stop the
+        others; an area that is not pinned is dropped if its first fetch fails
+        or its series has no article.
+        """
+        _evict_idle()
+        for series in _tracked():
+            if self._stop.is_set():
+                return
+            if new_only and series.updated_at is not None:
+                continue
+            try:
+                _update(series)
+            except UPDATE_ERRORS as e:
+                print(f"Could not update the events of '{series.area}': {e}")
+                if series.updated_at is None:
+                    _drop(series, ScoreUnavailable, f"The events of '{series.area}' could not be fetched; try again later.",
+                          self.interval_seconds)
+                continue
+            with series.lock:
+                has_articles = series.has_articles()
+            if not has_articles:
+                _drop(series, ValueError, f"No GDELT article mentions '{series.area}'.", RISK_AREA_IDLE_SECONDS)
+
+    def _loop(self) -> None:
+        """Update all areas on every interval, and new areas when woken, until stopped."""
+        next_run = 0.0
+        while True:
+            self._wake.clear()
+            if self._stop.is_set():
+                return
+            due = time.monotonic() >= next_run
+            self.run(new_only=not due)
+            if due:
+                next_run = time.monotonic() + self.interval_seconds
+            self._wake.wait(max(0.0, next_run - time.monotonic()))
+
+
+risk_updater = RiskUpdater(RISK_AREAS, RISK_UPDATE_INTERVAL_SECONDS)
@@ -1,48 +1,346 @@
 """
 Service for generating scenario narratives.
 
-This module provides a simple stub that returns a list of scenario variants
-based on the input prompt.  In a real system you might integrate a
-language model or simulation engine here.
+Scenarios come from a Monte Carlo simulation.  For each actor, a base rate of
+daily fatalities and its volatility are estimated from the monthly fatality
+totals in the loaded datasets.  Thousands of trajectories are then drawn at
+once with NumPy: a mean-reverting log-intensity with occasional escalation
+shocks, and gamma-Poisson daily counts.  The trajectories are summarised
+(total, trend and peak per actor), clustered with k-means into the requested
+number of variants, and each cluster becomes a ``ScenarioVariant`` whose
+likelihood is the share of trajectories in it.
+
+Runs are reproducible for a given seed: trajectories are simulated in fixed
+blocks with seeds spawned from the request seed, so the result does not
+depend on whether the blocks run in-process or across a process pool.
 """
 
-from typing import List
-import random
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
 
+from polaris.core.config import (
+    SCENARIO_MAX_ACTORS,
+    SCENARIO_MAX_CELLS,
+    SCENARIO_MAX_HORIZON_DAYS,
+    SCENARIO_MAX_VARIANTS,
+    SCENARIO_SIMULATIONS,
+    SCENARIO_WORKERS,
+)
 from polaris.models import ScenarioVariant
+from polaris.services.data_analysis import AggregateIndex, _norm
+from polaris.services.dataframe_cache import dataframe_cache
 
+# Trajectories simulated per block; each block gets its own spawned seed.
+BLOCK_SIMULATIONS = 500
 
-def generate_scenarios(prompt: str, actors: List[str], horizon: int, assumptions: List[str], variants: int) -> List[ScenarioVariant]:
-    """Generate scenario variants based on a prompt and parameters.
+# Runs with more (trajectory, actor, day) cells than this are spread across processes.
+PARALLEL_MIN_CELLS = 4_000_000
+
+# Number of recent months of data used to estimate an actor's base rate.
+BASE_RATE_MONTHS = 24
+
+# Base rate used for actors that do not appear in any loaded dataset.
+DEFAULT_MONTHLY_FATALITIES = 30.0
+DEFAULT_MONTHLY_VOLATILITY = 0.5
+
+# Daily persistence of deviations from the base rate (closer to 1 means longer regimes).
+PERSISTENCE = 0.97
+
+# Size of an escalation shock on the log scale.
+SHOCK_SIZE = 1.0
+
+KMEANS_ITERATIONS = 25
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+class BaseRate:
+    """Daily fatality rate, dispersion, volatility and shock probability for one actor."""
+
+    def __init__(self, monthly: Optional[np.ndarray], source: str):
+        if monthly is None or not len(monthly):
+            monthly_mean, volatility, shock_rate = DEFAULT_MONTHLY_FATALITIES, DEFAULT_MONTHLY_VOLATILITY, 1 / 12
+            variance = monthly_mean * 4
+        else:
+            monthly_mean = max(float(monthly.mean()), 0.5)
+            variance = float(monthly.var())
+            log_changes = np.diff(np.log1p(monthly))
+            volatility = float(log_changes.std()) if len(log_changes) > 1 else DEFAULT_MONTHLY_VOLATILITY
+            # Months with more than twice the median count as escalations.
+            shock_rate = float((monthly > 2 * max(np.median(monthly), 1.0)).mean())
+
+        self.source = source
+        self.monthly_mean = monthly_mean
+        self.daily_mean = monthly_mean / 30.0
+        # Gamma shape of the gamma-Poisson (negative binomial) daily counts.
+        self.shape = monthly_mean ** 2 / (variance - monthly_mean) if variance > monthly_mean else 100.0
+        self.daily_volatility = max(volatility, 0.05) / np.sqrt(30.0)
+        self.shock_probability = min(max(shock_rate, 1 / 60), 0.5) / 30.0
+
+    def describe(self) -> Dict[str, object]:
+        """Return the base rate for the response metadata."""
+        return {"monthly_fatalities": round(self.monthly_mean, 1), "source": self.source}
+
+
+def _monthly_fatalities(index: AggregateIndex, actor: str) -> Optional[np.ndarray]:
+    """Return the most recent monthly fatality totals of ``actor`` in an aggregate index."""
+    if index.country_month is None or "best" not in index.estimates:
+        return None
+    frame = index.country_month["best"]
+    countries = frame.index.get_level_values("country").map(_norm)
+    selected = frame[np.asarray(countries == _norm(actor))]
+    if not len(selected):
+        return None
+    months = selected.groupby(level=["year", "month"]).sum().sort_index()
+    return months.to_numpy(dtype="float64")[-BASE_RATE_MONTHS:]
+
+
+def base_rates(actors: List[str]) -> List[BaseRate]:
+    """Estimate the base rate of each actor from the datasets in the dataset cache."""
+    rates = []
+    for actor in actors:
+        monthly, source = None, "default"
+        for name, value in dataframe_cache.values():
+            index = getattr(value, "index", None)
+            if isinstance(index, AggregateIndex):
+                monthly = _monthly_fatalities(index, actor)
+                if monthly is not None:
+                    source = name
+                    break
+        rates.append(BaseRate(monthly, source))
+    return rates
+
+
+def _simulate_block(params: np.ndarray, horizon: int, simulations: int, seed: np.random.SeedSequence) -> np.ndarray:
+    """Simulate one block of trajectories and return their features.
+
+    ``params`` has one row per actor: daily mean, gamma shape, daily volatility
+    and shock probability.  The features are, per actor, log1p of the total
+    fatalities, the change between the first and last third of the horizon,
+    and log1p of the peak day.
+    """
+    rng = np.random.default_rng(seed)
+    daily_mean, shape, volatility, shock_probability = (params[:, i][None, :] for i in range(4))
+    actors = params.shape[0]
+
+    noise = rng.standard_normal((horizon, simulations, actors)) * volatility
+    shocks = (rng.random((horizon, simulations, actors)) < shock_probability) * SHOCK_SIZE
+    deviation = np.empty((horizon, simulations, actors))
+    level = np.zeros((simulations, actors))
+    for day in range(horizon):
+        level = PERSISTENCE * level + noise[day] + shocks[day]
+        deviation[day] = level
+
+    intensity = daily_mean * np.exp(deviation)
+    counts = rng.poisson(rng.gamma(shape, intensity / shape))
+
+    third = max(horizon // 3, 1)
+    totals = counts.sum(axis=0)
+    trend = np.log1p(counts[-third:].sum(axis=0)) - np.log1p(counts[:third].sum(axis=0))
+    peak = counts.max(axis=0)
+    return np.concatenate([np.log1p(totals), trend, np.log1p(peak)], axis=1)
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    """Return the process pool used for large runs, creating it on first use."""
+    global _pool
+    if _pool is None:
+        # Use "spawn" so worker processes do not inherit the server's threads and locks.
+        _pool = ProcessPoolExecutor(max_workers=SCENARIO_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+    return _pool
 
-    This stub returns a list of variants with dummy values.  Replace with
-    logic that uses LLMs, simulation or expert rules for meaningful
-    scenarios.
+
+def simulate(rates: List[BaseRate], horizon: int, simulations: int, seed: int) -> np.ndarray:
+    """Simulate ``simulations`` trajectories and return one feature row per trajectory."""
+    params = np.array([[r.daily_mean, r.shape, r.daily_volatility, r.shock_probability] for r in rates])
+    blocks = [min(BLOCK_SIMULATIONS, simulations - start) for start in range(0, simulations, BLOCK_SIMULATIONS)]
+    seeds = np.random.SeedSequence(seed).spawn(len(blocks))
+    args = ([params] * len(blocks), [horizon] * len(blocks), blocks, seeds)
+
+    if SCENARIO_WORKERS > 1 and len(blocks) > 1 and simulations * len(rates) * horizon >= PARALLEL_MIN_CELLS:
+        features = list(_get_pool().map(_simulate_block, *args))
+    else:
+        features = list(map(_simulate_block, *args))
+    return np.concatenate(features)
+
+
+def kmeans(features: np.ndarray, k: int, seed: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Cluster the rows of ``features`` into ``k`` groups; return the labels and centroids.
+
+    Features are standardised first and the centroids are seeded with k-means++.
+    """
+    rng = np.random.default_rng(seed)
+    scale = features.std(axis=0)
+    points = (features - features.mean(axis=0)) / np.where(scale > 0, scale, 1.0)
+
+    centroids = [points[rng.integers(len(points))]]
+    for _ in range(1, k):
+        distances = ((points[:, None, :] - np.array(centroids)[None, :, :]) ** 2).sum(axis=2).min(axis=1)
+        total = distances.sum()
+        choice = rng.choice(len(points), p=distances / total) if total > 0 else rng.integers(len(points))
+        centroids.append(points[choice])
+    centroids = np.array(centroids)
+
+    for _ in range(KMEANS_ITERATIONS):
+        labels = ((points[:, None, :] - centroids[None, :, :]) ** 2).sum(axis=2).argmin(axis=1)
+        updated = np.array([
+            points[labels == c].mean(axis=0) if np.any(labels == c) else centroids[c]
+            for c in range(k)
+        ])
+        if np.allclose(updated, centroids):
+            break
+        centroids = updated
+    return labels, centroids
+
+
+def _label(trend: float, ratio: float) -> str:
+    """Name a cluster from its median trend and its total relative to the base rate."""
+    if trend > 0.3:
+        return "Escalation"
+    if trend < -0.3:
+        return "De-escalation"
+    if ratio > 1.25:
+        return "Sustained high intensity"
+    if ratio < 0.8:
+        return "Lull"
+    return "Status quo"
+
+
+_TEMPLATES = {
+    "Escalation": (
+        ["Breakdown of ongoing talks", "Major attack on a high-profile target", "Mobilisation by {actor}"],
+        ["Rising weekly fatality counts", "Increasingly negative media tone", "Reports of troop movements"],
+        ["Prepare contingency and evacuation plans", "Coordinate diplomatic pressure on {actor}", "Pre-position humanitarian assistance"],
+    ),
+    "De-escalation": (
+        ["Ceasefire or negotiated pause", "Mediation gaining traction", "Exhaustion of fighting capacity"],
+        ["Falling weekly fatality counts", "Announcements of talks", "Return of displaced people"],
+        ["Support mediation and monitoring", "Offer incentives for compliance", "Plan for reconstruction needs"],
+    ),
+    "Sustained high intensity": (
+        ["Entrenched front lines", "External support to {actor}", "Failure of local agreements"],
+        ["Fatalities persistently above the historical rate", "Sustained displacement", "Arms flows"],
+        ["Scale up humanitarian access", "Target sanctions", "Protect civilians in contested areas"],
+    ),
+    "Lull": (
+        ["Seasonal constraints", "Tactical regrouping by {actor}", "Local truces"],
+        ["Fatalities below the historical rate", "Reduced reporting of clashes", "Recruitment activity"],
+        ["Use the window for confidence-building", "Monitor for regrouping", "Maintain readiness"],
+    ),
+    "Status quo": (
+        ["Continuation of current dynamics", "No major change in external support", "Stable alliances"],
+        ["Fatalities close to the historical rate", "Unchanged media attention", "Routine security incidents"],
+        ["Maintain monitoring", "Continue existing engagement with {actor}", "Review assumptions periodically"],
+    ),
+}
+
+
+def _variant(name: str, label: str, lead: str, likelihood: float, prompt: str, actors: List[str], horizon: int,
+             assumptions: List[str], rates: List[BaseRate], centre: np.ndarray) -> ScenarioVariant:
+    """Describe one cluster of trajectories as a scenario variant."""
+    triggers, indicators, options = _TEMPLATES[label]
+    outlooks = [
+        f"{actor}: about {int(round(np.expm1(centre[i])))} fatalities "
+        f"(baseline {int(round(rate.daily_mean * horizon))})"
+        for i, (actor, rate) in enumerate(zip(actors, rates))
+    ]
+    narrative = f"{prompt} {label} over the next {horizon} days. " + "; ".join(outlooks) + "."
+    if assumptions:
+        narrative += " Assumptions: " + "; ".join(assumptions) + "."
+    return ScenarioVariant(
+        name=name,
+        likelihood=likelihood,
+        narrative=narrative,
+        triggers=[t.format(actor=lead) for t in triggers],
+        leading_indicators=[i.format(actor=lead) for i in indicators],
+        policy_options=[o.format(actor=lead) for o in options],
+    )
+
+
+class ScenarioLimitError(ValueError):
+    """Raised when a request asks for more actors or variants, or a longer horizon, than is allowed."""
+
+
+def simulate_scenarios(prompt: str, actors: List[str], horizon: int, assumptions: List[str], variants: int,
+                       seed: Optional[int] = None) -> Tuple[List[ScenarioVariant], Dict[str, object]]:
+    """Simulate scenarios and return the variants, most likely first, and run metadata.
+
+    The number of trajectories is capped so that trajectories x actors x days
+    stays within ``SCENARIO_MAX_CELLS``, which keeps a request within about a
+    second.  Horizons and numbers of actors and variants above their configured
+    limits raise ``ScenarioLimitError``.  The metadata includes the seed, so a run can be reproduced.
+    """
+    started = time.perf_counter()
+    if horizon < 1:
+        raise ValueError("time_horizon_days must be at least 1.")
+    if variants < 1:
+        raise ValueError("variants must be at least 1.")
+    if horizon > SCENARIO_MAX_HORIZON_DAYS:
+        raise ScenarioLimitError(f"time_horizon_days must be at most {SCENARIO_MAX_HORIZON_DAYS}.")
+    if variants > SCENARIO_MAX_VARIANTS:
+        raise ScenarioLimitError(f"variants must be at most {SCENARIO_MAX_VARIANTS}.")
+    if len(actors) > SCENARIO_MAX_ACTORS:
+        raise ScenarioLimitError(f"At most {SCENARIO_MAX_ACTORS} actors are allowed.")
+    if seed is None:
+        seed = int(np.random.SeedSequence().generate_state(1)[0])
+
+    actors = actors or ["the parties"]
+    rates = base_rates(actors)
+    simulations = max(min(SCENARIO_SIMULATIONS, SCENARIO_MAX_CELLS // (len(rates) * horizon)), variants)
+    features = simulate(rates, horizon, simulations, seed)
+    labels, _ = kmeans(features, min(variants, simulations), seed)
+
+    scenarios = []
+    names: Dict[str, int] = {}
+    actor_count = len(rates)
+    for cluster in np.unique(labels):
+        members = features[labels == cluster]
+        centre = np.median(members, axis=0)
+        baselines = np.array([max(r.daily_mean * horizon, 1.0) for r in rates])
+        ratios = np.expm1(centre[:actor_count]) / baselines
+        trends = centre[actor_count: 2 * actor_count]
+        # The variant is named after the actor that departs most from its base rate.
+        focus = int(np.argmax(np.abs(np.log(np.maximum(ratios, 1e-6))) + np.abs(trends)))
+        label = _label(float(trends[focus]), float(ratios[focus]))
+        name = label if actor_count == 1 or label == "Status quo" else f"{label} in {actors[focus]}"
+        names[name] = names.get(name, 0) + 1
+        if names[name] > 1:
+            name = f"{name} ({names[name]})"
+        likelihood = round(len(members) / simulations, 3)
+        scenarios.append(_variant(name, label, actors[focus], likelihood, prompt, actors, horizon, assumptions, rates, centre))
+
+    scenarios.sort(key=lambda s: s.likelihood, reverse=True)
+    metadata = {
+        "seed": seed,
+        "simulations": simulations,
+        "base_rates": {actor: rate.describe() for actor, rate in zip(actors, rates)},
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+    }
+    return scenarios, metadata
+
+
+def generate_scenarios(prompt: str, actors: List[str], horizon: int, assumptions: List[str], variants: int,
+                       seed: Optional[int] = None) -> List[ScenarioVariant]:
+    """Generate scenario variants based on a prompt and parameters.
 
     Parameters
     ----------
     prompt: str
         Description of the scenario (e.g. a potential future event).
     actors: List[str]
-        Key actors involved in the scenario.
+        Key actors involved in the scenario.  Actors that are countries in a
+        loaded dataset use its fatality history as their base rate.
     horizon: int
         Time horizon in days for the scenario.
     assumptions: List[str]
         List of assumptions to consider.
     variants: int
         Number of variants to generate.
+    seed: Optional[int]
+        Seed for a reproducible simulation.
     """
-
-    scenario_list: List[ScenarioVariant] = []
-    for i in range(variants):
-        scenario_list.append(
-            ScenarioVariant(
-                name=f"Variant {i + 1}",
-                likelihood=round(random.uniform(0.2, 0.8), 2),
-                narrative=f"{prompt} scenario narrative {i + 1}. Actors involved: {', '.join(actors)}.",
-                triggers=[f"Trigger {j}" for j in range(1, 4)],
-                leading_indicators=[f"Indicator {j}" for j in range(1, 4)],
-                policy_options=[f"Policy option {j}" for j in range(1, 4)],
-            )
-        )
-    return scenario_list
+    return simulate_scenarios(prompt, actors, horizon, assumptions, variants, seed)[0]
@@ -0,0 +1,345 @@
+"""
+Full-text search over the local event store.
+
+Titles and summaries of stored events are indexed in an in-memory inverted
+index: for each term, NumPy arrays of the events that contain it and of its
+weighted frequency in each.  A query only touches the postings of its own
+terms and scores them with BM25 in a few vectorised operations, so ranking
+stays in the milliseconds with millions of events.  Date and country filters
+are applied to the matching events only.
+
+The index follows the store incrementally: events added or changed since the
+last update (by ``ingested_at``) are indexed before each search, and events
+no longer in the store are dropped when a search finds them missing.  It is
+saved to a ``.npz`` snapshot, so after a restart only the events stored since
+the snapshot are indexed.
+"""
+
+import datetime
+import os
+import re
+import threading
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from polaris.core.config import SEARCH_INDEX_PATH
+from polaris.models import EventItem
+from polaris.services.event_store import EventStore, event_store
+
+# BM25 term frequency saturation and document length normalisation.
+K1 = 1.2
+B = 0.75
+
+# A title word counts as much as this many summary words.
+TITLE_WEIGHT = 2.0
+
+# Events read from the store at a time while catching up.
+CATCH_UP_BATCH = 20000
+
+# Dead documents are compacted away when saving once they exceed this share of the index.
+COMPACT_DEAD_RATIO = 0.25
+
+_WORD = re.compile(r"\w+")
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    """Split text into casefolded words."""
+    return _WORD.findall(text.casefold()) if text else []
+
+
+def _ordinal(day: str) -> int:
+    """Return the proleptic ordinal of a YYYY-MM-DD day, or 0 if it is not a valid day."""
+    try:
+        return datetime.date.fromisoformat(day[:10]).toordinal()
+    except ValueError:
+        return 0
+
+
+class _Growable:
+    """A NumPy array with amortised constant-time appends."""
+
+    __slots__ = ("data", "size")
+
+    def __init__(self, dtype, data: Optional[np.ndarray] = None):
+        self.data = data if data is not None else np.empty(8, dtype=dtype)
+        self.size = len(data) if data is not None else 0
+
+    def extend(self, values) -> None:
+        """Append ``values`` at the end."""
+        values = np.asarray(values, dtype=self.data.dtype)
+        end = self.size + len(values)
+        if end > len(self.data):
+            grown = np.empty(max(end, 2 * len(self.data)), dtype=self.data.dtype)
+            grown[:self.size] = self.data[:self.size]
+            self.data = grown
+        self.data[self.size:end] = values
+        self.size = end
+
+    def view(self) -> np.ndarray:
+        """Return the appended values."""
+        return self.data[:self.size]
+
+
+class SearchIndex:
+    """In-memory BM25 inverted index over the titles and summaries of stored events."""
+
+    def __init__(self, path: str, store: EventStore):
+        self.path = path
+        self.store = store
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._dirty = False
+        self._reset()
+
+    def _reset(self) -> None:
+        """Empty the index.  Caller holds the lock."""
+        self._terms: Dict[str, int] = {}
+        self._post_docs: List[_Growable] = []
+        self._post_tfs: List[_Growable] = []
+        self._countries: Dict[str, int] = {}
+        self._ids: List[str] = []
+        self._doc_ids: Dict[str, int] = {}
+        self._lengths = _Growable(np.float32)
+        self._days = _Growable(np.int32)
+        self._doc_countries = _Growable(np.int32)
+        self._live = _Growable(np.bool_)
+        self._live_count = 0
+        self._live_length = 0.0
+        self._position: Tuple[float, int] = (0.0, 0)
+
+    # -- persistence -------------------------------------------------------
+
+    def _load(self) -> None:
+        """Load the snapshot on first use.  Caller holds the lock."""
+        if self._loaded:
+            return
+        self._loaded = True
+        if not os.path.exists(self.path):
+            return
+        try:
+            with np.load(self.path, allow_pickle=False) as snapshot:
+                terms = snapshot["terms"].tolist()
+                offsets = snapshot["offsets"]
+                docs, tfs = snapshot["post_docs"], snapshot["post_tfs"]
+                self._terms = {term: i for i, term in enumerate(terms)}
+                self._post_docs = [_Growable(np.int32, docs[offsets[i]:offsets[i + 1]].copy()) for i in range(len(terms))]
+                self._post_tfs = [_Growable(np.float32, tfs[offsets[i]:offsets[i + 1]].copy()) for i in range(len(terms))]
+                self._countries = {country: i for i, country in enumerate(snapshot["countries"].tolist())}
+                self._ids = snapshot["ids"].tolist()
+                self._lengths = _Growable(np.float32, snapshot["lengths"])
+                self._days = _Growable(np.int32, snapshot["days"])
+                self._doc_countries = _Growable(np.int32, snapshot["doc_countries"])
+                self._live = _Growable(np.bool_, snapshot["live"])
+                ingested_at, rowid = snapshot["position"].tolist()
+                self._position = (float(ingested_at), int(rowid))
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Could not load the search index from {self.path}, rebuilding it: {e}")
+            self._reset()
+            return
+        live = self._live.view()
+        self._doc_ids = {doc_id: i for i, doc_id in enumerate(self._ids) if live[i]}
+        self._live_count = int(live.sum())
+        self._live_length = float(self._lengths.view()[live].sum())
+
+    def save(self) -> bool:
+        """Write the index to its snapshot if it changed since the last save; return whether it was written."""
+        with self._lock:
+            if not self._dirty:
+                return False
+            if self._ids and 1 - self._live_count / len(self._ids) > COMPACT_DEAD_RATIO:
+                self._compact()
+            sizes = np.fromiter((p.size for p in self._post_docs), dtype=np.int64, count=len(self._post_docs))
+            offsets = np.concatenate([[0], np.cumsum(sizes)])
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            tmp_path = f"{self.path}.tmp.npz"
+            np.savez(
+                tmp_path,
+                terms=np.array(list(self._terms), dtype=str),
+                offsets=offsets,
+                post_docs=np.concatenate([p.view() for p in self._post_docs] or [np.empty(0, np.int32)]),
+                post_tfs=np.concatenate([p.view() for p in self._post_tfs] or [np.empty(0, np.float32)]),
+                countries=np.array(list(self._countries), dtype=str),
+                ids=np.array(self._ids, dtype=str),
+                lengths=self._lengths.view(),
+                days=self._days.view(),
+                doc_countries=self._doc_countries.view(),
+                live=self._live.view(),
+                position=np.array(self._position, dtype=np.float64),
+            )
+            os.replace(tmp_path, self.path)
+            self._dirty = False
+            return True
+
+    def _compact(self) -> None:
+        """Drop dead documents and renumber the rest.  Caller holds the lock."""
+        live = self._live.view().copy()
+        renumber = np.cumsum(live, dtype=np.int64) - 1
+        for docs, tfs in zip(self._post_docs, self._post_tfs):
+            keep = live[docs.view()]
+            kept_docs, kept_tfs = renumber[docs.view()[keep]].astype(np.int32), tfs.view()[keep]
+            docs.data, docs.size = kept_docs, len(kept_docs)
+            tfs.data, tfs.size = kept_tfs, len(kept_tfs)
+        self._ids = [doc_id for doc_id, alive in zip(self._ids, live) if alive]
+        self._doc_ids = {doc_id: i for i, doc_id in enumerate(self._ids)}
+        self._lengths = _Growable(np.float32, self._lengths.view()[live])
+        self._days = _Growable(np.int32, self._days.view()[live])
+        self._doc_countries = _Growable(np.int32, self._doc_countries.view()[live])
+        self._live = _Growable(np.bool_, np.ones(len(self._ids), dtype=bool))
+
+    # -- updates -----------------------------------------------------------
+
+    def _kill(self, doc: int) -> None:
+        """Mark a document as no longer in the store.  Caller holds the lock."""
+        live = self._live.view()
+        if live[doc]:
+            live[doc] = False
+            self._live_count -= 1
+            self._live_length -= float(self._lengths.view()[doc])
+            self._doc_ids.pop(self._ids[doc], None)
+            self._dirty = True
+
+    def _add(self, rows: Iterable[tuple]) -> None:
+        """Index ``(ingested_at, rowid, id, day, country, title, summary)`` rows.  Caller holds the lock."""
+        term_ids, doc_numbers, weights = [], [], []
+        lengths, days, countries = [], [], []
+        for ingested_at, rowid, event_id, day, country, title, summary in rows:
+            previous = self._doc_ids.get(event_id)
+            if previous is not None:
+                self._kill(previous)
+            doc = len(self._ids)
+            self._ids.append(event_id)
+            self._doc_ids[event_id] = doc
+
+            counts = Counter()
+            for word in tokenize(title):
+                counts[word] += TITLE_WEIGHT
+            for word in tokenize(summary):
+                counts[word] += 1.0
+            for word, weight in counts.items():
+                term = self._terms.get(word)
+                if term is None:
+                    term = self._terms[word] = len(self._terms)
+                    self._post_docs.append(_Growable(np.int32))
+                    self._post_tfs.append(_Growable(np.float32))
+                term_ids.append(term)
+                doc_numbers.append(doc)
+                weights.append(weight)
+
+            length = sum(counts.values())
+            lengths.append(length)
+            days.append(_ordinal(day))
+            countries.append(self._countries.setdefault((country or "").casefold(), len(self._countries)))
+            self._live_count += 1
+            self._live_length += length
+            self._position = (ingested_at, rowid)
+
+        if not lengths:
+            return
+        self._lengths.extend(lengths)
+        self._days.extend(days)
+        self._doc_countries.extend(countries)
+        self._live.extend(np.ones(len(lengths), dtype=bool))
+
+        # Group the new postings by term and append each group in one operation.
+        term_ids = np.asarray(term_ids, dtype=np.int64)
+        order = np.argsort(term_ids, kind="stable")
+        term_ids = term_ids[order]
+        doc_numbers = np.asarray(doc_numbers, dtype=np.int32)[order]
+        weights = np.asarray(weights, dtype=np.float32)[order]
+        starts = np.flatnonzero(np.r_[True, term_ids[1:] != term_ids[:-1]])
+        ends = np.r_[starts[1:], len(term_ids)]
+        for start, end in zip(starts.tolist(), ends.tolist()):
+            term = int(term_ids[start])
+            self._post_docs[term].extend(doc_numbers[start:end])
+            self._post_tfs[term].extend(weights[start:end])
+        self._dirty = True
+
+    def refresh(self) -> int:
+        """Index the events added to or changed in the store since the last update; return how many."""
+        indexed = 0
+        with self._lock:
+            self._load()
+            while True:
+                rows = self.store.changed_since(self._position, CATCH_UP_BATCH)
+                self._add(rows)
+                indexed += len(rows)
+                if len(rows) < CATCH_UP_BATCH:
+                    return indexed
+
+    # -- queries -----------------------------------------------------------
+
+    def _rank(self, terms: List[str], source_countries: List[str], since: str, until: str, limit: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Return the best ``limit`` live documents for ``terms`` and their scores.  Caller holds the lock."""
+        if not self._live_count:
+            return np.empty(0, np.int64), np.empty(0, np.float32)
+        lengths = self._lengths.view()
+        average_length = max(self._live_length / self._live_count, 1e-6)
+        scores = np.zeros(len(lengths), dtype=np.float32)
+        for word in terms:
+            term = self._terms.get(word)
+            if term is None:
+                continue
+            docs, tfs = self._post_docs[term].view(), self._post_tfs[term].view()
+            idf = np.log1p((self._live_count - len(docs) + 0.5) / (len(docs) + 0.5))
+            norm = K1 * (1 - B + B * lengths[docs] / average_length)
+            scores[docs] += idf * tfs * (K1 + 1) / (tfs + norm)
+
+        candidates = np.flatnonzero(scores)
+        keep = self._live.view()[candidates]
+        if since:
+            keep &= self._days.view()[candidates] >= _ordinal(since)
+        if until:
+            keep &= self._days.view()[candidates] < _ordinal(until)
+        if source_countries:
+            wanted = [self._countries[c.casefold()] for c in source_countries if c.casefold() in self._countries]
+            keep &= np.isin(self._doc_countries.view()[candidates], wanted)
+        candidates = candidates[keep]
+
+        if len(candidates) > limit:
+            candidates = candidates[np.argpartition(-scores[candidates], limit - 1)[:limit]]
+        candidates = candidates[np.argsort(-scores[candidates], kind="stable")]
+        return candidates, scores[candidates]
+
+    def search(self, q: str, source_countries: List[str] = (), since: str = "", until: str = "", limit: int = 50) -> List[EventItem]:
+        """Return the stored events that best match ``q``, ranked by BM25 over titles and summaries.
+
+        Events matching any word of ``q`` are candidates; each result has its
+        ``score`` set, higher meaning more relevant.  ``since`` is inclusive and
+        ``until`` exclusive (YYYY-MM-DD); ``source_countries`` match the name
+        of the country of the publishing source, case-insensitively.
+        """
+        terms = list(dict.fromkeys(tokenize(q)))
+        if not terms:
+            raise ValueError("A search query with at least one word is required.")
+        for name, day in (("since", since), ("until", until)):
+            if day and not _ordinal(day):
+                raise ValueError(f"'{name}' must be a date (YYYY-MM-DD), not '{day}'.")
+        self.refresh()
+        while True:
+            with self._lock:
+                docs, scores = self._rank(terms, source_countries, since, until, limit)
+                ids = [self._ids[doc] for doc in docs.tolist()]
+            events = self.store.get_many(ids)
+            if len(events) == len(ids):
+                return [events[i].model_copy(update={"score": round(float(s), 4)}) for i, s in zip(ids, scores.tolist())]
+            # Events were removed from the store since they were indexed.
+            with self._lock:
+                for doc, event_id in zip(docs.tolist(), ids):
+                    if event_id not in events and self._ids[doc] == event_id:
+                        self._kill(doc)
+
+    def stats(self) -> dict:
+        """Return the number of indexed events and terms."""
+        with self._lock:
+            self._load()
+            return {
+                "events": self._live_count,
+                "dead_events": len(self._ids) - self._live_count,
+                "terms": len(self._terms),
+                "postings": sum(p.size for p in self._post_docs),
+            }
+
+
+search_index = SearchIndex(SEARCH_INDEX_PATH, event_store)
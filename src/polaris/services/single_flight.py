@@ -0,0 +1,98 @@
+"""
+Single-flight coalescing of identical concurrent calls.
+
+When several callers ask for the same thing at the same time, only the first
+one does the work; the others wait for it and receive the same result.  This
+keeps a dashboard refresh from launching N identical generations against the
+one local Ollama instance.
+"""
+
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+
+
+class _Call:
+    """An in-flight synchronous call."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: BaseException = None
+
+
+class SingleFlight:
+    """Coalesces concurrent calls with the same key into a single execution."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._tasks: Dict[Tuple[int, Hashable], asyncio.Task] = {}
+        self._calls: Dict[Hashable, _Call] = {}
+        self.calls = 0
+        self.coalesced = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """Await ``fn()``, or the identical call already in flight.
+
+        Returns the result and whether this call was coalesced into another.
+        The work runs in its own task, so a caller that is cancelled (e.g. a
+        client disconnecting) does not cancel it for the others.
+        """
+        # Tasks belong to an event loop, so calls are only shared within one loop.
+        task_key = (id(asyncio.get_running_loop()), key)
+        with self._lock:
+            self.calls += 1
+            task = self._tasks.get(task_key)
+            coalesced = task is not None
+            if coalesced:
+                self.coalesced += 1
+            else:
+                task = asyncio.ensure_future(fn())
+                self._tasks[task_key] = task
+                task.add_done_callback(lambda _: self._forget_task(task_key, task))
+        return await asyncio.shield(task), coalesced
+
+    def _forget_task(self, task_key: Tuple[int, Hashable], task: asyncio.Task) -> None:
+        """Remove a finished task so later calls start a new one."""
+        with self._lock:
+            if self._tasks.get(task_key) is task:
+                del self._tasks[task_key]
+
+    def do_sync(self, key: Hashable, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        """Call ``fn()``, or wait for the identical call already running in another thread.
+
+        Returns the result and whether this call was coalesced into another.
+        """
+        with self._lock:
+            self.calls += 1
+            call = self._calls.get(key)
+            coalesced = call is not None
+            if coalesced:
+                self.coalesced += 1
+            else:
+                call = self._calls[key] = _Call()
+
+        if coalesced:
+            call.done.wait()
+        else:
+            try:
+                call.result = fn()
+            except BaseException as e:
+                call.error = e
+            finally:
+                with self._lock:
+                    del self._calls[key]
+                call.done.set()
+
+        if call.error is not None:
+            raise call.error
+        return call.result, coalesced
+
+    def stats(self) -> dict:
+        """Return how many calls were made and how many were coalesced."""
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "coalesced": self.coalesced,
+                "in_flight": len(self._tasks) + len(self._calls),
+            }
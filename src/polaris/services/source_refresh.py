@@ -0,0 +1,209 @@
+"""
+Service for downloading and refreshing data source files.
+
+Downloaded files are revalidated with conditional GETs using the ETag and
+Last-Modified headers recorded for each file, so an unchanged source costs a
+single 304 response.  Downloads stream to a temporary file while a SHA-256
+checksum is computed, and the file is only swapped in (atomically) when its
+content actually changed, so caches keyed by mtime stay valid.  A background
+refresher revalidates all configured sources on an interval, off the request
+path.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+import urllib.request
+from typing import Dict, List, Optional
+
+import requests
+
+from polaris.core.config import (
+    DATA_DIR,
+    SOURCE_REFRESH_INTERVAL_SECONDS,
+    DataSource,
+    data_source_registry,
+)
+from polaris.services import metrics
+
+# Size of the chunks in which downloads are streamed to disk.
+CHUNK_SIZE = 1024 * 1024
+
+_path_locks: Dict[str, threading.Lock] = {}
+_path_locks_lock = threading.Lock()
+
+
+def _lock_for(path: str) -> threading.Lock:
+    """Return the lock that serialises downloads of ``path``."""
+    with _path_locks_lock:
+        return _path_locks.setdefault(os.path.abspath(path), threading.Lock())
+
+
+def _meta_path(path: str) -> str:
+    """Return the path of the metadata file recorded for a downloaded file."""
+    return f"{path}.meta.json"
+
+
+def read_meta(path: str) -> dict:
+    """Return the ETag, Last-Modified and checksum recorded for a downloaded file."""
+    try:
+        with open(_meta_path(path), "r") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def _write_meta(path: str, meta: dict) -> None:
+    """Atomically write the metadata for a downloaded file."""
+    tmp_path = f"{_meta_path(path)}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(meta, f, indent=4)
+    os.replace(tmp_path, _meta_path(path))
+
+
+def _stream_to_temp(chunks, path: str) -> tuple:
+    """Write ``chunks`` to a temporary file next to ``path`` and return (tmp_path, sha256)."""
+    digest = hashlib.sha256()
+    fd, tmp_path = tempfile.mkstemp(prefix=".download.", suffix=".tmp", dir=os.path.dirname(os.path.abspath(path)))
+    try:
+        with os.fdopen(fd, "wb") as f:
+            for chunk in chunks:
+                digest.update(chunk)
+                f.write(chunk)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return tmp_path, digest.hexdigest()
+
+
+def _iter_urllib(url: str):
+    """Yield the body of a non-HTTP URL (e.g. file://) in chunks."""
+    with urllib.request.urlopen(url) as response:
+        yield from iter(lambda: response.read(CHUNK_SIZE), b"")
+
+
+def _sha256_of(path: str) -> str:
+    """Return the SHA-256 checksum of a file."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def download(url: str, path: str, force: bool = False) -> bool:
+    """Download ``url`` to ``path`` if it changed since the last download.
+
+    HTTP(S) downloads send ``If-None-Match``/``If-Modified-Since`` unless
+    ``force`` is set.  Returns whether the file at ``path`` was replaced.
+    """
+    with _lock_for(path):
+        meta = read_meta(path) if os.path.exists(path) else {}
+        new_meta = {"url": url, "checked_at": time.time()}
+
+        if url.startswith("http"):
+            headers = {}
+            if not force and meta.get("url") == url:
+                if meta.get("etag"):
+                    headers["If-None-Match"] = meta["etag"]
+                if meta.get("last_modified"):
+                    headers["If-Modified-Since"] = meta["last_modified"]
+            with requests.get(url, headers=headers, stream=True, timeout=60) as response:
+                if response.status_code == 304:
+                    _write_meta(path, {**meta, **new_meta})
+                    return False
+                response.raise_for_status()
+                new_meta["etag"] = response.headers.get("ETag")
+                new_meta["last_modified"] = response.headers.get("Last-Modified")
+                tmp_path, sha256 = _stream_to_temp(response.iter_content(CHUNK_SIZE), path)
+        else:
+            tmp_path, sha256 = _stream_to_temp(_iter_urllib(url), path)
+
+        new_meta["sha256"] = sha256
+        if os.path.exists(path) and "sha256" not in meta:
+            # Files downloaded before checksums were recorded are compared directly.
+            meta["sha256"] = _sha256_of(path)
+        changed = sha256 != meta.get("sha256") or not os.path.exists(path)
+        if changed:
+            print(f"Downloaded {url} to {path}")
+            os.replace(tmp_path, path)
+        else:
+            os.unlink(tmp_path)
+        _write_meta(path, new_meta)
+        return changed
+
+
+def ensure_local(url: str, path: str) -> str:
+    """Download ``url`` to ``path`` unless it is already there, and return ``path``."""
+    if not os.path.exists(path):
+        print(f"Downloading from: {url}")
+        with metrics.stage("source.download"):
+            download(url, path)
+    return path
+
+
+def local_path_for(url: str) -> str:
+    """Return the local path a source URL is downloaded to."""
+    return os.path.join(DATA_DIR, url.split('/')[-1])
+
+
+def refresh_source(source: DataSource, force: bool = False) -> Dict[str, bool]:
+    """Revalidate the data file and codebook of a source; return which files changed."""
+    changed = {}
+    for url in (source.url, source.codebook_url):
+        if url:
+            changed[url] = download(url, local_path_for(url), force=force)
+    return changed
+
+
+def refresh_sources(names: Optional[List[str]] = None, force: bool = False) -> Dict[str, Dict[str, bool]]:
+    """Revalidate the given sources, or all configured sources.
+
+    Only sources that were downloaded before are refreshed; others are
+    downloaded on first use.  A failure for one source does not stop the others.
+    """
+    sources = data_source_registry.get_many(names) if names is not None else data_source_registry.all()
+    results = {}
+    for source in sources:
+        if not os.path.exists(local_path_for(source.url)):
+            continue
+        try:
+            results[source.name] = refresh_source(source, force=force)
+        except (OSError, requests.RequestException) as e:
+            print(f"Could not refresh {source.name}: {e}")
+    return results
+
+
+class SourceRefresher:
+    """Background thread that refreshes all sources on a fixed interval."""
+
+    def __init__(self, interval_seconds: float):
+        self.interval_seconds = interval_seconds
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        """Start refreshing in the background, if an interval is configured."""
+        if self.interval_seconds <= 0 or self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="polaris-source-refresh", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the background thread."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _loop(self) -> None:
+        """Refresh all sources until stopped."""
+        while not self._stop.wait(self.interval_seconds):
+            refresh_sources()
+
+
+source_refresher = SourceRefresher(SOURCE_REFRESH_INTERVAL_SECONDS)
@@ -0,0 +1,37 @@
+"""
+Token estimates for budgeting prompts.
+
+Prompt processing time on CPU grows with prompt length, so prompts are kept
+within token budgets.  Tokens are estimated from the character count rather
+than with the model's tokenizer, which is not available locally.
+"""
+
+from typing import List
+
+# Rough number of characters per token for English text.
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimate the number of tokens in ``text``."""
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def chunk_lines(lines: List[str], budget_tokens: int) -> List[List[str]]:
+    """Split ``lines`` into consecutive chunks of at most ``budget_tokens`` estimated tokens.
+
+    A single line over the budget forms a chunk of its own.
+    """
+    chunks: List[List[str]] = []
+    current: List[str] = []
+    used = 0
+    for line in lines:
+        tokens = estimate_tokens(line)
+        if current and used + tokens > budget_tokens:
+            chunks.append(current)
+            current, used = [], 0
+        current.append(line)
+        used += tokens
+    if current:
+        chunks.append(current)
+    return chunks
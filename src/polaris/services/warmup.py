@@ -0,0 +1,112 @@
+"""
+Warmup of the application after startup.
+
+Heavy dependencies are imported lazily (see ``polaris.core.lazy``) so workers
+start quickly.  A background thread then imports them, loads the datasets and
+codebooks of the configured sources, and asks Ollama to load the configured
+model and keep it loaded, so the first requests pay for none of this.
+``ready`` is set once the warmup has finished, whether or not every step
+succeeded; failures are logged and the affected work is done on first use.
+"""
+
+import importlib
+import threading
+import time
+import zipfile
+from typing import Dict, List, Optional
+
+import requests
+
+from polaris.agents.orchestrator import AnalysisError
+from polaris.core.config import WARMUP_KEEP_ALIVE, WARMUP_MODEL, WARMUP_SOURCES
+from polaris.core.lazy import lazy_import
+from polaris.services import metrics
+from polaris.services.llm_service import get_orchestrator_agent
+
+ollama = lazy_import("ollama")
+
+# Modules imported lazily by the services; the warmup imports them ahead of the first request.
+HEAVY_MODULES = ("pandas", "pyarrow", "pypdf", "gdeltdoc", "ollama")
+
+# Errors that stop the sources from being warmed up.
+SOURCE_ERRORS = (AnalysisError, OSError, ValueError, zipfile.BadZipFile, requests.RequestException)
+
+
+def import_modules(names=HEAVY_MODULES) -> None:
+    """Import the modules in ``names`` that are installed."""
+    for name in names:
+        try:
+            importlib.import_module(name)
+        except ImportError:
+            pass
+
+
+def warm_sources(sources: List[str]) -> None:
+    """Load the datasets and codebooks of ``sources`` into the process-wide caches."""
+    try:
+        get_orchestrator_agent().warm(sources)
+    except SOURCE_ERRORS as e:
+        print(f"Could not warm up the sources {', '.join(sources)}: {e}")
+
+
+def warm_model(model: str, keep_alive: str = WARMUP_KEEP_ALIVE) -> None:
+    """Ask Ollama to load ``model`` and keep it loaded for ``keep_alive``."""
+    try:
+        # A chat request without messages only loads the model.
+        ollama.chat(model=model, messages=[], keep_alive=keep_alive)
+    except (ollama.ResponseError, ollama.RequestError, OSError) as e:
+        print(f"Could not warm up the model '{model}': {e}")
+
+
+class Warmup:
+    """Background thread that warms up the application once, after startup."""
+
+    def __init__(self, sources: List[str], model: str):
+        self.sources = sources
+        self.model = model
+        self.ready = threading.Event()
+        self.timings: Dict[str, float] = {}
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        """Start warming up in the background."""
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="polaris-warmup", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Wait briefly for the warmup thread, which cannot be interrupted."""
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _step(self, name: str, fn, *args) -> None:
+        """Run one warmup step and record how long it took."""
+        started = time.perf_counter()
+        with metrics.stage(f"warmup.{name}"):
+            fn(*args)
+        self.timings[name] = round(time.perf_counter() - started, 3)
+
+    def _run(self) -> None:
+        """Run the warmup steps; the model loads in Ollama while the sources load here."""
+        try:
+            model = None
+            if self.model:
+                model = threading.Thread(target=self._step, args=("model", warm_model, self.model), name="polaris-warmup-model", daemon=True)
+                model.start()
+            self._step("imports", import_modules)
+            if self.sources:
+                self._step("sources", warm_sources, self.sources)
+            if model is not None:
+                model.join()
+            print(f"Warmup finished: {', '.join(f'{name} {seconds}s' for name, seconds in self.timings.items())}")
+        finally:
+            self.ready.set()
+
+    def status(self) -> dict:
+        """Return whether the warmup has finished and how long each step took."""
+        return {"ready": self.ready.is_set(), "timings": dict(self.timings)}
+
+
+warmup = Warmup(WARMUP_SOURCES, WARMUP_MODEL)
@@ -0,0 +1,14 @@
+"""
+Test configuration.
+
+The package lives in ``src/``, and its data paths (``src/polaris/data``) are
+relative to the working directory, so the tests run from a scratch directory.
+"""
+
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+os.chdir(tempfile.mkdtemp(prefix="polaris-tests-"))
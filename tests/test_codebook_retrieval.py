@@ -0,0 +1,42 @@
+import pytest
+
+from polaris.services import codebook_retrieval
+from polaris.services.codebook_retrieval import CodebookRetriever, estimate_tokens
+
+SECTIONS = [
+    "Overview: each row is one event of organised violence.",
+    "best: the best estimate of fatalities in the event.",
+    "country: the country where the event took place.",
+    "date_start: the earliest date the event may have started.",
+]
+CODEBOOK = "\n\n".join(" ".join([section] * 20) for section in SECTIONS)
+
+
+@pytest.fixture
+def retriever(monkeypatch, tmp_path):
+    def unavailable(texts, model=None):
+        raise OSError("no embedding model")
+
+    monkeypatch.setattr(codebook_retrieval, "embed", unavailable)
+    return CodebookRetriever(cache_dir=str(tmp_path))
+
+
+def budget(sections):
+    return sum(estimate_tokens(" ".join([s] * 20)) for s in sections) + 10
+
+
+def test_small_codebooks_are_returned_whole(retriever):
+    assert retriever.context(CODEBOOK, "fatalities", budget_tokens=10 ** 6) == CODEBOOK
+
+
+def test_sections_sharing_words_with_the_question_are_selected(retriever):
+    context = retriever.context(CODEBOOK, "Which country had the most fatalities?", budget_tokens=budget(SECTIONS[1:3]),
+                                top_k=2)
+    assert SECTIONS[1] in context and SECTIONS[2] in context
+    assert SECTIONS[0] not in context
+
+
+def test_leading_sections_are_used_when_no_section_matches(retriever):
+    context = retriever.context(CODEBOOK, "Zzz?", budget_tokens=budget(SECTIONS[:2]), top_k=3)
+    assert SECTIONS[0] in context and SECTIONS[1] in context
+    assert SECTIONS[3] not in context
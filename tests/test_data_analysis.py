@@ -0,0 +1,42 @@
+import numpy as np
+import pandas as pd
+
+from polaris.services import data_analysis
+from polaris.services.data_analysis import AggregateIndex, build_index
+
+
+def _frame():
+    return pd.DataFrame({
+        "country": ["Syria", "Syria", "Iraq", "Iraq"],
+        "region": ["Middle East"] * 4,
+        "year": [2015, 2015, 2015, 2016],
+        "date_start": ["2015-01-03", "2015-02-10", "2015-02-11", "2016-05-01"],
+        "best": [3, np.nan, 5, 7],
+        "low": [1, 2, 4, 6],
+        "high": [4, 5, np.nan, 9],
+    })
+
+
+def test_missing_estimates_count_as_zero():
+    index = build_index(_frame())
+    assert index.total("Syria", 2015) == 3
+    assert index.total("Syria", 2015, "low") == 3
+    assert index.total("Iraq", 2015, "high") == 0
+    assert index.monthly_total("Syria", 2015, 2, "low") == 2
+
+
+def test_functions_match_with_and_without_index():
+    df = _frame()
+    index = build_index(df)
+    assert data_analysis.get_total_fatalities(df, "syria", 2015, index=index) == 3
+    assert data_analysis.get_fatalities_by_year(df, "Iraq", index=index) == {2015: 5, 2016: 7}
+    assert data_analysis.get_top_countries(df, k=1, index=index) == {"Iraq": 12}
+    assert data_analysis.get_region_totals(df, index=index) == {"Middle East": 15}
+
+
+def test_index_from_chunks_matches_the_whole_frame():
+    df = _frame()
+    whole = build_index(df)
+    chunked = AggregateIndex.from_chunks([df.iloc[:2], df.iloc[2:]])
+    for country, year in [("Syria", 2015), ("Iraq", 2015), ("Iraq", 2016)]:
+        assert chunked.total(country, year) == whole.total(country, year)
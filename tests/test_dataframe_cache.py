@@ -0,0 +1,48 @@
+import threading
+
+import pytest
+
+from polaris.services.dataframe_cache import DataFrameCache
+
+
+@pytest.fixture
+def data_file(tmp_path):
+    path = tmp_path / "events.csv"
+    path.write_text("country,best\nSyria,3\n")
+    return str(path)
+
+
+def test_concurrent_loads_share_one_call(data_file):
+    cache = DataFrameCache(max_bytes=1 << 20)
+    calls = []
+    started = threading.Event()
+
+    def loader(path):
+        calls.append(path)
+        started.wait(1)
+        return b"loaded"
+
+    threads = [threading.Thread(target=cache.get_or_load, args=("s", data_file, loader)) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    started.set()
+    for thread in threads:
+        thread.join()
+
+    assert calls == [data_file]
+    assert cache.get_or_load("s", data_file, loader) == b"loaded"
+
+
+def test_failed_load_releases_its_lock(data_file):
+    cache = DataFrameCache(max_bytes=1 << 20)
+
+    def failing(path):
+        raise OSError("unreadable")
+
+    with pytest.raises(OSError):
+        cache.get_or_load("s", data_file, failing)
+    assert cache.get_or_load("s", data_file, lambda path: None) is None
+    assert cache._load_locks == {}
+
+    assert cache.get_or_load("s", data_file, lambda path: b"loaded") == b"loaded"
+    assert cache._load_locks == {}
@@ -0,0 +1,50 @@
+import os
+
+from polaris.models import EventItem
+from polaris.services.dedupe import DedupeIndex, collapse, normalize_title
+
+
+def event(n, title):
+    return EventItem(id=f"https://example.org/{n}", date="20240301T120000Z", source="example.org", title=title,
+                     url=f"https://example.org/{n}")
+
+
+STORY = "Government forces and rebels clash near the northern border crossing"
+
+
+def test_normalize_title_drops_source_suffix_and_punctuation():
+    assert normalize_title("Rebels CLASH near border! - Reuters") == "rebels clash near border"
+
+
+def test_syndicated_copies_collapse_into_the_first_event():
+    events = [
+        event(1, STORY),
+        event(2, f"{STORY} - Reuters"),
+        event(3, STORY.upper() + "!"),
+        event(4, "Parliament passes the annual budget after a long debate"),
+    ]
+    collapsed = collapse(events, DedupeIndex(":memory:", 100))
+    assert [e.id for e in collapsed.values()] == [events[0].id, events[3].id]
+    assert [e.duplicates for e in collapsed.values()] == [2, 0]
+
+
+def test_events_without_a_title_are_kept():
+    collapsed = collapse([event(1, ""), event(2, "")], DedupeIndex(":memory:", 100))
+    assert len(collapsed) == 2
+
+
+def test_duplicates_are_recognised_across_fetches_and_restarts(tmp_path):
+    path = os.path.join(tmp_path, "dedupe.sqlite3")
+    collapse([event(1, STORY)], DedupeIndex(path, 100))
+    collapsed = collapse([event(2, f"{STORY} | AP")], DedupeIndex(path, 100))
+    assert list(collapsed) == [event(1, STORY).id]
+    assert collapsed[event(1, STORY).id].duplicates == 1
+
+
+def test_oldest_canonical_events_are_evicted():
+    index = DedupeIndex(":memory:", 2)
+    titles = ["Floods displace thousands in the delta region", "Talks resume over the disputed dam project",
+              "Election results delayed amid recount demands"]
+    index.add_many([event(n, title) for n, title in enumerate(titles)])
+    assert index.stats()["canonical_events"] == 2
+    assert index.add_many([event(9, titles[0])]) == [event(9, titles[0]).id]
@@ -0,0 +1,8 @@
+from polaris.api.streaming import NDJSON_MEDIA_TYPE
+from polaris.main import create_app
+
+
+def test_fetch_events_documents_both_media_types():
+    content = create_app().openapi()["paths"]["/fetch-events"]["get"]["responses"]["200"]["content"]
+    assert content["application/json"]["schema"]["type"] == "array"
+    assert content[NDJSON_MEDIA_TYPE]["schema"] == {"$ref": "#/components/schemas/EventItem"}
@@ -0,0 +1,37 @@
+import os
+
+import pytest
+
+pytest.importorskip("pyarrow")
+
+from polaris.services.data_loader import load_columnar
+from polaris.services.ingest import columnar_path, ensure_columnar
+
+
+@pytest.fixture
+def csv_path(tmp_path):
+    path = tmp_path / "events.csv"
+    path.write_text("country,year,best,notes\nSyria,2015,3,a\nIraq,2016,,b\n")
+    return str(path)
+
+
+def test_columns_follow_the_codebook(csv_path):
+    narrow = ensure_columnar(csv_path, "The country and best columns are used.")
+    assert list(load_columnar(narrow).columns) == ["country", "best"]
+
+    wide = ensure_columnar(csv_path, "The country, year and best columns are used.")
+    assert wide != narrow
+    assert list(load_columnar(wide).columns) == ["country", "year", "best"]
+    assert not os.path.exists(narrow)
+
+
+def test_unchanged_codebook_reuses_the_conversion(csv_path):
+    first = ensure_columnar(csv_path, "country best")
+    mtime = os.path.getmtime(first)
+    assert ensure_columnar(csv_path, "country best") == first
+    assert os.path.getmtime(first) == mtime
+
+
+def test_path_depends_on_the_columns(csv_path):
+    assert columnar_path(csv_path, ["a"]) != columnar_path(csv_path, ["b"])
+    assert columnar_path(csv_path, None) == columnar_path(csv_path)
@@ -0,0 +1,24 @@
+import asyncio
+import threading
+
+from polaris.services import llm_service
+
+
+def test_cached_completion_is_looked_up_off_the_event_loop(monkeypatch):
+    threads = []
+
+    def get(key):
+        threads.append(threading.current_thread())
+        return "cached reply"
+
+    monkeypatch.setattr(llm_service.response_cache, "get", get)
+
+    async def complete():
+        meta = {}
+        content = await llm_service.acomplete("Summarise the week", meta=meta)
+        return content, meta, threading.current_thread()
+
+    content, meta, loop_thread = asyncio.run(complete())
+    assert content == "cached reply"
+    assert meta["cache"] == "hit"
+    assert threads and threads[0] is not loop_thread
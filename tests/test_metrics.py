@@ -0,0 +1,37 @@
+import asyncio
+import threading
+
+from polaris.agents.base import map_sources
+from polaris.services import metrics
+
+
+def load(item):
+    with metrics.stage(f"load.{item}"):
+        return threading.current_thread().name
+
+
+def test_stages_of_map_sources_work_are_in_the_request_timings():
+    token = metrics.start_request_timings()
+    try:
+        threads = map_sources(load, {"a": "a", "b": "b"})
+        stages = sorted(name for name, _ in metrics.request_timings())
+    finally:
+        metrics.stop_request_timings(token)
+    assert all(name.startswith("polaris-source") for name in threads.values())
+    assert stages == ["load.a", "load.b"]
+
+
+def test_requests_collect_only_their_own_timings():
+    async def request(item):
+        token = metrics.start_request_timings()
+        try:
+            await asyncio.to_thread(map_sources, load, {item: item})
+            return [name for name, _ in metrics.request_timings()]
+        finally:
+            metrics.stop_request_timings(token)
+
+    async def both():
+        return await asyncio.gather(request("a"), request("b"))
+
+    assert asyncio.run(both()) == [["load.a"], ["load.b"]]
+    assert metrics.request_timings() is None
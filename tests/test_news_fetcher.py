@@ -0,0 +1,147 @@
+import datetime
+import re
+import threading
+import time
+import types
+
+import pandas as pd
+import pytest
+
+from polaris.core.config import GDELT_DAY_GRACE_SECONDS, GDELT_FETCH_WORKERS, GDELT_TODAY_TTL_SECONDS
+from polaris.services import event_ingester, news_fetcher
+from polaris.services.event_store import EventStore
+from polaris.services.news_fetcher import is_complete, is_fresh
+from polaris.services.search_index import SearchIndex
+
+DAY = datetime.date(2024, 3, 1)
+DAY_END = datetime.datetime(2024, 3, 2, tzinfo=datetime.timezone.utc).timestamp()
+
+
+class FakeGdelt:
+    """Answers article searches with one article per call, numbered by call."""
+
+    def __init__(self, latency=0.0):
+        self.calls = []
+        self.latency = latency
+        self.running = 0
+        self.max_running = 0
+        self.lock = threading.Lock()
+
+    def article_search(self, filters):
+        with self.lock:
+            self.calls.append(filters.query_string)
+            n = len(self.calls)
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+        time.sleep(self.latency)
+        with self.lock:
+            self.running -= 1
+        day = re.search(r"startdatetime=(\d{8})", filters.query_string).group(1)
+        return pd.DataFrame({
+            "url": [f"https://example.org/{n}"],
+            "seendate": [f"{day}T120000Z"],
+            "domain": ["example.org"],
+            "title": [f"Article {n}"],
+            "sourcecountry": ["Syria"],
+        })
+
+
+@pytest.fixture
+def gdelt(monkeypatch):
+    fake = FakeGdelt()
+    monkeypatch.setattr(news_fetcher, "_gdelt_client", fake)
+    monkeypatch.setattr(news_fetcher, "event_store", EventStore(":memory:"))
+    news_fetcher._buckets.clear()
+    yield fake
+    news_fetcher._buckets.clear()
+
+
+def test_day_fetched_after_its_grace_period_is_complete():
+    assert is_complete(DAY, DAY_END + GDELT_DAY_GRACE_SECONDS)
+    assert is_fresh(DAY, DAY_END + GDELT_DAY_GRACE_SECONDS, DAY_END + 365 * 86400)
+
+
+def test_day_fetched_while_it_was_partial_expires_after_the_ttl():
+    fetched_at = DAY_END - 60
+    assert not is_complete(DAY, fetched_at)
+    assert is_fresh(DAY, fetched_at, fetched_at + GDELT_TODAY_TTL_SECONDS - 1)
+    assert not is_fresh(DAY, fetched_at, DAY_END + 365 * 86400)
+
+
+def test_partial_bucket_is_fetched_again_once(gdelt, monkeypatch):
+    clock = [DAY_END - 60]
+    monkeypatch.setattr(news_fetcher, "time", types.SimpleNamespace(time=lambda: clock[0]))
+    assert news_fetcher.day_events("syria", DAY)[0][0].title == "Article 1"
+
+    # Long after midnight, the bucket fetched during the day is refreshed once ...
+    clock[0] = DAY_END + 2 * GDELT_DAY_GRACE_SECONDS
+    assert news_fetcher.day_events("syria", DAY)[0][0].title == "Article 2"
+
+    # ... and then cached for good.
+    clock[0] += 30 * 86400
+    assert news_fetcher.day_events("syria", DAY)[0][0].title == "Article 2"
+    assert len(gdelt.calls) == 2
+
+
+WINDOW = {"since": "2024-03-01", "until": "2024-03-04", "maxrecs": 50}
+
+
+def test_store_mode_answers_for_the_fetched_country_codes(gdelt):
+    live = news_fetcher.fetch_events(q="syria", countries="SY", **WINDOW)
+    stored = news_fetcher.fetch_events(q="syria", countries="SY", mode="store", **WINDOW)
+    assert [e.id for e in stored] == [e.id for e in live]
+    assert news_fetcher.fetch_events(q="syria", countries="IZ", mode="store", **WINDOW) == []
+    assert news_fetcher.fetch_events(q="syria", mode="store", **WINDOW) == []
+    assert len(gdelt.calls) == 3
+
+
+def test_delta_mode_only_fetches_days_missing_for_the_query(gdelt):
+    news_fetcher.day_events("syria", datetime.date(2024, 3, 2))
+    news_fetcher._buckets.clear()
+
+    events = news_fetcher.fetch_events(q="syria", mode="delta", **WINDOW)
+    assert len(events) == 3
+    assert len(gdelt.calls) == 3
+
+    # The days are now stored for this query, even without the in-memory cache ...
+    news_fetcher._buckets.clear()
+    assert len(news_fetcher.fetch_events(q="syria", mode="delta", **WINDOW)) == 3
+    assert len(gdelt.calls) == 3
+
+    # ... but not for another query or other countries.
+    news_fetcher.fetch_events(q="iraq", mode="delta", **WINDOW)
+    news_fetcher.fetch_events(q="syria", countries="SY", mode="delta", **WINDOW)
+    assert len(gdelt.calls) == 9
+
+
+def test_delta_mode_fetches_days_stored_before_they_were_complete(gdelt):
+    news_fetcher.event_store.add_fetch("syria", "", DAY.isoformat(), [], DAY_END - 60, 250)
+    assert news_fetcher.missing_days("syria", "", DAY, DAY + datetime.timedelta(days=1), 50) == [DAY]
+    news_fetcher.event_store.add_fetch("syria", "", DAY.isoformat(), [], DAY_END + GDELT_DAY_GRACE_SECONDS, 250)
+    assert news_fetcher.missing_days("syria", "", DAY, DAY + datetime.timedelta(days=1), 50) == []
+
+
+def test_ingested_days_are_answered_from_the_store(gdelt, monkeypatch, tmp_path):
+    monkeypatch.setattr(event_ingester, "event_store", news_fetcher.event_store)
+    monkeypatch.setattr(event_ingester, "search_index", SearchIndex(str(tmp_path / "index.npz"), news_fetcher.event_store))
+    assert event_ingester.ingest(["syria"], lookback_days=2) == {"syria": 2}
+
+    today = datetime.datetime.utcnow().date()
+    window = {"since": (today - datetime.timedelta(days=1)).isoformat(), "until": (today + datetime.timedelta(days=1)).isoformat()}
+    news_fetcher._buckets.clear()
+    assert len(news_fetcher.fetch_events(q="syria", mode="store", **window)) == 2
+    assert len(news_fetcher.fetch_events(q="syria", mode="delta", **window)) == 2
+    assert len(gdelt.calls) == 2
+
+
+def test_live_window_fetches_days_concurrently_most_recent_first(gdelt):
+    gdelt.latency = 0.05
+    events = news_fetcher.fetch_events(q="syria", since="2024-03-01", until="2024-03-09", maxrecs=50)
+    assert [e.date[:8] for e in events] == [f"202403{d:02d}" for d in range(8, 0, -1)]
+    assert 1 < gdelt.max_running <= GDELT_FETCH_WORKERS
+
+
+def test_window_answered_by_its_most_recent_day_makes_one_call(gdelt):
+    events = news_fetcher.fetch_events(q="syria", since="2024-03-01", until="2024-03-09", maxrecs=1)
+    assert [e.date[:8] for e in events] == ["20240308"]
+    assert len(gdelt.calls) == 1
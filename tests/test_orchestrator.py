@@ -0,0 +1,62 @@
+import asyncio
+import threading
+import types
+
+import pytest
+
+from polaris.agents import orchestrator
+from polaris.agents.orchestrator import Analysis, OrchestratorAgent
+
+CALL = '{"function": "get_total_fatalities", "parameters": {"country": "Syria", "year": 2015}}'
+
+
+@pytest.fixture
+def agent(monkeypatch):
+    agent = OrchestratorAgent()
+    threads = []
+    analysis = types.SimpleNamespace(datasets={})
+
+    def execute(datasets, content):
+        threads.append(threading.get_ident())
+        return "42"
+
+    monkeypatch.setattr(agent, "prepare", lambda prompt, sources: analysis)
+    monkeypatch.setattr(agent, "fast_path", lambda prompt, analysis, meta: CALL)
+    monkeypatch.setattr(agent, "execute", execute)
+    agent.threads = threads
+    return agent
+
+
+def test_arun_executes_off_the_event_loop(agent):
+    async def run():
+        return await agent.arun("Deaths in Syria in 2015", sources=["ucdp"]), threading.get_ident()
+
+    result, loop_thread = asyncio.run(run())
+    assert result == "42"
+    assert agent.threads and loop_thread not in agent.threads
+
+
+def test_astream_executes_off_the_event_loop(agent):
+    async def run():
+        events = [event async for event in agent.astream("Deaths in Syria in 2015", sources=["ucdp"])]
+        return events, threading.get_ident()
+
+    events, loop_thread = asyncio.run(run())
+    assert events[-1]["response"] == "42"
+    assert agent.threads and loop_thread not in agent.threads
+
+
+@pytest.mark.parametrize("method", ["run", "arun"])
+def test_routed_questions_skip_codebook_retrieval(monkeypatch, method):
+    agent = OrchestratorAgent()
+    analysis = Analysis({}, {"ucdp": "Codebook text"}, {"ucdp": "ucdp.csv"})
+
+    def context(*args):
+        raise AssertionError("codebook retrieval ran for a routed question")
+
+    monkeypatch.setattr(orchestrator.codebook_retriever, "context", context)
+    monkeypatch.setattr(agent, "prepare", lambda prompt, sources: analysis)
+    monkeypatch.setattr(agent, "fast_path", lambda prompt, analysis, meta: CALL)
+    monkeypatch.setattr(agent, "execute", lambda datasets, content: "42")
+    result = getattr(agent, method)("Deaths in Syria in 2015", sources=["ucdp"])
+    assert (asyncio.run(result) if method == "arun" else result) == "42"
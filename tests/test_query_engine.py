@@ -0,0 +1,81 @@
+import pandas as pd
+import pytest
+
+from polaris.services.query_engine import QueryError, QueryPlan, execute_plan, normalize_plan
+
+
+@pytest.fixture
+def df():
+    return pd.DataFrame({
+        "country": pd.Categorical(["Syria", "Iraq", "Syria", "Mali", "Syria", "Iraq"]),
+        "year": [2015, 2015, 2016, 2016, 2017, 2017],
+        "best": [10, 4, 30, 7, 20, 1],
+        "side_a": ["Government", "IS", "Rebels", "JNIM", "Government", "IS"],
+    }, index=[10, 11, 12, 13, 14, 15])
+
+
+def plan(**fields):
+    return QueryPlan.model_validate(fields)
+
+
+def test_normalize_plan_ignores_filter_order_and_case():
+    a = plan(filters=[{"column": "country", "op": "in", "value": ["Syria", "iraq"]},
+                      {"column": "year", "op": ">=", "value": 2015}])
+    b = plan(filters=[{"column": "year", "op": ">=", "value": 2015},
+                      {"column": "country", "op": "in", "value": [" IRAQ", "syria"]}])
+    assert normalize_plan(a) == normalize_plan(b)
+    assert normalize_plan(a) != normalize_plan(plan(filters=[{"column": "year", "op": ">=", "value": 2016}]))
+
+
+def test_group_aggregate_sort_and_limit(df):
+    result = execute_plan(df, plan(
+        filters=[{"column": "year", "op": "between", "value": [2015, 2016]}],
+        group_by=["country"], aggregates=[{"func": "sum", "column": "best", "name": "deaths"}],
+        sort=[{"column": "deaths"}], limit=2,
+    ))
+    assert result == [{"country": "Syria", "deaths": 40}, {"country": "Mali", "deaths": 7}]
+
+
+def test_aggregate_without_group_by(df):
+    result = execute_plan(df, plan(filters=[{"column": "country", "op": "==", "value": "syria"}],
+                                   aggregates=[{"func": "count"}, {"func": "max", "column": "best"}]))
+    assert result == [{"count": 3, "max_best": 30}]
+
+
+def test_rows_without_sort_are_the_first_matches(df):
+    result = execute_plan(df, plan(filters=[{"column": "country", "op": "!=", "value": "Mali"}],
+                                   columns=["country", "year"], limit=3))
+    assert result == [{"country": "Syria", "year": 2015}, {"country": "Iraq", "year": 2015},
+                      {"country": "Syria", "year": 2016}]
+
+
+def test_rows_with_sort_are_the_top_matches(df):
+    result = execute_plan(df, plan(filters=[{"column": "side_a", "op": "contains", "value": "gov"}],
+                                   columns=["year"], sort=[{"column": "best"}], limit=1))
+    assert result == [{"year": 2017}]
+    result = execute_plan(df, plan(columns=["side_a", "best"], sort=[{"column": "country", "descending": False},
+                                                                     {"column": "best"}], limit=3))
+    assert result == [{"side_a": "IS", "best": 4}, {"side_a": "IS", "best": 1}, {"side_a": "JNIM", "best": 7}]
+
+
+def test_results_are_capped_at_max_rows(df):
+    assert len(execute_plan(df, plan(limit=100), max_rows=4)) == 4
+    assert len(execute_plan(df, plan(sort=[{"column": "best", "descending": False}]), max_rows=2)) == 2
+
+
+def test_invalid_plans_are_rejected(df):
+    with pytest.raises(QueryError, match="no column 'deaths'"):
+        execute_plan(df, plan(filters=[{"column": "deaths", "op": ">", "value": 1}]))
+    with pytest.raises(QueryError, match="no column 'deaths'"):
+        execute_plan(df, plan(sort=[{"column": "deaths"}]))
+    with pytest.raises(QueryError, match="needs a column"):
+        execute_plan(df, plan(aggregates=[{"func": "sum"}]))
+    with pytest.raises(QueryError):
+        execute_plan(None, plan())
+    with pytest.raises(ValueError):
+        plan(limit=0)
+
+
+def test_plans_past_the_deadline_are_stopped(df):
+    with pytest.raises(QueryError, match="longer than"):
+        execute_plan(df, plan(filters=[{"column": "best", "op": ">", "value": 0}]), timeout_seconds=1e-9)
@@ -0,0 +1,118 @@
+import datetime
+import re
+
+import pandas as pd
+import pytest
+from fastapi import HTTPException
+
+from polaris.api.risk import risk_score_endpoint
+from polaris.models import RiskRequest
+from polaris.services import news_fetcher, risk_scorer
+from polaris.services.risk_scorer import ScoreUnavailable, risk_score, update_area
+
+ARTICLES_PER_DAY = 1000
+TONE = -2.0
+
+
+class FakeGdelt:
+    """Answers timeline searches with one bin per day of the requested span."""
+
+    def __init__(self):
+        self.calls = []
+        self.articles_per_day = ARTICLES_PER_DAY
+
+    def timeline_search(self, mode, filters):
+        start = datetime.datetime.strptime(re.search(r"startdatetime=(\d{8})", filters.query_string).group(1), "%Y%m%d")
+        end = datetime.datetime.strptime(re.search(r"enddatetime=(\d{8})", filters.query_string).group(1), "%Y%m%d")
+        self.calls.append((mode, start.date(), end.date()))
+        days = pd.date_range(start, end, freq="D", inclusive="left", tz="UTC")
+        if mode == "timelinetone":
+            return pd.DataFrame({"datetime": days, "Average Tone": TONE})
+        return pd.DataFrame({"datetime": days, "Article Count": self.articles_per_day, "All Articles": 100000})
+
+
+@pytest.fixture
+def gdelt(monkeypatch):
+    fake = FakeGdelt()
+    monkeypatch.setattr(news_fetcher, "_gdelt_client", fake)
+    risk_scorer._areas.clear()
+    risk_scorer._dropped.clear()
+    risk_scorer._scores.clear()
+    yield fake
+    risk_scorer._areas.clear()
+    risk_scorer._dropped.clear()
+    risk_scorer._scores.clear()
+
+
+def test_new_area_is_tracked_without_calling_gdelt(gdelt):
+    with pytest.raises(ScoreUnavailable):
+        risk_score("Syria", 14)
+    assert "syria" in risk_scorer._areas
+    assert gdelt.calls == []
+
+
+def test_score_uses_timeline_volume_beyond_the_article_search_cap(gdelt):
+    update_area("Syria")
+    calls = len(gdelt.calls)
+    score = risk_score("Syria", 14)
+    assert len(gdelt.calls) == calls
+    assert score.components["event_volume"] == 14 * ARTICLES_PER_DAY
+    assert score.components["volume_change"] == 0.0
+    assert score.components["mean_tone"] == pytest.approx(TONE)
+
+
+def test_later_updates_only_fetch_incomplete_days(gdelt):
+    today = datetime.datetime.utcnow().date()
+    update_area("Syria")
+    assert gdelt.calls[0][1] == today - datetime.timedelta(days=risk_scorer.SERIES_DAYS - 1)
+    update_area("Syria")
+    assert gdelt.calls[-1][1] >= today - datetime.timedelta(days=1)
+
+
+def test_least_recently_requested_area_makes_room(gdelt, monkeypatch):
+    monkeypatch.setattr(risk_scorer, "RISK_MAX_AREAS", 2)
+    update_area("Syria")
+    update_area("Iraq")
+    risk_score("Syria", 14)
+    with pytest.raises(ScoreUnavailable):
+        risk_score("Yemen", 14)
+    assert sorted(risk_scorer._areas) == ["syria", "yemen"]
+
+
+def test_areas_beyond_the_limit_are_rejected_when_all_are_configured(gdelt, monkeypatch):
+    risk_scorer._area_series("Syria", pinned=True)
+    monkeypatch.setattr(risk_scorer, "RISK_MAX_AREAS", 1)
+    with pytest.raises(ValueError):
+        risk_score("Iraq", 14)
+
+
+def test_idle_areas_are_evicted_but_configured_areas_kept(gdelt, monkeypatch):
+    monkeypatch.setattr(risk_scorer, "RISK_AREA_IDLE_SECONDS", 60)
+    risk_scorer._area_series("Syria", pinned=True)
+    update_area("Iraq")
+    update_area("Yemen")
+    for area in ("syria", "iraq"):
+        risk_scorer._areas[area].requested_at -= 120
+    risk_scorer.RiskUpdater([], 900).run()
+    assert sorted(risk_scorer._areas) == ["syria", "yemen"]
+
+
+def test_areas_without_articles_are_dropped(gdelt):
+    gdelt.articles_per_day = 0
+    with pytest.raises(ScoreUnavailable):
+        risk_score("Atlantis", 14)
+    risk_scorer.RiskUpdater([], 900).run(new_only=True)
+    assert "atlantis" not in risk_scorer._areas
+    calls = len(gdelt.calls)
+    with pytest.raises(ValueError):
+        risk_score("Atlantis", 14)
+    assert "atlantis" not in risk_scorer._areas and len(gdelt.calls) == calls
+
+
+def test_endpoint_answers_503_until_the_area_is_fetched(gdelt):
+    with pytest.raises(HTTPException) as error:
+        risk_score_endpoint(RiskRequest(area="Syria", window_days=14))
+    assert error.value.status_code == 503
+    assert error.value.headers["Retry-After"] == str(risk_scorer.RETRY_AFTER_SECONDS)
+    update_area("Syria")
+    assert risk_score_endpoint(RiskRequest(area="Syria", window_days=14)).score > 0
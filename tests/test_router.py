@@ -0,0 +1,70 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from polaris.agents.router import DEFAULT_TOP_K, FunctionCall, route
+from polaris.services.data_analysis import Dataset
+
+
+def dataset(countries=("Syria", "Iraq", "Democratic Republic of Congo")):
+    rows = len(countries) * 2
+    return Dataset(pd.DataFrame({
+        "country": [c for c in countries for _ in range(2)],
+        "region": ["Middle East"] * rows,
+        "year": [2015, 2016] * len(countries),
+        "date_start": ["2015-03-01", "2016-05-01"] * len(countries),
+        "best": np.arange(rows),
+        "low": np.arange(rows),
+        "high": np.arange(rows),
+    }))
+
+
+@pytest.fixture
+def datasets():
+    return {"ucdp": dataset()}
+
+
+@pytest.mark.parametrize("question, call", [
+    ("How many fatalities were there in Syria in 2015?",
+     FunctionCall("get_total_fatalities", {"country": "Syria", "year": 2015, "estimate": "best"})),
+    ("How many people were killed in the Democratic Republic of Congo in 2016 (high estimate)?",
+     FunctionCall("get_total_fatalities", {"country": "Democratic Republic of Congo", "year": 2016, "estimate": "high"})),
+    ("Deaths in Iraq in March 2015",
+     FunctionCall("get_monthly_fatalities", {"country": "Iraq", "year": 2015, "month": 3, "estimate": "best"})),
+    ("Fatalities in Syria between 2016 and 2015",
+     FunctionCall("get_fatalities_by_year", {"country": "Syria", "start_year": 2015, "end_year": 2016, "estimate": "best"})),
+    ("Fatalities in Syria per year",
+     FunctionCall("get_fatalities_by_year", {"country": "Syria", "start_year": None, "end_year": None, "estimate": "best"})),
+    ("Which 3 countries had the most deaths in 2015?",
+     FunctionCall("get_top_countries", {"k": 3, "estimate": "best", "start_year": 2015, "end_year": 2015})),
+    ("What are the deadliest countries?", FunctionCall("get_top_countries", {"k": DEFAULT_TOP_K, "estimate": "best"})),
+    ("Total fatalities per region since 2016",
+     FunctionCall("get_region_totals", {"estimate": "best", "start_year": 2016, "end_year": None})),
+])
+def test_common_questions_are_routed(datasets, question, call):
+    assert route(question, datasets) == call
+
+
+@pytest.mark.parametrize("question", [
+    "Compare the deaths in Syria and Iraq in 2015",
+    "How many fatalities were there in Syria and Iraq in 2015?",
+    "What was the average number of deaths in Syria in 2015?",
+    "How many fatalities were there in Syria?",
+    "How many fatalities were there in Yemen in 2015?",
+    "Who governed Syria in 2015?",
+    "Deaths in Syria in May 2015 and 2016",
+])
+def test_other_questions_are_left_to_the_llm(datasets, question):
+    assert route(question, datasets) is None
+
+
+def test_country_names_are_matched_as_whole_words():
+    datasets = {"ucdp": dataset(("Niger", "Nigeria"))}
+    assert route("Deaths in Nigeria in 2015", datasets).parameters["country"] == "Nigeria"
+    assert route("Deaths in Niger in 2015", datasets).parameters["country"] == "Niger"
+
+
+def test_the_dataset_is_named_when_one_of_several_answers():
+    datasets = {"ucdp": dataset(("Syria",)), "acled": dataset(("Iraq",))}
+    assert route("Deaths in Iraq in 2015", datasets).source == "acled"
+    assert route("What are the deadliest countries?", datasets) is None
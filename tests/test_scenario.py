@@ -0,0 +1,35 @@
+import pytest
+from fastapi import HTTPException
+
+from polaris.api.scenario import generate_scenario
+from polaris.core.config import SCENARIO_MAX_ACTORS, SCENARIO_MAX_HORIZON_DAYS, SCENARIO_MAX_VARIANTS
+from polaris.models import ScenarioRequest
+
+
+def request(**overrides):
+    fields = {"prompt": "Escalation", "actors": ["Government", "Rebels"], "time_horizon_days": 30, "variants": 3, "seed": 0}
+    fields.update(overrides)
+    return ScenarioRequest(**fields)
+
+
+@pytest.mark.parametrize("overrides", [
+    {"variants": SCENARIO_MAX_VARIANTS + 1},
+    {"time_horizon_days": SCENARIO_MAX_HORIZON_DAYS + 1},
+    {"actors": [f"Actor {i}" for i in range(SCENARIO_MAX_ACTORS + 1)]},
+])
+def test_requests_above_the_limits_are_rejected_with_400(overrides):
+    with pytest.raises(HTTPException) as error:
+        generate_scenario(request(**overrides))
+    assert error.value.status_code == 400
+
+
+def test_requests_below_the_minimum_are_rejected_with_422():
+    with pytest.raises(HTTPException) as error:
+        generate_scenario(request(variants=0))
+    assert error.value.status_code == 422
+
+
+def test_requests_within_the_limits_are_simulated():
+    response = generate_scenario(request(time_horizon_days=SCENARIO_MAX_HORIZON_DAYS))
+    assert 1 <= len(response.scenarios) <= 3
+    assert response.metadata["seed"] == 0
@@ -0,0 +1,107 @@
+import pytest
+from fastapi import HTTPException
+
+from polaris.api import search
+from polaris.models import EventItem
+from polaris.services.event_store import EventStore
+from polaris.services.search_index import SearchIndex
+
+
+def event(n, title, day="2024-03-01", country="Syria", summary=None):
+    return EventItem(id=f"https://example.org/{n}", date=day, source="example.org", title=title,
+                     url=f"https://example.org/{n}", country=country, summary=summary)
+
+
+@pytest.fixture
+def store():
+    return EventStore(":memory:")
+
+
+@pytest.fixture
+def index(store, tmp_path):
+    return SearchIndex(str(tmp_path / "index.npz"), store)
+
+
+def ids(events):
+    return [e.id.rsplit("/", 1)[1] for e in events]
+
+
+def test_events_matching_more_and_rarer_terms_rank_first(store, index):
+    store.add_many([
+        event(1, "Airstrikes hit a market in Idlib"),
+        event(2, "Ceasefire talks resume in Geneva"),
+        event(3, "Market prices rise after the ceasefire"),
+        event(4, "Airstrikes resume near Idlib after the ceasefire collapses"),
+    ])
+    results = index.search("idlib airstrikes ceasefire")
+    # Events 2 and 3 only match the common term; the shorter title ranks first.
+    assert ids(results) == ["4", "1", "2", "3"]
+    assert results[0].score > results[1].score > results[2].score > results[3].score > 0
+    assert "2" not in ids(index.search("idlib"))
+
+
+def test_title_words_count_more_than_summary_words(store, index):
+    store.add_many([
+        event(1, "Flooding in the delta", summary="Officials report displacement"),
+        event(2, "Officials report displacement", summary="Flooding in the delta"),
+    ])
+    assert ids(index.search("flooding")) == ["1", "2"]
+
+
+def test_date_and_country_filters(store, index):
+    store.add_many([
+        event(1, "Protests in the capital", day="2024-03-01", country="Iraq"),
+        event(2, "Protests in the capital", day="2024-03-05", country="Syria"),
+    ])
+    assert ids(index.search("protests", since="2024-03-02")) == ["2"]
+    assert ids(index.search("protests", until="2024-03-02")) == ["1"]
+    assert ids(index.search("protests", source_countries=["iraq"])) == ["1"]
+
+
+def test_new_and_changed_events_are_indexed_incrementally(store, index):
+    store.add_many([event(1, "Drought threatens harvest")])
+    assert ids(index.search("drought")) == ["1"]
+    assert index.refresh() == 0
+
+    store.add_many([event(2, "Drought spreads to the north"), event(1, "Rains end the dry season")])
+    assert index.refresh() == 2
+    assert ids(index.search("drought")) == ["2"]
+    assert ids(index.search("rains")) == ["1"]
+    assert index.stats()["events"] == 2
+
+
+def test_snapshot_only_indexes_events_stored_after_it(store, index, tmp_path):
+    store.add_many([event(1, "Drought threatens harvest")])
+    index.refresh()
+    assert index.save()
+
+    store.add_many([event(2, "Drought spreads to the north")])
+    restored = SearchIndex(str(tmp_path / "index.npz"), store)
+    assert restored.refresh() == 1
+    assert sorted(ids(restored.search("drought"))) == ["1", "2"]
+
+
+def test_events_removed_from_the_store_are_dropped(store, index):
+    store.add_many([event(1, "Drought threatens harvest", day="2024-01-01"), event(2, "Drought spreads", day="2024-03-01")])
+    index.refresh()
+    store.prune("2024-02-01")
+    assert ids(index.search("drought")) == ["2"]
+    assert index.stats()["events"] == 1
+
+
+def test_query_without_words_is_rejected(index):
+    with pytest.raises(ValueError):
+        index.search("  !! ")
+
+
+@pytest.mark.parametrize("dates", [{"since": "yesterday"}, {"until": "2024-13-01"}])
+def test_invalid_dates_are_rejected(index, dates):
+    with pytest.raises(ValueError):
+        index.search("drought", **dates)
+
+
+def test_endpoint_answers_422_for_invalid_dates(monkeypatch, index):
+    monkeypatch.setattr(search, "search_index", index)
+    with pytest.raises(HTTPException) as error:
+        search.search_events_endpoint(q="drought", source_countries="", since="03/01/2024", until="", max=50)
+    assert error.value.status_code == 422
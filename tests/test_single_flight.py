@@ -0,0 +1,142 @@
+import asyncio
+import threading
+import time
+
+from polaris.services.single_flight import SingleFlight
+
+CALLERS = 3
+
+
+class Boom(Exception):
+    pass
+
+
+def test_concurrent_async_callers_share_one_call():
+    flight = SingleFlight()
+    runs = []
+
+    async def main():
+        release = asyncio.Event()
+
+        async def work():
+            runs.append(1)
+            await release.wait()
+            return "result"
+
+        callers = [asyncio.ensure_future(flight.do("key", work)) for _ in range(CALLERS)]
+        await asyncio.sleep(0)
+        release.set()
+        return await asyncio.gather(*callers)
+
+    results = asyncio.run(main())
+    assert runs == [1]
+    assert results == [("result", False)] + [("result", True)] * (CALLERS - 1)
+    assert flight.stats() == {"calls": CALLERS, "coalesced": CALLERS - 1, "in_flight": 0}
+
+
+def test_async_error_reaches_every_waiter_and_frees_the_key():
+    flight = SingleFlight()
+    runs = []
+
+    async def main():
+        release = asyncio.Event()
+
+        async def failing():
+            runs.append(1)
+            await release.wait()
+            raise Boom()
+
+        async def work():
+            runs.append(1)
+            return "result"
+
+        callers = [asyncio.ensure_future(flight.do("key", failing)) for _ in range(CALLERS)]
+        await asyncio.sleep(0)
+        release.set()
+        errors = await asyncio.gather(*callers, return_exceptions=True)
+        return errors, await flight.do("key", work)
+
+    errors, retry = asyncio.run(main())
+    assert all(isinstance(error, Boom) for error in errors)
+    assert retry == ("result", False)
+    assert len(runs) == 2
+
+
+def test_cancelled_async_caller_does_not_cancel_the_call():
+    flight = SingleFlight()
+
+    async def main():
+        release = asyncio.Event()
+
+        async def work():
+            await release.wait()
+            return "result"
+
+        first = asyncio.ensure_future(flight.do("key", work))
+        second = asyncio.ensure_future(flight.do("key", work))
+        await asyncio.sleep(0)
+        first.cancel()
+        release.set()
+        return await second
+
+    assert asyncio.run(main()) == ("result", True)
+
+
+def run_threads(flight, fn):
+    """Call ``flight.do_sync`` from CALLERS threads at once and return their results or errors."""
+    results = [None] * CALLERS
+
+    def caller(i):
+        try:
+            results[i] = flight.do_sync("key", fn)
+        except Exception as e:
+            results[i] = e
+
+    threads = [threading.Thread(target=caller, args=(i,)) for i in range(CALLERS)]
+    for thread in threads:
+        thread.start()
+    return threads, results
+
+
+def wait_for_callers(flight):
+    deadline = time.monotonic() + 5
+    while flight.stats()["calls"] < CALLERS:
+        assert time.monotonic() < deadline
+        time.sleep(0.001)
+
+
+def test_concurrent_threads_share_one_call():
+    flight = SingleFlight()
+    release = threading.Event()
+    runs = []
+
+    def work():
+        runs.append(1)
+        release.wait(5)
+        return "result"
+
+    threads, results = run_threads(flight, work)
+    wait_for_callers(flight)
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert runs == [1]
+    assert sorted(results) == [("result", False)] + [("result", True)] * (CALLERS - 1)
+    assert flight.stats() == {"calls": CALLERS, "coalesced": CALLERS - 1, "in_flight": 0}
+
+
+def test_thread_error_reaches_every_waiter_and_frees_the_key():
+    flight = SingleFlight()
+    release = threading.Event()
+
+    def failing():
+        release.wait(5)
+        raise Boom()
+
+    threads, results = run_threads(flight, failing)
+    wait_for_callers(flight)
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert all(isinstance(result, Boom) for result in results)
+    assert flight.do_sync("key", lambda: "result") == ("result", False)
@@ -0,0 +1,177 @@
+import os
+import threading
+
+import pytest
+import requests
+
+from polaris.api import admin
+from polaris.core.config import DataSource, DataSourceRegistry
+from polaris.services import source_refresh
+from polaris.services.source_refresh import SourceRefresher, download, read_meta
+
+URL = "https://example.org/data.csv"
+
+
+class FakeResponse:
+    def __init__(self, status_code, body=b"", headers=None, fail=False):
+        self.status_code = status_code
+        self.body = body
+        self.headers = headers or {}
+        self.fail = fail
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code} error")
+
+    def iter_content(self, chunk_size):
+        yield self.body[:4]
+        if self.fail:
+            raise requests.ConnectionError("connection reset")
+        yield self.body[4:]
+
+
+class FakeServer:
+    """Answers GETs with a body and ETag, and with 304 when the client sends the current ETag."""
+
+    def __init__(self, body=b"year,deaths\n2015,10\n", etag='"v1"'):
+        self.body = body
+        self.etag = etag
+        self.fail = False
+        self.requests = []
+
+    def get(self, url, headers=None, stream=False, timeout=None):
+        self.requests.append((url, dict(headers or {})))
+        if self.etag and (headers or {}).get("If-None-Match") == self.etag:
+            return FakeResponse(304)
+        if self.fail:
+            return FakeResponse(200, self.body, {"ETag": self.etag}, fail=True)
+        return FakeResponse(200, self.body, {"ETag": self.etag})
+
+
+@pytest.fixture
+def server(monkeypatch):
+    fake = FakeServer()
+    monkeypatch.setattr(source_refresh.requests, "get", fake.get)
+    return fake
+
+
+def read(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def leftovers(directory):
+    return [name for name in os.listdir(directory) if name.endswith(".tmp")]
+
+
+def test_unchanged_file_is_revalidated_with_a_conditional_get(server, tmp_path):
+    path = str(tmp_path / "data.csv")
+    assert download(URL, path)
+    assert read_meta(path)["etag"] == '"v1"'
+    mtime = os.stat(path).st_mtime_ns
+
+    assert not download(URL, path)
+    assert server.requests[-1][1]["If-None-Match"] == '"v1"'
+    assert os.stat(path).st_mtime_ns == mtime
+
+
+def test_file_with_the_same_checksum_is_not_replaced(server, tmp_path):
+    path = str(tmp_path / "data.csv")
+    download(URL, path)
+    inode = os.stat(path).st_ino
+    server.etag = '"v2"'
+
+    assert not download(URL, path)
+    assert os.stat(path).st_ino == inode
+    assert read_meta(path)["etag"] == '"v2"'
+    assert leftovers(tmp_path) == []
+
+
+def test_changed_file_is_replaced_atomically(server, tmp_path):
+    path = str(tmp_path / "data.csv")
+    download(URL, path)
+    inode = os.stat(path).st_ino
+    server.body, server.etag = b"year,deaths\n2015,12\n", '"v2"'
+
+    assert download(URL, path)
+    assert read(path) == b"year,deaths\n2015,12\n"
+    # The new content was written to a temporary file and renamed over the old one.
+    assert os.stat(path).st_ino != inode
+    assert read_meta(path)["sha256"] == source_refresh._sha256_of(path)
+    assert leftovers(tmp_path) == []
+
+
+def test_failed_download_keeps_the_old_file(server, tmp_path):
+    path = str(tmp_path / "data.csv")
+    download(URL, path)
+    sha256 = read_meta(path)["sha256"]
+    server.body, server.etag, server.fail = b"year,deaths\n2015,12\n", '"v2"', True
+
+    with pytest.raises(requests.ConnectionError):
+        download(URL, path)
+    assert read(path) == b"year,deaths\n2015,10\n"
+    assert read_meta(path)["sha256"] == sha256
+    assert leftovers(tmp_path) == []
+
+
+def test_file_without_a_recorded_checksum_is_compared_directly(server, tmp_path):
+    path = str(tmp_path / "data.csv")
+    with open(path, "wb") as f:
+        f.write(server.body)
+
+    assert not download(URL, path)
+    assert read_meta(path)["sha256"] == source_refresh._sha256_of(path)
+
+
+@pytest.fixture
+def sources(server, monkeypatch, tmp_path):
+    registry = DataSourceRegistry(str(tmp_path / "data_sources.json"))
+    registry.save([
+        DataSource(name="ucdp", type="csv", url=URL),
+        DataSource(name="acled", type="csv", url="https://example.org/acled.csv"),
+    ])
+    monkeypatch.setattr(source_refresh, "data_source_registry", registry)
+    monkeypatch.setattr(source_refresh, "DATA_DIR", str(tmp_path))
+    return registry
+
+
+def test_only_downloaded_sources_are_refreshed(sources, server, tmp_path):
+    download(URL, str(tmp_path / "data.csv"))
+    assert source_refresh.refresh_sources() == {"ucdp": {URL: False}}
+    server.body = b"year,deaths\n2015,12\n"
+    assert source_refresh.refresh_sources(force=True) == {"ucdp": {URL: True}}
+
+
+def test_refresh_endpoint_reports_changed_files(sources, server, tmp_path):
+    download(URL, str(tmp_path / "data.csv"))
+    server.body, server.etag = b"year,deaths\n2015,12\n", '"v2"'
+    assert admin.refresh(name=["ucdp"], force=False) == {"refreshed": {"ucdp": {URL: True}}}
+
+
+def test_refresh_errors_are_reported_per_source(sources, server, tmp_path):
+    download(URL, str(tmp_path / "data.csv"))
+    server.body, server.etag, server.fail = b"year,deaths\n2015,12\n", '"v2"', True
+    assert admin.refresh(name=None, force=False) == {"refreshed": {}}
+    assert read(str(tmp_path / "data.csv")) == b"year,deaths\n2015,10\n"
+
+
+def test_refresher_runs_on_its_interval_until_stopped(monkeypatch):
+    refreshed = threading.Event()
+    monkeypatch.setattr(source_refresh, "refresh_sources", refreshed.set)
+    refresher = SourceRefresher(0.01)
+    refresher.start()
+    assert refreshed.wait(5)
+    refresher.stop()
+    assert refresher._thread is None
+
+
+def test_refresher_without_an_interval_does_not_start():
+    refresher = SourceRefresher(0)
+    refresher.start()
+    assert refresher._thread is None